@@ -4,10 +4,21 @@ import os
 from django.conf import settings
 
 # Maximum size in bytes before a file is handled in the file system
-FILE_UPLOAD_MAX_MEMORY_SIZE = 1024*1024*100  # 100MB
+FILE_UPLOAD_MAX_MEMORY_SIZE = 1024*1024*2  # 2MB, larger uploads are spooled to disk
 
-# Maximum size of request data (post body)
-DATA_UPLOAD_MAX_MEMORY_SIZE = 1024*1024*100  # 100MB
+# Maximum size of request data (post body, excluding file uploads)
+DATA_UPLOAD_MAX_MEMORY_SIZE = 1024*1024*10  # 10MB
+
+# Maximum size of a single media file
+MEDIA_MAX_FILE_SIZE = 1024*1024*100  # 100MB
+
+# Largest chunk accepted by the resumable upload API
+MEDIA_UPLOAD_CHUNK_SIZE = 1024*1024*8  # 8MB
+
+# Orphaned media sweep: files younger than the grace period are kept, and
+# quarantined orphans are moved aside instead of deleted
+MEDIA_GC_GRACE_PERIOD = 60*60*24  # 1 day
+MEDIA_GC_QUARANTINE = False
 
 # Define the base directory of the project
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -108,6 +119,54 @@ DATABASES = {
     }
 }
 
+# Cache, shared between web workers, Celery workers and management commands in production
+# (gcp_entrypoint.sh sets CACHE_BACKEND=django.core.cache.backends.redis.RedisCache and a redis://
+# CACHE_LOCATION). The per-process LocMemCache default only suits development: marker snapshots
+# are then kept briefly and served without ETags, as other processes cannot retire them
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    }
+}
+
+# Map tiles: server cache lifetime (invalidated on report changes) and browser/CDN max-age, in seconds.
+# Invalidation only reaches other processes through a shared cache; with the per-process LocMemCache,
+# tiles are kept for TRAFFIC_VIOLATION_LOCAL_TILE_CACHE_TIMEOUT instead, so reports geocoded by Celery
+# or imported by a command show up on the map within that time plus the max-age
+TRAFFIC_VIOLATION_TILE_CACHE_TIMEOUT = 60 * 60 * 24
+TRAFFIC_VIOLATION_LOCAL_TILE_CACHE_TIMEOUT = 60
+TRAFFIC_VIOLATION_TILE_MAX_AGE = 60
+
+# Lifetime of a versioned marker snapshot, in seconds (retired early whenever a report changes)
+TRAFFIC_VIOLATION_MARKER_CACHE_TIMEOUT = 60 * 60
+
+# Geocoding caches: results expire after GEOCODE_CACHE_TTL_DAYS, the database keeps the
+# GEOCODE_CACHE_MAX_ENTRIES most recently used ones and each process GEOCODE_MEMORY_CACHE_SIZE
+GEOCODE_CACHE_TTL_DAYS = 30
+GEOCODE_CACHE_MAX_ENTRIES = 100000
+GEOCODE_MEMORY_CACHE_SIZE = 4096
+
+# Local road gazetteer tried before the Maps API (CSV: city,district,road,section,number,latitude,longitude)
+GAZETTEER_PATH = os.environ.get('GAZETTEER_PATH', os.path.join(BASE_DIR, 'static', 'gazetteer', 'taiwan_roads.csv'))
+
+# Deferred geocoding: save reports right away and let a Celery task resolve their location,
+# GEOCODE_BATCH_SIZE reports per run at up to GEOCODE_RATE_LIMIT Maps API calls per second.
+# The limit is shared by every worker through the cache; with the per-process LocMemCache it
+# applies per worker process, so divide it by the worker concurrency. A report claimed by a
+# worker that died is claimed again after GEOCODE_CLAIM_TIMEOUT seconds
+GEOCODE_DEFERRED = os.environ.get('GEOCODE_DEFERRED', 'false').lower() in ('1', 'true', 'yes')
+GEOCODE_BATCH_SIZE = 50
+GEOCODE_RATE_LIMIT = 10
+GEOCODE_MAX_ATTEMPTS = 5
+GEOCODE_CLAIM_TIMEOUT = 300
+
+# Hot spot detection: reports from the last HOT_SPOT_WINDOW_DAYS days with at least
+# HOT_SPOT_MIN_VIOLATIONS reports within HOT_SPOT_RADIUS metres form a hot spot
+HOT_SPOT_WINDOW_DAYS = 90
+HOT_SPOT_RADIUS = 200
+HOT_SPOT_MIN_VIOLATIONS = 5
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -225,6 +284,18 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'accounts.tasks.delete_expired_unverified_users',
         'schedule': timedelta(hours=1),
     },
+    'geocode-pending-reports-every-minute': {
+        'task': 'reports.tasks.geocode_pending_reports',
+        'schedule': timedelta(minutes=1),
+    },
+    'detect-traffic-violation-hot-spots-every-hour': {
+        'task': 'traffic_data.tasks.detect_traffic_violation_hot_spots',
+        'schedule': timedelta(hours=1),
+    },
+    'collect-orphaned-media-every-day': {
+        'task': 'reports.tasks.collect_orphaned_media',
+        'schedule': timedelta(days=1),
+    },
 }
 '''
 celery -A TrafficViolationReport worker --loglevel=info
@@ -17,5 +17,12 @@ export DATABASE_PORT=$(gcloud secrets versions access latest --secret="DATABASE_
 export GOOGLE_MAPS_API_KEY=$(gcloud secrets versions access latest --secret="GOOGLE_MAPS_API_KEY" --project="$PROJECT_ID")
 export GEMINI_API_KEY=$(gcloud secrets versions access latest --secret="GEMINI_API_KEY" --project="$PROJECT_ID")
 
+# 使用共用的 Redis 快取，Gunicorn worker、Celery 与管理命令看到同一份标记快照与版本
+export CACHE_BACKEND=django.core.cache.backends.redis.RedisCache
+export CACHE_LOCATION=$(gcloud secrets versions access latest --secret="CACHE_LOCATION" --project="$PROJECT_ID")
+
+# 预先建立标记快照，启动后的第一个请求不必查询数据库
+python manage.py warm_marker_cache
+
 # 启动Gunicorn服务
 exec gunicorn -b :$PORT TrafficViolationReport.wsgi
\ No newline at end of file
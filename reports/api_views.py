@@ -1,16 +1,29 @@
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework import status
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError
 from .serializers import TrafficViolationSerializer, MediaFileSerializer
 from .forms import ReportForm
-from .models import TrafficViolation, MediaFile
+from .models import TrafficViolation, MediaFile, MediaUpload
+from utils.batch_utils import CREATED, parse_report_batch, submit_report_batch
+from utils.import_utils import ReportImporter, detect_import_format
+from utils.upload_utils import (
+    UploadOffsetMismatch,
+    append_chunk,
+    complete_upload,
+    create_upload,
+    get_upload_chunk_size,
+)
 from utils.utils import (
     process_input, 
     ReportManager,
 )
 from utils.mysql_utils import (
-    get_user_records,
+    USER_RECORDS_PAGE_SIZE,
+    get_user_records_page,
+    parse_page_limit,
 )
 
 @api_view(['POST'])
@@ -29,10 +42,13 @@ def create_report_api(request):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def traffic_violation_list_api(request):
-    # 使用已登入的使用者id過濾違規記錄並取得標題列表
-    user_id = request.user.id
-    violations = TrafficViolation.objects.filter(user_id=user_id).values('id', 'title')
-    return Response(violations)
+    # 以 (username, date, time, traffic_violation_id) 索引分頁列出使用者的報告
+    try:
+        limit = parse_page_limit(request.GET, USER_RECORDS_PAGE_SIZE)
+        records, next_cursor = get_user_records_page(request.user.username, request.GET.get('cursor'), limit)
+    except ValueError as e:
+        return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({'results': records, 'next_cursor': next_cursor})
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
@@ -71,4 +87,103 @@ def update_report_api(request, violation_id):
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     except TrafficViolation.DoesNotExist:
-        return Response({'detail': 'Report not found.'}, status=status.HTTP_404_NOT_FOUND)
\ No newline at end of file
+        return Response({'detail': 'Report not found.'}, status=status.HTTP_404_NOT_FOUND)
+
+def serialize_upload(upload):
+    return {
+        'upload_id': upload.upload_id,
+        'offset': upload.received,
+        'size': upload.size,
+        'chunk_size': get_upload_chunk_size(),
+        'status': upload.status,
+        'media_file': MediaFileSerializer(upload.media_file).data if upload.media_file else None,
+    }
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def create_upload_api(request):
+    # 建立可續傳的上傳，之後以區塊 PUT 檔案內容
+    try:
+        violation = TrafficViolation.objects.get(traffic_violation_id=request.data.get('traffic_violation_id'))
+    except (TrafficViolation.DoesNotExist, ValueError, ValidationError):
+        return Response({'detail': 'Report not found.'}, status=status.HTTP_404_NOT_FOUND)
+    if violation.username != request.user.username:
+        return Response({'detail': 'You do not have permission to update this report.'}, status=status.HTTP_403_FORBIDDEN)
+
+    try:
+        upload = create_upload(
+            violation,
+            request.user.username,
+            str(request.data.get('filename', '')),
+            int(request.data.get('size', 0)),
+            str(request.data.get('sha256', '')).lower(),
+        )
+    except ValueError as e:
+        return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(serialize_upload(upload), status=status.HTTP_201_CREATED)
+
+@api_view(['GET', 'PUT'])
+@permission_classes([IsAuthenticated])
+def upload_api(request, upload_id):
+    # GET 取得續傳位移；PUT 於 Upload-Offset 位移附加一個區塊
+    try:
+        upload = MediaUpload.objects.get(upload_id=upload_id, username=request.user.username)
+    except MediaUpload.DoesNotExist:
+        return Response({'detail': 'Upload not found.'}, status=status.HTTP_404_NOT_FOUND)
+    if request.method == 'GET':
+        return Response(serialize_upload(upload))
+
+    try:
+        offset = int(request.headers.get('Upload-Offset', ''))
+        length = int(request.headers.get('Content-Length', ''))
+        # 直接讀取請求串流，不經 request.data 解析以免整個區塊留在記憶體
+        upload = append_chunk(upload.upload_id, offset, request._request, length)
+    except UploadOffsetMismatch as e:
+        return Response({'detail': str(e), 'offset': e.offset}, status=status.HTTP_409_CONFLICT)
+    except ValueError as e:
+        return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(serialize_upload(upload))
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def complete_upload_api(request, upload_id):
+    # 驗證檢查碼後將組合好的檔案附加到報告
+    if not MediaUpload.objects.filter(upload_id=upload_id, username=request.user.username).exists():
+        return Response({'detail': 'Upload not found.'}, status=status.HTTP_404_NOT_FOUND)
+    try:
+        media_file = complete_upload(upload_id)
+    except ValueError as e:
+        return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(MediaFileSerializer(media_file).data, status=status.HTTP_201_CREATED)
+
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def import_reports_api(request):
+    # 管理員批次匯入 CSV 或 JSONL 檔案中的報告，回傳逐列錯誤
+    upload = request.FILES.get('file')
+    if upload is None:
+        return Response({'detail': 'file is required.'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        import_format = detect_import_format(upload.name, request.data.get('format'))
+        # 地點交由背景任務地理編碼，不在請求中呼叫 API
+        result = ReportImporter(request.user.username, defer_geocoding=True).import_file(upload.file, import_format)
+    except ValueError as e:
+        return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(result, status=status.HTTP_201_CREATED if result['created'] else status.HTTP_200_OK)
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def batch_create_reports_api(request):
+    # 離線同步：一次送出多筆報告與媒體，以 idempotency key 避免重送時重複建立
+    try:
+        reports = parse_report_batch(request.data)
+    except ValueError as e:
+        return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        results = submit_report_batch(request.user.username, reports, request.FILES)
+    except IntegrityError:
+        return Response({'detail': 'These reports are being submitted concurrently, retry the batch.'},
+                        status=status.HTTP_409_CONFLICT)
+
+    created = any(result['status'] == CREATED for result in results)
+    return Response({'results': results}, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
@@ -0,0 +1,36 @@
+# Generated by Django 5.0.1 on 2026-10-18 14:57
+
+from django.db import migrations, models
+
+from utils.geo_utils import encode_geohash
+
+
+def populate_geohash(apps, schema_editor):
+    TrafficViolation = apps.get_model("reports", "TrafficViolation")
+    violations = TrafficViolation.objects.only("latitude", "longtitude")
+    batch = []
+    for violation in violations.iterator(chunk_size=2000):
+        violation.geohash = encode_geohash(violation.latitude, violation.longtitude)
+        batch.append(violation)
+        if len(batch) >= 2000:
+            TrafficViolation.objects.bulk_update(batch, ["geohash"])
+            batch = []
+    if batch:
+        TrafficViolation.objects.bulk_update(batch, ["geohash"])
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("reports", "0006_remove_trafficviolation_location_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="trafficviolation",
+            name="geohash",
+            field=models.CharField(
+                blank=True, db_index=True, editable=False, max_length=12, null=True
+            ),
+        ),
+        migrations.RunPython(populate_geohash, migrations.RunPython.noop),
+    ]
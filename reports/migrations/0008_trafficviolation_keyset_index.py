@@ -0,0 +1,19 @@
+# Generated by Django 5.0.1 on 2026-10-18 15:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("reports", "0007_trafficviolation_geohash"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="trafficviolation",
+            index=models.Index(
+                fields=["date", "time", "traffic_violation_id"],
+                name="reports_tv_date_time_id_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.0.1 on 2026-10-18 15:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("reports", "0008_trafficviolation_keyset_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="trafficviolation",
+            name="geocode_attempts",
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="trafficviolation",
+            name="geocode_status",
+            field=models.CharField(
+                choices=[
+                    ("done", "Geocoded"),
+                    ("pending", "Pending"),
+                    ("failed", "Failed"),
+                ],
+                db_index=True,
+                default="done",
+                max_length=10,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="trafficviolation",
+            name="latitude",
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name="trafficviolation",
+            name="longtitude",
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.0.1 on 2026-10-18 15:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("reports", "0011_mediablob_mediafile_blob"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="mediafile",
+            name="renditions",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
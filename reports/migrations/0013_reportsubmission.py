@@ -0,0 +1,45 @@
+# Generated by Django 5.0.1 on 2026-10-18 15:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("reports", "0012_mediafile_renditions"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ReportSubmission",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("username", models.CharField(max_length=150)),
+                ("idempotency_key", models.CharField(max_length=64)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "traffic_violation",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="submissions",
+                        to="reports.trafficviolation",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="reportsubmission",
+            constraint=models.UniqueConstraint(
+                fields=("username", "idempotency_key"),
+                name="reports_submission_user_key_uniq",
+            ),
+        ),
+    ]
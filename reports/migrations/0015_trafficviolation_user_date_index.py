@@ -0,0 +1,19 @@
+# Generated by Django 5.0.1 on 2026-10-18 16:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("reports", "0014_mediahash"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="trafficviolation",
+            index=models.Index(
+                fields=["username", "date", "time", "traffic_violation_id"],
+                name="reports_tv_user_date_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.0.1 on 2026-10-18 16:10
+
+import reports.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("reports", "0015_trafficviolation_user_date_index"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="mediafile",
+            name="file",
+            field=models.FileField(
+                db_index=True, upload_to=reports.models.PathAndRename("")
+            ),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.0.1 on 2026-10-18 16:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("reports", "0016_mediafile_file_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="trafficviolation",
+            name="geocode_claimed_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -3,6 +3,8 @@ from django.contrib.auth.models import User
 import uuid
 import os
 from django.utils.deconstruct import deconstructible
+from utils.geo_utils import encode_geohash
+from utils.storage_utils import media_blob_storage
 
 
 class TrafficViolation(models.Model):
@@ -25,18 +27,52 @@ class TrafficViolation(models.Model):
         ('未通過', '未通過'),
         ('其他', '其他'),
     ]
+    GEOCODE_DONE = 'done'
+    GEOCODE_PENDING = 'pending'
+    GEOCODE_FAILED = 'failed'
+    GEOCODE_STATUS = [
+        (GEOCODE_DONE, 'Geocoded'),
+        (GEOCODE_PENDING, 'Pending'),
+        (GEOCODE_FAILED, 'Failed'),
+    ]
     license_plate = models.CharField(max_length=10)
     date = models.DateField()
     time = models.TimeField()
     violation = models.CharField(max_length=100, choices=VIOLATIONS)
     status = models.CharField(max_length=50, choices=STATUS)
     address = models.CharField(max_length=255, blank=True, null=True)  # 地址字段
-    latitude = models.FloatField()  # 纬度
-    longtitude = models.FloatField()  # 经度
+    latitude = models.FloatField(blank=True, null=True)  # 纬度，延遲地理編碼完成前為空
+    longtitude = models.FloatField(blank=True, null=True)  # 经度
     user_input_type = models.CharField(max_length=100, blank=True, null=True)  # 用户输入类型
     officer = models.CharField(max_length=255, blank=True, default='')
     traffic_violation_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     username = models.CharField(max_length=150, blank=True, null=True)
+    geohash = models.CharField(max_length=12, blank=True, null=True, db_index=True, editable=False)  # 空間索引
+    geocode_status = models.CharField(max_length=10, choices=GEOCODE_STATUS, default=GEOCODE_DONE, db_index=True)
+    geocode_attempts = models.PositiveSmallIntegerField(default=0)
+    # 背景任務認領待地理編碼報告的時間，逾時未完成可再被認領
+    geocode_claimed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # 搜尋 API 的 keyset 分頁排序
+            models.Index(fields=['date', 'time', 'traffic_violation_id'], name='reports_tv_date_time_id_idx'),
+            # 使用者報告列表的 keyset 分頁
+            models.Index(fields=['username', 'date', 'time', 'traffic_violation_id'], name='reports_tv_user_date_idx'),
+        ]
+
+    def assign_geohash(self):
+        """
+        Refresh the geohash spatial index column from the coordinates.
+        """
+        self.geohash = encode_geohash(self.latitude, self.longtitude)
+
+    def save(self, *args, **kwargs):
+        self.assign_geohash()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longtitude'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'geohash'}
+        super().save(*args, **kwargs)
 
 @deconstructible
 class PathAndRename(object):
@@ -50,9 +86,74 @@ class PathAndRename(object):
         # 返回包含新路徑的文件名稱
         return os.path.join('reports/media', self.sub_path, filename)
 
+class MediaBlob(models.Model):
+    """
+    A media file stored once under the SHA-256 of its content, shared by
+    every MediaFile with the same content and deleted with the last of them.
+    """
+    file = models.FileField(max_length=255, unique=True, storage=media_blob_storage)
+    sha256 = models.CharField(max_length=64, db_index=True)
+    size = models.BigIntegerField()
+    ref_count = models.PositiveIntegerField(default=0)  # 引用此檔案的 MediaFile 數量
+    created_at = models.DateTimeField(auto_now_add=True)
+    # 計算感知雜湊的時間，尚未計算時為空
+    hashed_at = models.DateTimeField(null=True, blank=True)
+
+class MediaHash(models.Model):
+    """
+    A 64-bit perceptual hash of an image blob, or of a sampled frame of a
+    video blob, used to find near-identical media across reports.
+    """
+    blob = models.ForeignKey(MediaBlob, on_delete=models.CASCADE, related_name='hashes')
+    value = models.BigIntegerField()  # 以有號 64 位元整數保存
+
 # 在模型中使用 PathAndRename 來處理 'upload_to'
 class MediaFile(models.Model):
     traffic_violation = models.ForeignKey(
         TrafficViolation, on_delete=models.CASCADE, null=True, blank=True
     )
-    file = models.FileField(upload_to = PathAndRename(''))
+    file = models.FileField(upload_to = PathAndRename(''), db_index=True)  # 索引供孤兒媒體清理比對
+    # 共用的內容定址檔案，file 欄位與其同名；舊資料為空
+    blob = models.ForeignKey(MediaBlob, on_delete=models.PROTECT, null=True, blank=True, related_name='media_files')
+    # 縮圖與預覽的檔名，由背景任務產生
+    renditions = models.JSONField(default=dict, blank=True)
+
+class MediaUpload(models.Model):
+    """
+    A resumable media upload, received in chunks appended to a partial file
+    on disk and attached to its report as a MediaFile once complete.
+    """
+    UPLOADING = 'uploading'
+    COMPLETE = 'complete'
+    STATUS = [
+        (UPLOADING, 'Uploading'),
+        (COMPLETE, 'Complete'),
+    ]
+
+    upload_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    traffic_violation = models.ForeignKey(TrafficViolation, on_delete=models.CASCADE, related_name='uploads')
+    username = models.CharField(max_length=150)
+    filename = models.CharField(max_length=255)
+    size = models.BigIntegerField()
+    received = models.BigIntegerField(default=0)  # 已接收的位元組數，即續傳位移
+    sha256 = models.CharField(max_length=64)
+    status = models.CharField(max_length=10, choices=STATUS, default=UPLOADING)
+    media_file = models.ForeignKey(MediaFile, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+class ReportSubmission(models.Model):
+    """
+    The client-supplied idempotency key of a report created through the
+    batch submission API, so a replayed submission returns the existing
+    report instead of creating it twice.
+    """
+    username = models.CharField(max_length=150)
+    idempotency_key = models.CharField(max_length=64)
+    traffic_violation = models.ForeignKey(TrafficViolation, on_delete=models.CASCADE, related_name='submissions')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['username', 'idempotency_key'], name='reports_submission_user_key_uniq'),
+        ]
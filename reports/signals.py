@@ -0,0 +1,31 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+from utils.blob_utils import release_media_blob
+from .models import MediaFile
+from .tasks import queue_media_renditions
+
+# Sent after TrafficViolation.objects.bulk_create, which bypasses post_save,
+# with the created reports as `instances`.
+traffic_violations_bulk_created = Signal()
+
+
+@receiver(post_save, sender=MediaFile)
+def media_file_saved(sender, instance, created, **kwargs):
+    """
+    Render the previews of a new media file once it is committed.
+    """
+    if created and instance.file and not instance.renditions:
+        name = instance.file.name
+        transaction.on_commit(lambda: queue_media_renditions([name]))
+
+
+@receiver(post_delete, sender=MediaFile)
+def media_file_deleted(sender, instance, **kwargs):
+    """
+    Release the shared blob of a deleted media file, including the ones
+    removed by queryset deletes or with their report, in the deleting
+    transaction so the reference count commits or rolls back with it.
+    """
+    if instance.blob_id is not None:
+        release_media_blob(instance.blob_id)
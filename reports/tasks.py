@@ -0,0 +1,175 @@
+import logging
+import googlemaps
+from datetime import timedelta
+from typing import Optional
+from celery import shared_task
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from kombu.exceptions import OperationalError
+from utils.geocode_utils import GEOCODE_RATE_KEY, SharedRateLimiter
+from utils.media_gc_utils import MediaSweeper
+from utils.phash_utils import hash_media_blob
+from utils.rendition_utils import render_media
+from utils.utils import process_input
+from .models import MediaBlob, MediaFile, TrafficViolation
+
+logger = logging.getLogger(__name__)
+
+# 所有 worker 的延遲地理編碼共用的 API 速率限制
+geocode_rate_limiter = SharedRateLimiter(GEOCODE_RATE_KEY, getattr(settings, 'GEOCODE_RATE_LIMIT', 10))
+
+# Maps API errors worth retrying later rather than failing the report
+TRANSIENT_ERRORS = (googlemaps.exceptions.Timeout, googlemaps.exceptions.TransportError)
+TRANSIENT_API_STATUSES = {'OVER_QUERY_LIMIT', 'UNKNOWN_ERROR'}
+
+
+def geocode_report(traffic_violation: TrafficViolation) -> None:
+    """
+    Resolve the raw location kept in the address of a pending report.
+
+    Raises:
+        googlemaps.exceptions.ApiError: If the API is over its quota or failing.
+        googlemaps.exceptions.Timeout: If the API did not answer in time.
+        googlemaps.exceptions.TransportError: If the API could not be reached.
+    """
+    geocode_rate_limiter.acquire()
+    try:
+        result = process_input(traffic_violation.address or '')
+    except googlemaps.exceptions.ApiError as e:
+        if e.status in TRANSIENT_API_STATUSES:
+            raise
+        # API 拒絕此輸入
+        result = None
+    except (TypeError, ValueError):
+        # 既非地址也非座標
+        result = None
+
+    fields = ['geocode_status', 'geocode_attempts']
+    traffic_violation.geocode_attempts += 1
+    if result is None:
+        traffic_violation.geocode_status = TrafficViolation.GEOCODE_FAILED
+    else:
+        address, latitude, longtitude, user_input_type = result
+        traffic_violation.address = address
+        traffic_violation.latitude = latitude
+        traffic_violation.longtitude = longtitude
+        traffic_violation.user_input_type = user_input_type
+        traffic_violation.geocode_status = TrafficViolation.GEOCODE_DONE
+        fields += ['address', 'latitude', 'longtitude', 'user_input_type']
+    # 結果與 post_save 的快取、統計更新在同一個短交易中寫入
+    with transaction.atomic():
+        traffic_violation.save(update_fields=fields)
+
+
+def claim_pending_report() -> Optional[TrafficViolation]:
+    """
+    Claim the oldest pending report no other worker is geocoding.
+
+    The claim is stamped on the report in a short transaction, so the row
+    is not locked while the Maps API is called. A claim older than
+    GEOCODE_CLAIM_TIMEOUT, left by a worker that died, is taken over.
+
+    Returns:
+        The claimed report, or None if no report is waiting.
+    """
+    now = timezone.now()
+    stale = now - timedelta(seconds=getattr(settings, 'GEOCODE_CLAIM_TIMEOUT', 300))
+    with transaction.atomic():
+        traffic_violation = TrafficViolation.objects.select_for_update(skip_locked=True).filter(
+            Q(geocode_claimed_at=None) | Q(geocode_claimed_at__lt=stale),
+            geocode_status=TrafficViolation.GEOCODE_PENDING,
+        ).order_by('date', 'time').first()
+        if traffic_violation is None:
+            return None
+        # 以 update 認領，不觸發地圖快取與統計的 post_save 處理
+        TrafficViolation.objects.filter(pk=traffic_violation.pk).update(geocode_claimed_at=now)
+    traffic_violation.geocode_claimed_at = now
+    return traffic_violation
+
+
+@shared_task(bind=True, max_retries=5, default_retry_delay=60)
+def geocode_pending_reports(self):
+    """
+    Geocode a batch of reports saved with a pending location, retrying with
+    backoff while the Maps API is unavailable.
+
+    Each report is claimed first, so concurrent runs from beat, new reports
+    and the task's own chain never geocode the same report twice. The API
+    is called outside any transaction, and the result is written in a
+    transaction of its own.
+    """
+    batch_size = getattr(settings, 'GEOCODE_BATCH_SIZE', 50)
+    max_attempts = getattr(settings, 'GEOCODE_MAX_ATTEMPTS', 5)
+
+    geocoded = 0
+    for _ in range(batch_size):
+        traffic_violation = claim_pending_report()
+        if traffic_violation is None:
+            return geocoded
+        try:
+            geocode_report(traffic_violation)
+            geocoded += 1
+        except (googlemaps.exceptions.ApiError, *TRANSIENT_ERRORS) as e:
+            # 釋放認領，讓重試立即處理此報告
+            traffic_violation.geocode_attempts += 1
+            traffic_violation.geocode_claimed_at = None
+            if traffic_violation.geocode_attempts >= max_attempts:
+                traffic_violation.geocode_status = TrafficViolation.GEOCODE_FAILED
+            traffic_violation.save(update_fields=['geocode_status', 'geocode_attempts', 'geocode_claimed_at'])
+            raise self.retry(exc=e, countdown=self.default_retry_delay * 2 ** self.request.retries)
+
+    # 尚有待處理的報告，接著處理下一批
+    geocode_pending_reports.delay()
+    return geocoded
+
+
+def queue_pending_geocoding():
+    try:
+        geocode_pending_reports.delay()
+    except OperationalError:
+        # Broker 無法連線時由排程任務補上
+        pass
+
+
+@shared_task
+def generate_media_renditions(name):
+    """
+    Render the thumbnail, or the poster and preview, of a stored media file
+    and record them on every MediaFile using it. The perceptual hashes used
+    to find duplicate reports are computed first, if still missing.
+    """
+    for blob in MediaBlob.objects.filter(file=name, hashed_at=None):
+        hash_media_blob(blob)
+
+    try:
+        renditions = render_media(name)
+    except (OSError, ValueError) as e:
+        # 無法解碼的檔案沿用原始檔預覽
+        logger.warning('Could not render %s: %s', name, e)
+        return {}
+    MediaFile.objects.filter(file=name).update(renditions=renditions)
+    return renditions
+
+
+def queue_media_renditions(names):
+    """
+    Queue the rendition of newly saved media files.
+    """
+    for name in set(names):
+        try:
+            generate_media_renditions.delay(name)
+        except OperationalError:
+            # Broker 無法連線時沿用原始檔預覽
+            logger.warning('Could not queue the renditions of %s', name)
+
+
+@shared_task
+def collect_orphaned_media():
+    """
+    Delete, or quarantine, the media files no longer referenced by any row.
+    """
+    totals = MediaSweeper().sweep()
+    logger.info('Collected %(collected)d of %(scanned)d media files, freeing %(freed_bytes)d bytes', totals)
+    return totals
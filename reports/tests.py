@@ -16,6 +16,7 @@ from unittest.mock import patch
 from reports.views import edit_report, dashboard
 from reports.forms import ReportForm
 from reports.models import TrafficViolation, MediaFile
+from reports.tasks import geocode_report
 
 
 class TrafficViolationReportTest(unittest.TestCase):
@@ -132,3 +133,32 @@ class TrafficViolationReportTest(unittest.TestCase):
         self.assertIsInstance(response.context['form'], ReportForm)
     
     # Add more test cases as needed...
+
+
+@patch('reports.tasks.geocode_rate_limiter', MagicMock())
+class GeocodeReportTaskTest(unittest.TestCase):
+    """
+    Unit tests for the deferred geocoding of pending reports.
+    """
+    def setUp(self):
+        self.report = MagicMock(address='台北市中正區忠孝西路一段', geocode_attempts=0)
+
+    @patch('reports.tasks.process_input')
+    def test_geocode_report_fills_location(self, mock_process_input):
+        mock_process_input.return_value = ('台北市中正區忠孝西路一段', 25.04, 121.51, 'address')
+
+        geocode_report(self.report)
+
+        self.assertEqual((self.report.latitude, self.report.longtitude), (25.04, 121.51))
+        self.assertEqual(self.report.geocode_status, TrafficViolation.GEOCODE_DONE)
+        self.assertEqual(self.report.geocode_attempts, 1)
+        self.assertIn('latitude', self.report.save.call_args.kwargs['update_fields'])
+
+    @patch('reports.tasks.process_input')
+    def test_geocode_report_marks_unresolvable_location_failed(self, mock_process_input):
+        mock_process_input.return_value = None
+
+        geocode_report(self.report)
+
+        self.assertEqual(self.report.geocode_status, TrafficViolation.GEOCODE_FAILED)
+        self.report.save.assert_called_once_with(update_fields=['geocode_status', 'geocode_attempts'])
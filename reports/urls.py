@@ -14,4 +14,9 @@ urlpatterns = [
     path('api/traffic-violations-list/', api_views.traffic_violation_list_api, name='api_traffic_violations_list'),
     path('api/traffic-violations-detail/', api_views.traffic_violation_detail_api, name='api_traffic_violation_detail'),
     path('api/update-report/<uuid:violation_id>/', api_views.update_report_api, name='api_update_report'),
+    path('api/import-reports/', api_views.import_reports_api, name='api_import_reports'),
+    path('api/batch-create-reports/', api_views.batch_create_reports_api, name='api_batch_create_reports'),
+    path('api/uploads/', api_views.create_upload_api, name='api_create_upload'),
+    path('api/uploads/<uuid:upload_id>/', api_views.upload_api, name='api_upload'),
+    path('api/uploads/<uuid:upload_id>/complete/', api_views.complete_upload_api, name='api_complete_upload'),
 ]
\ No newline at end of file
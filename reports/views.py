@@ -1,25 +1,40 @@
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
+from django.db import transaction
+from django.http import HttpResponseBadRequest, JsonResponse
 from django.shortcuts import render, redirect
 from django.contrib import messages
 from .forms import ReportForm
 from .models import TrafficViolation, MediaFile
+from .tasks import queue_pending_geocoding
 from utils.utils import (
     process_input, 
     ReportManager,
 )
 from utils.mysql_utils import (
-    get_user_records,
+    get_user_records_page,
 )
+from utils.blob_utils import attach_media_file
+from utils.duplicate_utils import find_duplicate_reports
+from utils.phash_utils import stored_media_hashes
 
 @login_required
 def edit_report(request):
-    id = request.user.id
-    user_records = get_user_records(id)
+    username = request.user.username
+    try:
+        user_records, next_cursor = get_user_records_page(username, request.GET.get('cursor'))
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
 
-    selected_record, form, media_urls = ReportManager.get_record_form_and_media(request, id)
+    if request.headers.get('x-requested-with') == 'XMLHttpRequest':
+        # 捲動載入下一頁記錄
+        return JsonResponse({'results': user_records, 'next_cursor': next_cursor})
+
+    selected_record, form, media_urls = ReportManager.get_record_form_and_media(request, username)
 
     context = {
         'user_records': user_records,
+        'next_cursor': next_cursor,
         'selected_record': selected_record,
         'form': form,
         'media_urls': media_urls,
@@ -31,8 +46,14 @@ def dashboard(request):
     if request.method == 'POST':
         form = ReportForm(request.POST, request.FILES)
         if form.is_valid():
-            # 处理输入并提取位置信息
-            address, latitude, longtitude, user_input_type = process_input(form.cleaned_data['location'])
+            if settings.GEOCODE_DEFERRED:
+                # 先保存原始地點，由背景任務進行地理編碼
+                address, latitude, longtitude, user_input_type = form.cleaned_data['location'], None, None, None
+                geocode_status = TrafficViolation.GEOCODE_PENDING
+            else:
+                # 处理输入并提取位置信息
+                address, latitude, longtitude, user_input_type = process_input(form.cleaned_data['location'])
+                geocode_status = TrafficViolation.GEOCODE_DONE
 
             # 创建一个新的 TrafficViolation 实例
             traffic_violation = TrafficViolation(
@@ -45,17 +66,28 @@ def dashboard(request):
                 latitude=latitude, 
                 longtitude=longtitude, 
                 user_input_type=user_input_type,
+                geocode_status=geocode_status,
                 officer=request.user.username if form.cleaned_data['officer'] else '',
                 username=request.user.username
             )
             traffic_violation.save()
 
             # 处理文件上传
+            hashes = []
             for file in request.FILES.getlist('media'):
-                MediaFile.objects.create(
-                    traffic_violation=traffic_violation,
-                    file=file
-                )
+                media_file = attach_media_file(traffic_violation, file)
+                # 新內容的感知雜湊由背景任務與縮圖一併計算，此處只取已存在的雜湊
+                hashes.extend(stored_media_hashes(media_file.blob))
+
+            # 以照片感知雜湊與車牌、日期、地點比對，提示可能重複的報告
+            duplicates = find_duplicate_reports(traffic_violation, hashes)
+            if duplicates:
+                messages.warning(request, '此報告可能與以下報告重複：' + '、'.join(
+                    f"{duplicate['license_plate']} ({duplicate['date']})" for duplicate in duplicates
+                ))
+
+            if geocode_status == TrafficViolation.GEOCODE_PENDING:
+                transaction.on_commit(queue_pending_geocoding)
 
             messages.success(request, '报告提交成功。')
             return redirect('dashboard')
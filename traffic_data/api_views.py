@@ -1,30 +1,110 @@
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, renderer_classes
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from datetime import date
+from django.http import StreamingHttpResponse
 from reports.models import TrafficViolation
-from .serializers import TrafficViolationSerializer, TrafficViolationMarkerSerializer
+from .models import HotSpot
+from .serializers import HotSpotSerializer, TrafficViolationSerializer, TrafficViolationMarkerSerializer
+from .renderers import PackedMarkerRenderer
 from utils.mysql_utils import (
+    filter_traffic_violations,
     get_traffic_violation_markers,
     get_traffic_violation_details,
+    get_traffic_violation_details_batch,
+    get_traffic_violation_heatmap,
+    get_violation_statistics,
+    paginate_traffic_violations,
+    parse_page_limit,
+    parse_traffic_violation_ids,
     search_traffic_violations,
+    stream_traffic_violation_markers,
+    wants_streaming,
 )
+from utils.geo_utils import parse_zoom
+from utils.nearby_utils import get_nearby_traffic_violations, parse_nearby_params
+
+MARKER_RENDERER_CLASSES = api_settings.DEFAULT_RENDERER_CLASSES + [PackedMarkerRenderer]
+
+
+def is_packed(request):
+    return request.accepted_renderer.format == PackedMarkerRenderer.format
 
 @api_view(['GET'])
+@renderer_classes(MARKER_RENDERER_CLASSES)
 def search_traffic_violations_api(request):
     keyword = request.GET.get('keyword', '')
     time_range = request.GET.get('timeRange', 'all')
     from_date = request.GET.get('fromDate', '')
     to_date = request.GET.get('toDate', '')
 
-    violations = search_traffic_violations(keyword, time_range, from_date, to_date)
+    try:
+        zoom = parse_zoom(request.GET)
+    except ValueError as e:
+        return Response({'detail': str(e)}, status=400)
+
+    if 'limit' in request.GET or 'cursor' in request.GET:
+        # 以 (date, time, traffic_violation_id) 游標分頁
+        try:
+            limit = parse_page_limit(request.GET)
+            violations = filter_traffic_violations(keyword, time_range, from_date, to_date)
+            markers, next_cursor = paginate_traffic_violations(violations, request.GET.get('cursor'), limit)
+        except ValueError as e:
+            return Response({'detail': str(e)}, status=400)
+        serializer = TrafficViolationMarkerSerializer(markers, many=True)
+        return Response({'results': serializer.data, 'next_cursor': next_cursor})
+
+    if wants_streaming(request, zoom) and not is_packed(request):
+        # 大量結果逐批輸出 JSON，不經過 serializer
+        violations = filter_traffic_violations(keyword, time_range, from_date, to_date)
+        return StreamingHttpResponse(stream_traffic_violation_markers(violations), content_type='application/json')
+
+    violations = search_traffic_violations(keyword, time_range, from_date, to_date, zoom, is_packed(request))
+    if is_packed(request):
+        return Response(violations)
     serializer = TrafficViolationMarkerSerializer(violations, many=True)
     return Response(serializer.data)
 
 @api_view(['GET'])
+@renderer_classes(MARKER_RENDERER_CLASSES)
 def traffic_violation_markers_api(request):
-    markers = get_traffic_violation_markers(request)
+    try:
+        markers = get_traffic_violation_markers(request, is_packed(request))
+    except ValueError as e:
+        return Response({'detail': str(e)}, status=400)
+    if is_packed(request):
+        return Response(markers)
     serializer = TrafficViolationMarkerSerializer(markers, many=True)
     return Response(serializer.data)
 
+@api_view(['GET'])
+def traffic_violations_nearby_api(request):
+    # 以 k-d 樹找出距離使用者最近的違規
+    try:
+        lat, lng, k, radius = parse_nearby_params(request.GET)
+    except ValueError as e:
+        return Response({'detail': str(e)}, status=400)
+    serializer = TrafficViolationMarkerSerializer(get_nearby_traffic_violations(lat, lng, k, radius), many=True)
+    return Response(serializer.data)
+
+@api_view(['GET'])
+def traffic_violation_hot_spots_api(request):
+    # 熱點由排程任務預先計算
+    hot_spots = HotSpot.objects.all()
+    violation = request.GET.get('violation')
+    if violation:
+        hot_spots = hot_spots.filter(dominant_violation=violation)
+    serializer = HotSpotSerializer(hot_spots, many=True)
+    return Response(serializer.data)
+
+@api_view(['GET'])
+def traffic_violation_heatmap_api(request):
+    try:
+        heatmap = get_traffic_violation_heatmap(request.GET)
+    except ValueError as e:
+        return Response({'detail': str(e)}, status=400)
+    return Response(heatmap)
+
 @api_view(['GET'])
 def traffic_violation_details_api(request, traffic_violation_id):
     try:
@@ -35,4 +115,29 @@ def traffic_violation_details_api(request, traffic_violation_id):
         return Response(serializer.data)
     except TrafficViolation.DoesNotExist:
         # 如果 TrafficViolation 对象不存在，返回一个 404 错误响应
-        return Response(status=404)
\ No newline at end of file
+        return Response(status=404)
+@api_view(['GET'])
+def traffic_violation_details_batch_api(request):
+    # 一次取得多筆違規詳情與媒體，供懸停預載與列表使用
+    try:
+        traffic_violation_ids = parse_traffic_violation_ids(request.GET)
+    except ValueError as e:
+        return Response({'detail': str(e)}, status=400)
+    return Response(get_traffic_violation_details_batch(traffic_violation_ids))
+
+@api_view(['GET'])
+def traffic_violation_statistics_api(request):
+    # 由每日統計表彙總，不掃描原始違規資料
+    try:
+        from_date = request.GET.get('fromDate')
+        to_date = request.GET.get('toDate')
+        statistics = get_violation_statistics(
+            from_date=date.fromisoformat(from_date) if from_date else None,
+            to_date=date.fromisoformat(to_date) if to_date else None,
+            group_by=request.GET.get('groupBy', 'date').split(','),
+            violation=request.GET.get('violation', ''),
+            status=request.GET.get('status', ''),
+        )
+    except ValueError as e:
+        return Response({'detail': str(e)}, status=400)
+    return Response(statistics)
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class TrafficDataConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "traffic_data"
+
+    def ready(self):
+        # 註冊維護地圖快取的 signal handlers
+        from . import signals  # noqa: F401
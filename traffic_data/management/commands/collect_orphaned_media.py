@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+from utils.media_gc_utils import MEDIA_GC_CHUNK_SIZE, MediaSweeper
+
+
+class Command(BaseCommand):
+    help = 'Delete, or quarantine, the media files no longer referenced by any row.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=MEDIA_GC_CHUNK_SIZE,
+                            help='Number of files checked against the database per query.')
+        parser.add_argument('--grace-hours', type=float,
+                            help='Keep files modified within this many hours. Defaults to MEDIA_GC_GRACE_PERIOD.')
+        parser.add_argument('--quarantine', action='store_true',
+                            help='Move orphaned files to the quarantine directory instead of deleting them.')
+        parser.add_argument('--dry-run', action='store_true', help='Count orphaned files without removing them.')
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be positive.')
+        grace_hours = options['grace_hours']
+        if grace_hours is not None and grace_hours < 0:
+            raise CommandError('--grace-hours must not be negative.')
+
+        sweeper = MediaSweeper(
+            grace_period=None if grace_hours is None else grace_hours * 60 * 60,
+            chunk_size=options['chunk_size'],
+            quarantine=options['quarantine'] or None,
+            dry_run=options['dry_run'],
+        )
+        totals = sweeper.sweep()
+        action = 'Quarantined' if sweeper.quarantine else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(
+            f"{action} {totals['collected']} of {totals['scanned']} media files "
+            f"({totals['freed_bytes'] / 1024 / 1024:.1f} MB, {totals['failed']} failed), "
+            f"expired {totals['expired_uploads']} uploads, purged {totals['purged']} quarantined files"
+            f"{' [dry run]' if options['dry_run'] else ''}."
+        ))
@@ -0,0 +1,134 @@
+import time
+import googlemaps
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import F, Q
+from reports.models import TrafficViolation
+from reports.tasks import TRANSIENT_API_STATUSES, TRANSIENT_ERRORS
+from utils.gazetteer_utils import lookup_address
+from utils.geocode_utils import GEOCODE_RATE_KEY, SharedRateLimiter, geocode_address, normalize_address
+from utils.mysql_utils import bulk_update_locations
+
+# Coordinates outside this (south, west, north, east) box are treated as bad
+DEFAULT_BOUNDS = '21.5,118.0,26.5,122.5'
+
+# Returned for an address the Maps API could not answer for now
+RETRY_LATER = object()
+
+
+class Command(BaseCommand):
+    help = 'Geocode the traffic violations with missing or out of bounds coordinates from their address.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500, help='Number of reports read and written per batch.')
+        parser.add_argument('--workers', type=int, default=4, help='Number of concurrent geocoding requests.')
+        parser.add_argument('--rate', type=float, default=getattr(settings, 'GEOCODE_RATE_LIMIT', 10),
+                            help='Maximum Maps API requests per second, shared with the deferred geocoding task.')
+        parser.add_argument('--bounds', default=DEFAULT_BOUNDS,
+                            help='south,west,north,east box valid coordinates must fall in.')
+        parser.add_argument('--dry-run', action='store_true', help='Geocode without writing the results.')
+
+    def handle(self, *args, **options):
+        try:
+            south, west, north, east = (float(value) for value in options['bounds'].split(','))
+        except ValueError:
+            raise CommandError('--bounds must be four comma separated numbers: south,west,north,east.')
+        if options['workers'] < 1 or options['rate'] <= 0:
+            raise CommandError('--workers and --rate must be positive.')
+
+        # 與延遲地理編碼任務共用 API 配額
+        self.rate_limiter = SharedRateLimiter(GEOCODE_RATE_KEY, options['rate'])
+        violations = TrafficViolation.objects.exclude(address=None).exclude(address='').filter(
+            Q(latitude=None) | Q(longtitude=None)
+            | ~Q(latitude__range=(south, north), longtitude__range=(west, east))
+        ).only(
+            'traffic_violation_id', 'address', 'latitude', 'longtitude', 'user_input_type',
+            'date', 'violation', 'status', 'geocode_status',
+        ).order_by('traffic_violation_id')
+
+        totals = {'reports': 0, 'addresses': 0, 'located': 0, 'unresolved': 0, 'deferred': 0}
+        started = time.monotonic()
+        last_id = None
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            while True:
+                batch = violations if last_id is None else violations.filter(traffic_violation_id__gt=last_id)
+                batch = list(batch[:options['chunk_size']])
+                if not batch:
+                    break
+                last_id = batch[-1].pk
+
+                # 相同地址只查詢一次
+                addresses = {}
+                for violation in batch:
+                    addresses.setdefault(normalize_address(violation.address), violation.address)
+                locations = dict(zip(addresses, executor.map(self.geocode, addresses.values())))
+
+                located, unresolved = [], []
+                previous_locations = {}
+                for violation in batch:
+                    location = locations[normalize_address(violation.address)]
+                    if location is RETRY_LATER:
+                        # API 暫時無法回應，保留原狀待下次重試
+                        totals['deferred'] += 1
+                        continue
+                    if location is None:
+                        unresolved.append(violation.pk)
+                        continue
+                    previous_locations[violation.pk] = (violation.latitude, violation.longtitude)
+                    violation.latitude, violation.longtitude = location
+                    violation.user_input_type = violation.user_input_type or 'address'
+                    violation.geocode_status = TrafficViolation.GEOCODE_DONE
+                    located.append(violation)
+
+                if not options['dry_run']:
+                    if located:
+                        bulk_update_locations(located, previous_locations, ['user_input_type', 'geocode_status'])
+                    if unresolved:
+                        TrafficViolation.objects.filter(traffic_violation_id__in=unresolved).update(
+                            geocode_status=TrafficViolation.GEOCODE_FAILED,
+                            geocode_attempts=F('geocode_attempts') + 1,
+                        )
+
+                totals['reports'] += len(batch)
+                totals['addresses'] += len(addresses)
+                totals['located'] += len(located)
+                totals['unresolved'] += len(unresolved)
+                self.report_progress(totals, started)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Geocoded {totals['located']} of {totals['reports']} reports "
+            f"({totals['unresolved']} unresolved, {totals['deferred']} left for a later run)"
+            f"{' [dry run]' if options['dry_run'] else ''}."
+        ))
+
+    def geocode(self, address):
+        """
+        Geocode an address from the gazetteer, the geocoding caches or the
+        rate limited Maps API. Returns None when the address is not found,
+        and RETRY_LATER when the API is over its quota or unreachable.
+        """
+        try:
+            location = lookup_address(address)
+            if location is None:
+                lat, lng = geocode_address(address, self.rate_limiter)
+                location = (lat, lng) if lat is not None and lng is not None else None
+            return location
+        except TRANSIENT_ERRORS as e:
+            self.stderr.write(f'Could not geocode {address} for now: {e}')
+            return RETRY_LATER
+        except googlemaps.exceptions.ApiError as e:
+            self.stderr.write(f'Could not geocode {address}: {e}')
+            return RETRY_LATER if e.status in TRANSIENT_API_STATUSES else None
+        finally:
+            # Worker threads each hold their own database connection
+            connections.close_all()
+
+    def report_progress(self, totals, started):
+        elapsed = max(time.monotonic() - started, 1e-6)
+        self.stdout.write(
+            f"{totals['reports']} reports, {totals['addresses']} distinct addresses, "
+            f"{totals['located']} located, {totals['unresolved']} unresolved "
+            f"({totals['reports'] / elapsed:.1f} reports/s, {totals['addresses'] / elapsed:.1f} addresses/s)"
+        )
@@ -0,0 +1,50 @@
+import csv
+import json
+import time
+from django.core.management.base import BaseCommand, CommandError
+from utils.import_utils import IMPORT_BATCH_SIZE, ReportImporter, detect_import_format
+
+
+class Command(BaseCommand):
+    help = 'Import traffic violation reports from a CSV or JSONL file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='The CSV or JSONL file to import.')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='File format, guessed from the extension by default.')
+        parser.add_argument('--username', required=True, help='User the reports are filed under.')
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE, help='Number of rows inserted per transaction.')
+        parser.add_argument('--defer-geocoding', action='store_true', default=None,
+                            help='Leave the locations to the background geocoding task.')
+        parser.add_argument('--errors', help='Write the per-row error report to this CSV file.')
+
+    def handle(self, *args, **options):
+        try:
+            import_format = detect_import_format(options['path'], options['format'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive.')
+
+        importer = ReportImporter(options['username'], options['batch_size'], options['defer_geocoding'])
+        started = time.monotonic()
+        try:
+            with open(options['path'], 'rb') as file:
+                result = importer.import_file(file, import_format)
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Could not read {options['path']}: {e}")
+        elapsed = max(time.monotonic() - started, 1e-6)
+
+        if options['errors']:
+            with open(options['errors'], 'w', encoding='utf-8', newline='') as file:
+                writer = csv.writer(file)
+                writer.writerow(['row', 'errors'])
+                for error in result['errors']:
+                    writer.writerow([error['row'], json.dumps(error['errors'], ensure_ascii=False)])
+        else:
+            for error in result['errors']:
+                self.stderr.write(f"Row {error['row']}: {json.dumps(error['errors'], ensure_ascii=False)}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result['created']} reports, {result['failed']} rows failed "
+            f"({(result['created'] + result['failed']) / elapsed:.0f} rows/s)."
+        ))
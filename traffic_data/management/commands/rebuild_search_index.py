@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from reports.models import TrafficViolation
+from utils.mysql_utils import SEARCH_FIELDS, update_search_tokens
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the keyword search tokens of every traffic violation.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Number of reports indexed per batch.')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        violations = TrafficViolation.objects.only('traffic_violation_id', *SEARCH_FIELDS).order_by('traffic_violation_id')
+
+        indexed = 0
+        last_id = None
+        while True:
+            batch = violations if last_id is None else violations.filter(traffic_violation_id__gt=last_id)
+            batch = list(batch[:chunk_size])
+            if not batch:
+                break
+
+            update_search_tokens(batch)
+            indexed += len(batch)
+            last_id = batch[-1].pk
+            self.stdout.write(f'Indexed {indexed} reports...')
+
+        self.stdout.write(self.style.SUCCESS(f'Search index rebuilt for {indexed} reports.'))
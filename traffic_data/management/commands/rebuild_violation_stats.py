@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from utils.mysql_utils import rebuild_daily_stats
+
+
+class Command(BaseCommand):
+    help = 'Recompute the daily violation statistics from every traffic violation.'
+
+    def handle(self, *args, **options):
+        buckets = rebuild_daily_stats()
+        self.stdout.write(self.style.SUCCESS(f'Daily violation statistics rebuilt into {buckets} buckets.'))
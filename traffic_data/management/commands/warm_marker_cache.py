@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.http import HttpRequest, QueryDict
+from traffic_data.views import traffic_violation_markers_view
+from utils.cache_utils import is_shared_cache
+
+
+class Command(BaseCommand):
+    help = 'Pre-build the marker snapshots served by /traffic-violation-markers/ for the current dataset version.'
+
+    def handle(self, *args, **options):
+        if not is_shared_cache():
+            # 行程內快取會隨指令結束而消失
+            self.stdout.write(self.style.WARNING('The cache is per-process, so there is nothing to warm.'))
+            return
+
+        for query_string in ('', 'format=packed'):
+            request = HttpRequest()
+            request.method = 'GET'
+            request.GET = QueryDict(query_string)
+            response = traffic_violation_markers_view(request)
+            self.stdout.write(f'?{query_string}: {len(response.content)} bytes')
+
+        self.stdout.write(self.style.SUCCESS('Marker snapshots warmed.'))
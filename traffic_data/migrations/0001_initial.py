@@ -0,0 +1,45 @@
+# Generated by Django 5.0.1 on 2026-10-18 15:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    initial = True
+
+    dependencies = [
+        ("reports", "0008_trafficviolation_keyset_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TrafficViolationSearchToken",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("token", models.CharField(max_length=8)),
+                (
+                    "traffic_violation",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="search_tokens",
+                        to="reports.trafficviolation",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="trafficviolationsearchtoken",
+            constraint=models.UniqueConstraint(
+                fields=("token", "traffic_violation"),
+                name="traffic_data_token_violation_uniq",
+            ),
+        ),
+    ]
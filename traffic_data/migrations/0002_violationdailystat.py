@@ -0,0 +1,58 @@
+# Generated by Django 5.0.1 on 2026-10-18 15:07
+
+from django.db import migrations, models
+from django.db.models import Count, Value
+from django.db.models.functions import Coalesce, Substr
+
+
+def populate_daily_stats(apps, schema_editor):
+    TrafficViolation = apps.get_model("reports", "TrafficViolation")
+    ViolationDailyStat = apps.get_model("traffic_data", "ViolationDailyStat")
+    buckets = (
+        TrafficViolation.objects.annotate(
+            grid_cell=Substr(Coalesce("geohash", Value("")), 1, 5)
+        )
+        .values("date", "violation", "status", "grid_cell")
+        .annotate(count=Count("traffic_violation_id"))
+        .order_by()
+    )
+    ViolationDailyStat.objects.bulk_create(
+        (ViolationDailyStat(**bucket) for bucket in buckets.iterator()),
+        batch_size=5000,
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("traffic_data", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ViolationDailyStat",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField()),
+                ("violation", models.CharField(max_length=100)),
+                ("status", models.CharField(max_length=50)),
+                ("grid_cell", models.CharField(blank=True, default="", max_length=12)),
+                ("count", models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="violationdailystat",
+            constraint=models.UniqueConstraint(
+                fields=("date", "violation", "status", "grid_cell"),
+                name="traffic_data_daily_stat_uniq",
+            ),
+        ),
+        migrations.RunPython(populate_daily_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.0.1 on 2026-10-18 15:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("traffic_data", "0002_violationdailystat"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="HotSpot",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("latitude", models.FloatField()),
+                ("longtitude", models.FloatField()),
+                ("polygon", models.JSONField(default=list)),
+                ("count", models.IntegerField()),
+                ("dominant_violation", models.CharField(max_length=100)),
+                ("violation_counts", models.JSONField(default=dict)),
+                ("window_start", models.DateField()),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "ordering": ["-count"],
+            },
+        ),
+    ]
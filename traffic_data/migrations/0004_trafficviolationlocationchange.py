@@ -0,0 +1,30 @@
+# Generated by Django 5.0.1 on 2026-10-18 16:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("traffic_data", "0003_hotspot"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TrafficViolationLocationChange",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("traffic_violation_id", models.UUIDField()),
+                ("latitude", models.FloatField(null=True)),
+                ("longtitude", models.FloatField(null=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.0.1 on 2026-10-18 18:40
+
+from django.db import migrations
+
+from utils.search_utils import tokenize_fields
+
+SEARCH_FIELDS = ("license_plate", "violation", "address", "officer")
+
+
+def populate_search_tokens(apps, schema_editor):
+    TrafficViolation = apps.get_model("reports", "TrafficViolation")
+    TrafficViolationSearchToken = apps.get_model("traffic_data", "TrafficViolationSearchToken")
+    violations = TrafficViolation.objects.values_list("traffic_violation_id", *SEARCH_FIELDS)
+    batch = []
+    for traffic_violation_id, *values in violations.iterator(chunk_size=2000):
+        batch.extend(
+            TrafficViolationSearchToken(traffic_violation_id=traffic_violation_id, token=token)
+            for token in tokenize_fields(values)
+        )
+        if len(batch) >= 5000:
+            TrafficViolationSearchToken.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    if batch:
+        TrafficViolationSearchToken.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("traffic_data", "0004_trafficviolationlocationchange"),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_search_tokens, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,80 @@
 from django.db import models
+from reports.models import TrafficViolation
+from utils.search_utils import MAX_TOKEN_LENGTH
 
-# Create your models here.
+
+class TrafficViolationSearchToken(models.Model):
+    """
+    An n-gram of a traffic violation's searchable fields (license plate,
+    violation, address and officer), maintained whenever the report is saved.
+    """
+    traffic_violation = models.ForeignKey(
+        TrafficViolation, on_delete=models.CASCADE, related_name='search_tokens'
+    )
+    token = models.CharField(max_length=MAX_TOKEN_LENGTH)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['token', 'traffic_violation'], name='traffic_data_token_violation_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.token} -> {self.traffic_violation_id}"
+
+
+class ViolationDailyStat(models.Model):
+    """
+    The number of reports per day, violation type, status and grid cell,
+    maintained incrementally as reports are created, edited and deleted.
+    """
+    date = models.DateField()
+    violation = models.CharField(max_length=100)
+    status = models.CharField(max_length=50)
+    grid_cell = models.CharField(max_length=12, blank=True, default='')  # geohash 前綴
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['date', 'violation', 'status', 'grid_cell'], name='traffic_data_daily_stat_uniq'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.violation} {self.status} {self.grid_cell}: {self.count}"
+
+
+class HotSpot(models.Model):
+    """
+    A dense area of recent traffic violations, found by the periodic
+    clustering job and replaced wholesale on each run.
+    """
+    latitude = models.FloatField()
+    longtitude = models.FloatField()
+    polygon = models.JSONField(default=list)  # 凸包頂點 [lat, lng]
+    count = models.IntegerField()
+    dominant_violation = models.CharField(max_length=100)
+    violation_counts = models.JSONField(default=dict)
+    window_start = models.DateField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-count']
+
+    def __str__(self):
+        return f"{self.dominant_violation} ({self.count}) @ {self.latitude}, {self.longtitude}"
+
+
+class TrafficViolationLocationChange(models.Model):
+    """
+    A report created, moved or deleted, logged with its new coordinates
+    (none once deleted) so that every process can catch its in-process
+    nearest neighbour index up without rebuilding it.
+    """
+    traffic_violation_id = models.UUIDField()
+    latitude = models.FloatField(null=True)
+    longtitude = models.FloatField(null=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.traffic_violation_id} -> {self.latitude}, {self.longtitude}"
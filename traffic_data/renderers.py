@@ -0,0 +1,26 @@
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from utils.packed_utils import PACKED_CONTENT_TYPE
+
+
+class PackedMarkerRenderer(BaseRenderer):
+    """
+    Renders the compact binary marker payload built by utils.packed_utils.
+
+    Selected with `?format=packed` or `Accept: application/octet-stream`.
+    Anything else, such as errors and paginated pages, is rendered as JSON
+    and labelled `application/json` so clients do not try to unpack it.
+    """
+    media_type = PACKED_CONTENT_TYPE
+    format = 'packed'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, (bytes, bytearray)):
+            return data
+        # 錯誤訊息等非標記資料仍以 JSON 輸出，並標示為 JSON
+        renderer = JSONRenderer()
+        response = (renderer_context or {}).get('response')
+        if response is not None:
+            response['Content-Type'] = renderer.media_type
+        return renderer.render(data, renderer.media_type, renderer_context)
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from reports.models import TrafficViolation
+from .models import HotSpot
 
 class TrafficViolationSerializer(serializers.ModelSerializer):
     class Meta:
@@ -7,8 +8,17 @@ class TrafficViolationSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 class TrafficViolationMarkerSerializer(serializers.Serializer):
-    traffic_violation_id = serializers.UUIDField()
-    license_plate = serializers.CharField()
-    violation = serializers.CharField()
+    # 聚合標記只有 lat、lng 與 count
+    traffic_violation_id = serializers.UUIDField(required=False)
+    license_plate = serializers.CharField(required=False)
+    violation = serializers.CharField(required=False)
     lat = serializers.FloatField()
-    lng = serializers.FloatField()
\ No newline at end of file
+    lng = serializers.FloatField()
+    count = serializers.IntegerField(required=False)
+    distance = serializers.FloatField(required=False)
+
+class HotSpotSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = HotSpot
+        fields = ['latitude', 'longtitude', 'polygon', 'count', 'dominant_violation', 'violation_counts',
+                  'window_start', 'created_at']
@@ -0,0 +1,130 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from reports.models import TrafficViolation
+from reports.signals import traffic_violations_bulk_created
+from utils.cache_utils import bump_marker_version, invalidate_tiles_around
+from utils.nearby_utils import log_location_changes
+from utils.mysql_utils import (SEARCH_FIELDS, adjust_daily_stats, count_daily_stats, daily_stat_key,
+                               update_search_tokens)
+
+
+def refresh_marker_caches(points):
+    """
+    Retire the marker snapshots and drop the cached tiles around changed reports.
+
+    Args:
+        points: The (latitude, longitude) of the created, edited or removed reports.
+    """
+    bump_marker_version()
+    invalidate_tiles_around(points)
+
+
+@receiver(pre_save, sender=TrafficViolation)
+def remember_previous_state(sender, instance, **kwargs):
+    """
+    Keep the stored coordinates and statistics bucket of an edited report so
+    the tiles and daily counts it is moving out of can be updated as well.
+    """
+    instance._previous_location = None
+    instance._previous_stat_key = None
+    if not instance._state.adding:
+        previous = sender.objects.filter(pk=instance.pk).values_list(
+            'latitude', 'longtitude', 'date', 'violation', 'status', 'geohash'
+        ).first()
+        if previous:
+            instance._previous_location = previous[:2]
+            instance._previous_stat_key = daily_stat_key(*previous[2:])
+
+
+@receiver(post_save, sender=TrafficViolation)
+def traffic_violation_saved(sender, instance, **kwargs):
+    """
+    Retire the marker snapshots and invalidate the cached map tiles around a
+    created or edited report once the change is committed, so a response
+    rebuilt meanwhile from the uncommitted rows is not left cached.
+    """
+    points = [(instance.latitude, instance.longtitude)]
+    previous_location = getattr(instance, '_previous_location', None)
+    if previous_location and previous_location != points[0]:
+        points.append(previous_location)
+    transaction.on_commit(lambda: refresh_marker_caches(points))
+
+
+@receiver(post_delete, sender=TrafficViolation)
+def traffic_violation_deleted(sender, instance, **kwargs):
+    """
+    Retire the marker snapshots and invalidate the cached map tiles around a
+    deleted report once the deletion is committed.
+    """
+    points = [(instance.latitude, instance.longtitude)]
+    transaction.on_commit(lambda: refresh_marker_caches(points))
+
+
+@receiver(post_save, sender=TrafficViolation)
+def index_search_tokens(sender, instance, update_fields=None, **kwargs):
+    """
+    Refresh the keyword search tokens of a created or edited report.
+    """
+    if update_fields is not None and not set(SEARCH_FIELDS) & set(update_fields):
+        return
+    update_search_tokens([instance])
+
+
+@receiver(post_save, sender=TrafficViolation)
+def count_daily_stats_saved(sender, instance, **kwargs):
+    """
+    Move a created or edited report into its daily statistics bucket.
+    """
+    current = daily_stat_key(instance.date, instance.violation, instance.status, instance.geohash)
+    previous = getattr(instance, '_previous_stat_key', None)
+    if previous == current:
+        return
+
+    deltas = {current: 1}
+    if previous:
+        deltas[previous] = -1
+    adjust_daily_stats(deltas)
+
+
+@receiver(post_delete, sender=TrafficViolation)
+def count_daily_stats_deleted(sender, instance, **kwargs):
+    """
+    Remove a deleted report from its daily statistics bucket.
+    """
+    adjust_daily_stats({
+        daily_stat_key(instance.date, instance.violation, instance.status, instance.geohash): -1
+    })
+
+
+@receiver(post_save, sender=TrafficViolation)
+def log_location_saved(sender, instance, **kwargs):
+    """
+    Log a created or moved report for the nearest neighbour indexes.
+    """
+    location = (instance.latitude, instance.longtitude)
+    if (getattr(instance, '_previous_location', None) or (None, None)) != location:
+        log_location_changes([(instance.pk, *location)])
+
+
+@receiver(post_delete, sender=TrafficViolation)
+def log_location_deleted(sender, instance, **kwargs):
+    """
+    Log a deleted report for the nearest neighbour indexes.
+    """
+    log_location_changes([(instance.pk, None, None)])
+
+
+@receiver(traffic_violations_bulk_created, sender=TrafficViolation)
+def traffic_violations_bulk_created_handler(sender, instances, **kwargs):
+    """
+    Do for bulk created reports what the post_save handlers do for a single
+    one: count them, index their search tokens, retire the map caches and
+    log their locations.
+    """
+    adjust_daily_stats(count_daily_stats(instances))
+    update_search_tokens(instances)
+    points = [(instance.latitude, instance.longtitude) for instance in instances]
+    transaction.on_commit(lambda: refresh_marker_caches(points))
+    log_location_changes((instance.pk, instance.latitude, instance.longtitude) for instance in instances
+                         if instance.latitude is not None and instance.longtitude is not None)
@@ -0,0 +1,6 @@
+from celery import shared_task
+from utils.hotspot_utils import refresh_hot_spots
+
+@shared_task
+def detect_traffic_violation_hot_spots():
+    return refresh_hot_spots()
@@ -1,11 +1,14 @@
+import datetime
 import unittest
 from unittest.mock import MagicMock, patch
 
-from django.http import JsonResponse
-from django.test import RequestFactory
+from django.http import JsonResponse, StreamingHttpResponse
+from django.test import RequestFactory, TestCase
+from reports.models import TrafficViolation
 from traffic_data.views import (search_traffic_violations_view,
                                 traffic_violation_details_view,
-                                traffic_violation_markers_view)
+                                traffic_violation_markers_view,
+                                traffic_violation_tile_view)
 
 
 class TrafficDataViewTest(unittest.TestCase):
@@ -35,3 +38,64 @@ class TrafficDataViewTest(unittest.TestCase):
         request = self.factory.get('/traffic_violation_details_view')
         response = traffic_violation_details_view(request, 'test_id')
         self.assertIsInstance(response, JsonResponse)
+
+    @patch('traffic_data.views.get_traffic_violation_tile', new_callable=MagicMock)
+    def test_traffic_violation_tile_view(self, mock_get_traffic_violation_tile):
+        mock_get_traffic_violation_tile.return_value = []
+        request = self.factory.get('/traffic-violation-tiles/8/214/109/')
+        response = traffic_violation_tile_view(request, 8, 214, 109)
+        self.assertIsInstance(response, JsonResponse)
+        self.assertIn('public', response['Cache-Control'])
+        mock_get_traffic_violation_tile.assert_called_once_with(8, 214, 109, False)
+
+    @patch('traffic_data.views.is_shared_cache', return_value=True)
+    @patch('traffic_data.views.get_marker_version', return_value=7)
+    @patch('traffic_data.views.get_traffic_violation_markers', new_callable=MagicMock)
+    def test_traffic_violation_markers_view_not_modified(self, mock_get_traffic_violation_markers,
+                                                         mock_get_marker_version, mock_is_shared_cache):
+        mock_get_traffic_violation_markers.return_value = []
+        response = traffic_violation_markers_view(self.factory.get('/traffic-violation-markers/'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['ETag'].startswith('"7-'))
+
+        request = self.factory.get('/traffic-violation-markers/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(traffic_violation_markers_view(request).status_code, 304)
+
+    @patch('traffic_data.views.is_shared_cache', return_value=False)
+    @patch('traffic_data.views.get_traffic_violation_markers', new_callable=MagicMock)
+    def test_traffic_violation_markers_view_per_process_cache(self, mock_get_traffic_violation_markers,
+                                                              mock_is_shared_cache):
+        mock_get_traffic_violation_markers.return_value = []
+        response = traffic_violation_markers_view(self.factory.get('/traffic-violation-markers/'))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('ETag'))
+
+    @patch('traffic_data.views.stream_traffic_violation_markers', return_value=iter(['[', ']']))
+    @patch('traffic_data.views.filter_traffic_violations', new_callable=MagicMock)
+    def test_search_traffic_violations_view_streaming(self, mock_filter_traffic_violations, mock_stream):
+        request = self.factory.get('/search-traffic-violations/', {'stream': '1'})
+        response = search_traffic_violations_view(request)
+        self.assertIsInstance(response, StreamingHttpResponse)
+        self.assertEqual(b''.join(response.streaming_content), b'[]')
+        mock_stream.assert_called_once_with(mock_filter_traffic_violations.return_value)
+
+
+class TrafficViolationSignalTest(TestCase):
+    @patch('traffic_data.signals.invalidate_tiles_around')
+    @patch('traffic_data.signals.bump_marker_version')
+    def test_marker_caches_refreshed_on_commit(self, mock_bump_marker_version, mock_invalidate_tiles_around):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            violation = TrafficViolation.objects.create(
+                license_plate='ABC-1234', date=datetime.date(2024, 1, 1), time=datetime.time(8, 0),
+                violation='紅線停車', status='通過', latitude=25.04, longtitude=121.51,
+            )
+            mock_bump_marker_version.assert_not_called()
+            mock_invalidate_tiles_around.assert_not_called()
+
+        self.assertEqual(len(callbacks), 1)
+        mock_bump_marker_version.assert_called_once_with()
+        mock_invalidate_tiles_around.assert_called_once_with([(25.04, 121.51)])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            violation.delete()
+        self.assertEqual(mock_bump_marker_version.call_count, 2)
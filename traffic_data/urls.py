@@ -8,9 +8,15 @@ urlpatterns = [
     path('traffic-violation-details/<str:traffic_violation_id>/', views.traffic_violation_details_view, name='traffic-violation-details'),
     path('search-traffic-violations/', views.search_traffic_violations_view, name='search-traffic-violations'),
     path('traffic-violation-markers/', views.traffic_violation_markers_view, name='traffic-violation-markers'),
+    path('traffic-violation-tiles/<int:z>/<int:x>/<int:y>/', views.traffic_violation_tile_view, name='traffic-violation-tiles'),
     
     # API path
     path('api/search-traffic-violations/', api_views.search_traffic_violations_api, name='api_search_traffic_violations'),
     path('api/traffic-violation-markers/', api_views.traffic_violation_markers_api, name='api_traffic_violation_markers'),
+    path('api/traffic-violations-nearby/', api_views.traffic_violations_nearby_api, name='api_traffic_violations_nearby'),
+    path('api/traffic-violation-hot-spots/', api_views.traffic_violation_hot_spots_api, name='api_traffic_violation_hot_spots'),
+    path('api/traffic-violation-heatmap/', api_views.traffic_violation_heatmap_api, name='api_traffic_violation_heatmap'),
+    path('api/traffic-violation-details/', api_views.traffic_violation_details_batch_api, name='api_traffic_violation_details_batch'),
     path('api/traffic-violation-details/<uuid:traffic_violation_id>/', api_views.traffic_violation_details_api, name='api_traffic_violation_details'),
+    path('api/traffic-violation-statistics/', api_views.traffic_violation_statistics_api, name='api_traffic_violation_statistics'),
 ]
\ No newline at end of file
@@ -1,27 +1,108 @@
+import hashlib
 from django.shortcuts import render
-from django.http import JsonResponse
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
 from django.conf import settings
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import condition
+from reports.models import TrafficViolation
 from utils.mysql_utils import (
+    filter_traffic_violations,
     get_traffic_violation_markers,
     get_traffic_violation_details,
+    get_traffic_violation_tile,
+    parse_marker_params,
     search_traffic_violations,
+    stream_traffic_violation_markers,
+    wants_streaming,
 )
+from utils.geo_utils import parse_zoom
+from utils.packed_utils import PACKED_CONTENT_TYPE, wants_packed
+from utils.cache_utils import get_marker_last_modified, get_marker_snapshot, get_marker_version, is_shared_cache
 # Backup mysql to bigquery
 
 
+def markers_response(request, data):
+    """
+    Wrap marker data in a packed binary or JSON response, as negotiated.
+    """
+    if wants_packed(request):
+        response = HttpResponse(data, content_type=PACKED_CONTENT_TYPE)
+    else:
+        response = JsonResponse(data, safe=False)
+    patch_vary_headers(response, ['Accept'])
+    return response
+
+
 def search_traffic_violations_view(request):
     keyword = request.GET.get('keyword', '')
     time_range = request.GET.get('timeRange', 'all')
     from_date = request.GET.get('fromDate', '')
     to_date = request.GET.get('toDate', '')
 
-    data = search_traffic_violations(keyword, time_range, from_date, to_date)
-    return JsonResponse(data, safe=False)
+    try:
+        zoom = parse_zoom(request.GET)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    if wants_streaming(request, zoom) and not wants_packed(request):
+        violations = filter_traffic_violations(keyword, time_range, from_date, to_date)
+        return StreamingHttpResponse(stream_traffic_violation_markers(violations), content_type='application/json')
+
+    data = search_traffic_violations(keyword, time_range, from_date, to_date, zoom, wants_packed(request))
+    return markers_response(request, data)
+
+def marker_request_key(request):
+    """
+    Digest the parameters a marker response depends on, with the viewport
+    snapped so that nearby viewports share one snapshot.
+
+    Raises:
+        ValueError: If the viewport or zoom parameters are invalid.
+    """
+    params = parse_marker_params(request.GET)
+    return hashlib.sha1(f'{params}|{wants_packed(request)}'.encode()).hexdigest()
+
+def marker_etag(request):
+    # 快取僅限單一行程時，其他行程的寫入不會更新版本，不提供 ETag
+    if not is_shared_cache():
+        return None
+    try:
+        return f'{get_marker_version()}-{marker_request_key(request)}'
+    except ValueError:
+        return None
+
+def marker_last_modified(request):
+    if not is_shared_cache():
+        return None
+    return get_marker_last_modified()
 
 # 修改後的 traffic_violation_markers_view
+@condition(etag_func=marker_etag, last_modified_func=marker_last_modified)
 def traffic_violation_markers_view(request):
-    data = get_traffic_violation_markers(request)
-    return JsonResponse(data, safe=False)
+    def build_snapshot():
+        response = markers_response(request, get_traffic_violation_markers(request, wants_packed(request)))
+        return response.content, response['Content-Type']
+
+    # 同一資料版本的標記只查詢與序列化一次
+    try:
+        content, content_type = get_marker_snapshot(marker_request_key(request), build_snapshot)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    response = HttpResponse(content, content_type=content_type)
+    patch_vary_headers(response, ['Accept'])
+    return response
+
+def traffic_violation_tile_view(request, z, x, y):
+    try:
+        data = get_traffic_violation_tile(z, x, y, wants_packed(request))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=404)
+
+    response = markers_response(request, data)
+    # 圖塊可由瀏覽器與 CDN 快取
+    patch_cache_control(response, public=True, max_age=settings.TRAFFIC_VIOLATION_TILE_MAX_AGE)
+    return response
 
 # 修改後的 traffic_violation_details_view
 def traffic_violation_details_view(request, traffic_violation_id):
@@ -29,5 +110,9 @@ def traffic_violation_details_view(request, traffic_violation_id):
     return JsonResponse(data, safe=False)
 
 def home(request):
-    context = {'GOOGLE_MAPS_API_KEY': settings.GOOGLE_MAPS_API_KEY}
+    context = {
+        'GOOGLE_MAPS_API_KEY': settings.GOOGLE_MAPS_API_KEY,
+        # 解碼壓縮標記時將違規代碼對應回違規項目
+        'violation_labels': [value for value, _ in TrafficViolation.VIOLATIONS],
+    }
     return render(request, 'traffic_data/home.html', context)
\ No newline at end of file
@@ -0,0 +1,182 @@
+import json
+from typing import Dict, List, Mapping
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.db import transaction
+from reports.forms import ReportForm
+from reports.models import MediaFile, ReportSubmission, TrafficViolation
+from reports.signals import traffic_violations_bulk_created
+from reports.tasks import queue_media_renditions, queue_pending_geocoding
+from .blob_utils import release_media_blob, store_media_blob
+from .import_utils import ReportImporter
+
+# Largest number of reports accepted in one batch request
+MAX_BATCH_REPORTS = 50
+
+# Result status of each report of a batch
+CREATED, DUPLICATE, INVALID = 'created', 'duplicate', 'invalid'
+
+
+def parse_report_batch(data: Mapping) -> List[dict]:
+    """
+    Get the reports of a batch request.
+
+    Args:
+        data: The request data. `reports` is a JSON array of report objects,
+              sent as a JSON encoded field in multipart requests.
+
+    Returns:
+        The report objects.
+
+    Raises:
+        ValueError: If `reports` is missing, malformed or too long.
+    """
+    reports = data.get('reports')
+    if isinstance(reports, str):
+        try:
+            reports = json.loads(reports)
+        except json.JSONDecodeError:
+            raise ValueError('reports must be a JSON array.')
+    if not isinstance(reports, list) or not reports:
+        raise ValueError('reports must be a non-empty JSON array.')
+    if len(reports) > MAX_BATCH_REPORTS:
+        raise ValueError(f'A batch holds at most {MAX_BATCH_REPORTS} reports.')
+    if not all(isinstance(report, dict) for report in reports):
+        raise ValueError('Each report must be a JSON object.')
+    return reports
+
+
+def clean_idempotency_key(report: dict, seen: set) -> List[str]:
+    """
+    Get the errors of the idempotency key of a report.
+    """
+    key = report.get('idempotency_key')
+    max_length = ReportSubmission._meta.get_field('idempotency_key').max_length
+    if not isinstance(key, str) or not key:
+        return ['This field is required.']
+    if len(key) > max_length:
+        return [f'Ensure this value has at most {max_length} characters.']
+    if key in seen:
+        return ['Duplicate idempotency key in this batch.']
+    seen.add(key)
+    return []
+
+
+def clean_media(report: dict, files: Mapping[str, UploadedFile]) -> tuple:
+    """
+    Get the uploaded files a report refers to by part name in `media`.
+
+    Returns:
+        The uploaded files and the error messages.
+    """
+    names = report.get('media') or []
+    if not isinstance(names, list) or not all(isinstance(name, str) for name in names):
+        return [], ['media must be a list of file part names.']
+
+    max_files = ReportForm.base_fields['media'].max_num
+    if len(names) > max_files:
+        return [], [f'A report holds at most {max_files} media files.']
+    missing = [name for name in names if name not in files]
+    if missing:
+        return [], [f"Missing file part '{name}'." for name in missing]
+    uploads = [files[name] for name in names]
+    if any(upload.size > settings.MEDIA_MAX_FILE_SIZE for upload in uploads):
+        return [], [f'Media files must be at most {settings.MEDIA_MAX_FILE_SIZE} bytes.']
+    return uploads, []
+
+
+def submit_report_batch(username: str, reports: List[dict], files: Mapping[str, UploadedFile]) -> List[Dict]:
+    """
+    Create a batch of reports and their media in one transaction.
+
+    Reports whose idempotency key was already submitted by the user are not
+    created again, so a client can safely replay a batch after a dropped
+    connection. Invalid reports are skipped without failing the others.
+
+    Args:
+        username: The submitting user.
+        reports: The report objects, with the ReportForm fields, a client
+                 generated `idempotency_key` and the `media` file part names.
+        files: The uploaded files by part name.
+
+    Returns:
+        The result of each report, in order, with its `idempotency_key`, its
+        `status` (created, duplicate or invalid) and its `traffic_violation_id`
+        or its `errors`.
+
+    Raises:
+        IntegrityError: If the same keys are submitted concurrently. Nothing
+                        is created and the batch can be replayed.
+    """
+    results = [{'idempotency_key': report.get('idempotency_key')} for report in reports]
+    seen = set()
+    key_errors = [clean_idempotency_key(report, seen) for report in reports]
+
+    existing = dict(ReportSubmission.objects.filter(username=username, idempotency_key__in=seen)
+                    .values_list('idempotency_key', 'traffic_violation_id'))
+
+    importer = ReportImporter(username)
+    accepted = []
+    for index, report in enumerate(reports):
+        if not key_errors[index] and report['idempotency_key'] in existing:
+            results[index].update(status=DUPLICATE, traffic_violation_id=str(existing[report['idempotency_key']]))
+            continue
+
+        cleaned, errors = importer.validator.clean(report)
+        uploads, media_errors = clean_media(report, files)
+        if key_errors[index]:
+            errors['idempotency_key'] = key_errors[index]
+        if media_errors:
+            errors['media'] = media_errors
+        if errors:
+            results[index].update(status=INVALID, errors=errors)
+        else:
+            accepted.append((index, cleaned, uploads))
+
+    importer.resolve_locations(cleaned['location'] for _, cleaned, _ in accepted)
+    created = []
+    for index, cleaned, uploads in accepted:
+        violation = importer.build_violation(cleaned)
+        if violation is None:
+            results[index].update(status=INVALID, errors={'location': ['Location could not be geocoded.']})
+        else:
+            created.append((index, violation, uploads))
+    if not created:
+        return results
+
+    # 媒體先以內容定址儲存並取得參照，交易失敗時釋放
+    blobs = {index: [store_media_blob(upload) for upload in uploads] for index, _, uploads in created}
+    violations = [violation for _, violation, _ in created]
+    try:
+        with transaction.atomic():
+            TrafficViolation.objects.bulk_create(violations)
+            ReportSubmission.objects.bulk_create([
+                ReportSubmission(username=username, idempotency_key=reports[index]['idempotency_key'],
+                                 traffic_violation=violation)
+                for index, violation, _ in created
+            ])
+            media_files = MediaFile.objects.bulk_create([
+                MediaFile(traffic_violation=violation, blob=blob, file=blob.file.name)
+                for index, violation, _ in created
+                for blob in blobs[index]
+            ])
+            traffic_violations_bulk_created.send(sender=TrafficViolation, instances=violations)
+
+            # bulk_create 不會觸發 post_save，改由此排入背景任務
+            names = [media_file.file.name for media_file in media_files]
+            transaction.on_commit(lambda: queue_media_renditions(names))
+            if any(violation.geocode_status == TrafficViolation.GEOCODE_PENDING for violation in violations):
+                transaction.on_commit(queue_pending_geocoding)
+    except Exception:
+        for index_blobs in blobs.values():
+            for blob in index_blobs:
+                release_media_blob(blob.pk)
+        raise
+
+    for index, violation, _ in created:
+        results[index].update(
+            status=CREATED,
+            traffic_violation_id=str(violation.pk),
+            media=[blob.file.url for blob in blobs[index]],
+        )
+    return results
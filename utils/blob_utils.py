@@ -0,0 +1,106 @@
+from typing import Optional
+from django.core.files import File
+from django.db import transaction
+from django.db.models import F
+from reports.models import MediaBlob, MediaFile, TrafficViolation
+from .storage_utils import blob_digest, media_blob_storage
+
+
+def store_media_blob(content: File) -> MediaBlob:
+    """
+    Store a media file by content and take a reference to its blob.
+
+    The file is hashed while it is streamed to disk, so content that is
+    already stored is not kept twice.
+
+    Args:
+        content: The uploaded file.
+
+    Returns:
+        The MediaBlob, with the new reference counted. The caller must attach
+        it to a MediaFile.
+    """
+    name = media_blob_storage.save(content.name, content)
+    with transaction.atomic():
+        # 鎖定 blob 列，與 release_media_blob 刪除資料列互斥
+        blob, _ = MediaBlob.objects.select_for_update().get_or_create(
+            file=name,
+            defaults={'sha256': blob_digest(name), 'size': content.size},
+        )
+        if not media_blob_storage.exists(name):
+            # The orphaned media sweep removed the file between the save and the lock
+            media_blob_storage.save(content.name, content)
+        MediaBlob.objects.filter(pk=blob.pk).update(ref_count=F('ref_count') + 1)
+    return blob
+
+
+def reference_media_blob(sha256: str, size: int) -> Optional[MediaBlob]:
+    """
+    Take a reference to an already stored blob by checksum, so a file the
+    server has seen before does not need to be uploaded again.
+
+    Args:
+        sha256: The hex digest of the file.
+        size: The size of the file, in bytes.
+
+    Returns:
+        The MediaBlob, with the new reference counted, or None if no blob
+        holds this content.
+    """
+    with transaction.atomic():
+        blob = MediaBlob.objects.select_for_update().filter(sha256=sha256, size=size).first()
+        if blob is None or not media_blob_storage.exists(blob.file.name):
+            return None
+        MediaBlob.objects.filter(pk=blob.pk).update(ref_count=F('ref_count') + 1)
+    return blob
+
+
+def release_media_blob(blob_id: int) -> None:
+    """
+    Drop a reference to a blob, deleting it with the last one. The file and
+    its renditions are left to the orphaned media sweep.
+
+    The blob row is locked for both the decrement and the delete, so a
+    concurrent store_media_blob or reference_media_blob either takes its
+    reference first and keeps the blob, or waits and stores it anew. Call
+    it in the transaction deleting the MediaFile, so the reference is
+    dropped exactly when the media file is.
+    """
+    with transaction.atomic():
+        # 鎖定 blob 列，與 store_media_blob、reference_media_blob 互斥
+        blob = MediaBlob.objects.select_for_update().filter(pk=blob_id).first()
+        if blob is None:
+            return
+        if blob.ref_count > 1:
+            MediaBlob.objects.filter(pk=blob.pk).update(ref_count=F('ref_count') - 1)
+        elif blob.media_files.exists():
+            # 計數與實際引用不符時，保留 MediaFile 以 PROTECT 指向的 blob 並修正計數
+            MediaBlob.objects.filter(pk=blob.pk).update(ref_count=blob.media_files.count())
+        else:
+            blob.delete()
+
+
+def create_media_file(traffic_violation: TrafficViolation, blob: MediaBlob) -> MediaFile:
+    """
+    Attach a referenced blob to a report.
+    """
+    return MediaFile.objects.create(traffic_violation=traffic_violation, blob=blob, file=blob.file.name)
+
+
+def attach_media_file(traffic_violation: TrafficViolation, content: File) -> MediaFile:
+    """
+    Store an uploaded media file by content and attach it to a report.
+
+    Args:
+        traffic_violation: The report the media belongs to.
+        content: The uploaded file.
+
+    Returns:
+        The created MediaFile.
+    """
+    blob = store_media_blob(content)
+    try:
+        return create_media_file(traffic_violation, blob)
+    except Exception:
+        release_media_blob(blob.pk)
+        raise
@@ -0,0 +1,206 @@
+import time
+import numpy as np
+from datetime import datetime, timezone
+from typing import Callable, Iterable, Optional, Tuple
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from .geo_utils import MarkerData, points_to_tiles
+
+# Highest zoom level served by the tile endpoint
+MAX_TILE_ZOOM = 20
+
+TILE_CACHE_KEY = 'traffic_violation_tile:{z}:{x}:{y}'
+
+MARKER_VERSION_KEY = 'traffic_violation_markers:version'
+MARKER_MODIFIED_KEY = 'traffic_violation_markers:last_modified'
+MARKER_SNAPSHOT_KEY = 'traffic_violation_markers:{version}:{request_key}'
+HEATMAP_CACHE_KEY = 'traffic_violation_heatmap:{version}:{request_key}'
+
+MEDIA_HASH_VERSION_KEY = 'media_hashes:version'
+
+
+def is_shared_cache() -> bool:
+    """
+    Check whether the cache is shared between processes, so that what one
+    web worker, Celery worker or management command stores or invalidates
+    is seen by every other.
+    """
+    return not isinstance(caches['default'], LocMemCache)
+
+
+def get_tile_cache_timeout() -> int:
+    """
+    Get how long, in seconds, a generated tile stays in the server cache.
+
+    Tiles are invalidated when a report changes, but only in the cache of
+    the process making the change. With a per-process cache, tiles are
+    therefore kept only briefly, bounding how stale they can get.
+    """
+    if not is_shared_cache():
+        return getattr(settings, 'TRAFFIC_VIOLATION_LOCAL_TILE_CACHE_TIMEOUT', 60)
+    return getattr(settings, 'TRAFFIC_VIOLATION_TILE_CACHE_TIMEOUT', 60 * 60 * 24)
+
+
+def get_cached_tile(z: int, x: int, y: int, build: Callable[[], MarkerData]) -> MarkerData:
+    """
+    Get a tile payload from the cache, building and storing it on a miss.
+
+    Args:
+        z: The zoom level of the tile.
+        x: The column of the tile.
+        y: The row of the tile.
+        build: A callable generating the markers of the tile.
+
+    Returns:
+        The markers of the tile.
+    """
+    key = TILE_CACHE_KEY.format(z=z, x=x, y=y)
+    payload = cache.get(key)
+    if payload is None:
+        payload = build()
+        cache.set(key, payload, get_tile_cache_timeout())
+    return payload
+
+
+def invalidate_traffic_violation_tiles(lat: Optional[float], lng: Optional[float]) -> None:
+    """
+    Drop the cached tiles containing a coordinate at every zoom level.
+
+    Args:
+        lat: The latitude of the created, edited or removed report.
+        lng: The longitude of the created, edited or removed report.
+    """
+    invalidate_tiles_around([(lat, lng)])
+
+
+def invalidate_tiles_around(points: Iterable[Tuple[Optional[float], Optional[float]]]) -> None:
+    """
+    Drop the cached tiles containing any of many coordinates at every zoom
+    level, deleting each tile key once.
+
+    Args:
+        points: The (latitude, longitude) of the created, edited or removed reports.
+    """
+    points = np.array([point for point in points if None not in point], dtype=np.float64).reshape(-1, 2)
+    if not len(points):
+        return
+
+    keys = []
+    for z in range(MAX_TILE_ZOOM + 1):
+        for x, y in np.unique(points_to_tiles(points[:, 0], points[:, 1], z), axis=0).tolist():
+            keys.append(TILE_CACHE_KEY.format(z=z, x=x, y=y))
+    cache.delete_many(keys)
+
+
+def get_marker_cache_timeout() -> int:
+    """
+    Get how long, in seconds, a marker snapshot or heatmap stays in the
+    server cache. Like tiles, they are kept only briefly with a per-process
+    cache, which writes made by other processes never retire.
+    """
+    if not is_shared_cache():
+        return getattr(settings, 'TRAFFIC_VIOLATION_LOCAL_TILE_CACHE_TIMEOUT', 60)
+    return getattr(settings, 'TRAFFIC_VIOLATION_MARKER_CACHE_TIMEOUT', 60 * 60)
+
+
+def get_marker_version() -> int:
+    """
+    Get the version of the traffic violation dataset.
+
+    The version is bumped whenever a report is saved or deleted. A missing
+    counter is seeded from the clock, so a counter evicted from the cache
+    never falls back to the number of an older snapshot.
+
+    Returns:
+        The current dataset version.
+    """
+    version = cache.get(MARKER_VERSION_KEY)
+    if version is None:
+        cache.add(MARKER_VERSION_KEY, int(time.time() * 1000), None)
+        version = cache.get(MARKER_VERSION_KEY)
+    return version
+
+
+def bump_marker_version() -> None:
+    """
+    Mark the traffic violation dataset as changed, retiring every cached
+    marker snapshot.
+    """
+    try:
+        cache.incr(MARKER_VERSION_KEY)
+    except ValueError:
+        get_marker_version()
+    cache.set(MARKER_MODIFIED_KEY, time.time(), None)
+
+
+def get_marker_last_modified() -> Optional[datetime]:
+    """
+    Get when the traffic violation dataset last changed, if known.
+    """
+    timestamp = cache.get(MARKER_MODIFIED_KEY)
+    if timestamp is None:
+        return None
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc)
+
+
+def get_media_hash_version() -> int:
+    """
+    Get the version of the perceptual hashes of the stored media, bumped
+    whenever a blob is hashed. Seeded from the clock like the marker version.
+    """
+    version = cache.get(MEDIA_HASH_VERSION_KEY)
+    if version is None:
+        cache.add(MEDIA_HASH_VERSION_KEY, int(time.time() * 1000), None)
+        version = cache.get(MEDIA_HASH_VERSION_KEY)
+    return version
+
+
+def bump_media_hash_version() -> None:
+    """
+    Mark new perceptual hashes as stored, so every process catches up its index.
+    """
+    try:
+        cache.incr(MEDIA_HASH_VERSION_KEY)
+    except ValueError:
+        get_media_hash_version()
+
+
+def get_marker_snapshot(request_key: str, build: Callable[[], tuple]) -> tuple:
+    """
+    Get a pre-serialised marker response for the current dataset version,
+    building and storing it on a miss.
+
+    Args:
+        request_key: A digest of the parameters the response depends on.
+        build: A callable returning the (content, content type) of the response.
+
+    Returns:
+        A tuple of the response content and its content type.
+    """
+    key = MARKER_SNAPSHOT_KEY.format(version=get_marker_version(), request_key=request_key)
+    snapshot = cache.get(key)
+    if snapshot is None:
+        snapshot = build()
+        cache.set(key, snapshot, get_marker_cache_timeout())
+    return snapshot
+
+
+def get_cached_heatmap(request_key: str, build: Callable[[], dict]) -> dict:
+    """
+    Get a heatmap for the current dataset version, building and storing it
+    on a miss.
+
+    Args:
+        request_key: A digest of the parameters the heatmap depends on.
+        build: A callable generating the heatmap.
+
+    Returns:
+        The heatmap.
+    """
+    key = HEATMAP_CACHE_KEY.format(version=get_marker_version(), request_key=request_key)
+    heatmap = cache.get(key)
+    if heatmap is None:
+        heatmap = build()
+        cache.set(key, heatmap, get_marker_cache_timeout())
+    return heatmap
@@ -0,0 +1,77 @@
+from typing import Iterable, List
+import numpy as np
+from reports.models import MediaFile, TrafficViolation
+from .nearby_utils import chord_to_metres, to_unit_vectors
+from .phash_utils import media_hash_index
+
+# Largest Hamming distance between the perceptual hashes of two copies of a photo
+DUPLICATE_HASH_DISTANCE = 10
+
+# Reports further apart than this many metres are not the same incident
+DUPLICATE_RADIUS_M = 200
+
+
+def find_duplicate_reports(traffic_violation: TrafficViolation, hashes: Iterable[int]) -> List[dict]:
+    """
+    Find the reports that likely describe the same incident as a new report.
+
+    A report is a likely duplicate if it has a near-identical photo or video
+    frame and shares the plate, the date or the location, or if it has the
+    same plate on the same date, close by or without coordinates.
+
+    Args:
+        traffic_violation: The new report.
+        hashes: The perceptual hashes of its media.
+
+    Returns:
+        A list of dictionaries with the `traffic_violation_id`,
+        `license_plate` and `date` of each likely duplicate, and the
+        `reasons` it was flagged for, oldest first.
+    """
+    blob_ids = media_hash_index.query(hashes, DUPLICATE_HASH_DISTANCE)
+    photo_matches = set()
+    if blob_ids:
+        photo_matches = set(MediaFile.objects.filter(blob_id__in=blob_ids)
+                            .exclude(traffic_violation=None)
+                            .values_list('traffic_violation_id', flat=True))
+
+    same_plate = TrafficViolation.objects.filter(
+        license_plate=traffic_violation.license_plate, date=traffic_violation.date,
+    ).values_list('traffic_violation_id', flat=True)
+    candidates = (photo_matches | set(same_plate)) - {traffic_violation.pk}
+    if not candidates:
+        return []
+
+    located = traffic_violation.latitude is not None and traffic_violation.longtitude is not None
+    point = to_unit_vectors([traffic_violation.latitude], [traffic_violation.longtitude])[0] if located else None
+
+    duplicates = []
+    rows = TrafficViolation.objects.filter(traffic_violation_id__in=candidates).order_by('date', 'time').values_list(
+        'traffic_violation_id', 'license_plate', 'date', 'latitude', 'longtitude')
+    for traffic_violation_id, license_plate, date, lat, lng in rows:
+        reasons = []
+        if traffic_violation_id in photo_matches:
+            reasons.append('photo')
+        if license_plate == traffic_violation.license_plate:
+            reasons.append('plate')
+        if date == traffic_violation.date:
+            reasons.append('date')
+        nearby = None
+        if located and lat is not None and lng is not None:
+            distance = chord_to_metres(float(np.linalg.norm(to_unit_vectors([lat], [lng])[0] - point)))
+            nearby = distance <= DUPLICATE_RADIUS_M
+            if nearby:
+                reasons.append('location')
+
+        if 'photo' in reasons:
+            likely = len(reasons) > 1
+        else:
+            likely = 'plate' in reasons and 'date' in reasons and nearby is not False
+        if likely:
+            duplicates.append({
+                'traffic_violation_id': str(traffic_violation_id),
+                'license_plate': license_plate,
+                'date': date,
+                'reasons': reasons,
+            })
+    return duplicates
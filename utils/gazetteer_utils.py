@@ -0,0 +1,207 @@
+import csv
+import re
+import numpy as np
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+from django.conf import settings
+from .geocode_utils import normalize_address
+
+# Address components, from the coarsest to the finest, used as trie levels
+CITY, DISTRICT, ROAD, SECTION = 'city', 'district', 'road', 'section'
+LEVELS = (CITY, DISTRICT, ROAD, SECTION)
+
+CHINESE_DIGITS = {'零': 0, '〇': 0, '一': 1, '二': 2, '三': 3, '四': 4, '五': 5, '六': 6, '七': 7, '八': 8, '九': 9}
+
+ADDRESS_PATTERN = re.compile(
+    r'^(?:\d{3,6})?'
+    r'(?:台灣|台湾)?'
+    r'(?P<city>[^縣市]{2}[縣市])?'
+    r'(?P<district>[^鄉鎮市區]{1,3}?[鄉鎮市區])?'
+    r'(?P<road>[^路街道段巷弄號]+?(?:路|街|大道))'
+    r'(?:(?P<section>[\d一二三四五六七八九十]+)段)?'
+    r'(?:(?P<lane>\d+)巷)?'
+    r'(?:(?P<alley>\d+)弄)?'
+    r'(?:(?P<number>\d+)(?:之\d+)?號)?'
+)
+
+
+def chinese_to_int(value: str) -> int:
+    """
+    Convert a small Arabic or Chinese numeral, such as '12' or '十二', to an int.
+    """
+    if value.isdigit():
+        return int(value)
+    if '十' in value:
+        tens, _, units = value.partition('十')
+        return CHINESE_DIGITS.get(tens, 1) * 10 + CHINESE_DIGITS.get(units, 0)
+    return CHINESE_DIGITS[value]
+
+
+def parse_address(address: str) -> Optional[Dict[str, object]]:
+    """
+    Split a Taiwanese address into its 縣市/區/路/段/巷/弄/號 components.
+
+    Args:
+        address: The address to parse.
+
+    Returns:
+        A dictionary of the components found, with the section, lane, alley
+        and number as integers, or None if no road could be recognised.
+    """
+    match = ADDRESS_PATTERN.match(normalize_address(address))
+    if not match:
+        return None
+
+    components = {key: value for key, value in match.groupdict().items() if value}
+    for key in ('section', 'lane', 'alley', 'number'):
+        if key in components:
+            components[key] = chinese_to_int(components[key])
+    return components
+
+
+class RoadSegment:
+    """
+    The known house numbers along a road section and their coordinates,
+    interpolated linearly for the numbers in between.
+    """
+
+    def __init__(self):
+        self.anchors = []
+
+    def add(self, number: int, lat: float, lng: float) -> None:
+        self.anchors.append((number, lat, lng))
+
+    def freeze(self) -> None:
+        anchors = np.array(sorted(self.anchors), dtype=np.float64).reshape(-1, 3)
+        self.numbers, self.lats, self.lngs = anchors[:, 0], anchors[:, 1], anchors[:, 2]
+
+    def locate(self, number: Optional[int] = None) -> Tuple[float, float]:
+        """
+        Get the coordinates of a house number, or of the middle of the road
+        if no number is given.
+        """
+        if number is None:
+            return float(self.lats.mean()), float(self.lngs.mean())
+        return float(np.interp(number, self.numbers, self.lats)), float(np.interp(number, self.numbers, self.lngs))
+
+
+class GazetteerNode:
+    __slots__ = ('children', 'segment')
+
+    def __init__(self):
+        self.children = {}
+        self.segment = None
+
+
+class Gazetteer:
+    """
+    A trie of road sections keyed on 縣市 → 區 → 路 → 段.
+
+    Lookups skip the levels an address leaves out, such as the city, as long
+    as the rest of the address leads to a single road section.
+    """
+
+    def __init__(self):
+        self.root = GazetteerNode()
+        self.size = 0
+
+    def add(self, city: str, district: str, road: str, section: Optional[int], number: int,
+            lat: float, lng: float) -> None:
+        node = self.root
+        for key in (normalize_address(city), normalize_address(district), normalize_address(road), section or 0):
+            node = node.children.setdefault(key, GazetteerNode())
+        if node.segment is None:
+            node.segment = RoadSegment()
+            self.size += 1
+        node.segment.add(number, lat, lng)
+
+    def freeze(self) -> None:
+        """
+        Prepare the road sections for lookups once every anchor is added.
+        """
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            if node.segment is not None:
+                node.segment.freeze()
+            stack.extend(node.children.values())
+
+    def find(self, components: Dict[str, object]) -> Optional[RoadSegment]:
+        """
+        Find the road section matching parsed address components.
+
+        Returns:
+            The RoadSegment, or None if there is no match or the match is ambiguous.
+        """
+        nodes = [self.root]
+        for level in LEVELS:
+            key = components.get(level, 0 if level == SECTION else None)
+            if key is None:
+                nodes = [child for node in nodes for child in node.children.values()]
+            else:
+                nodes = [node.children[key] for node in nodes if key in node.children]
+            if not nodes:
+                return None
+
+        segments = [node.segment for node in nodes if node.segment is not None]
+        return segments[0] if len(segments) == 1 else None
+
+    def lookup(self, address: str) -> Optional[Tuple[float, float]]:
+        """
+        Geocode an address from the gazetteer.
+
+        The lane number stands in for the house number of addresses in a
+        lane, as lanes are numbered after the house where they branch off.
+
+        Args:
+            address: The address to geocode.
+
+        Returns:
+            The interpolated latitude and longitude, or None if the road is unknown.
+        """
+        components = parse_address(address)
+        if not components:
+            return None
+
+        segment = self.find(components)
+        if segment is None:
+            return None
+        return segment.locate(components.get('lane', components.get('number')))
+
+    @classmethod
+    def from_csv(cls, path: str) -> 'Gazetteer':
+        """
+        Load a gazetteer from a CSV reference file with the columns
+        city, district, road, section, number, latitude and longitude, one
+        row per known house number. Section is empty for roads without one.
+        """
+        gazetteer = cls()
+        with open(path, encoding='utf-8-sig', newline='') as file:
+            for row in csv.DictReader(file):
+                gazetteer.add(
+                    row['city'], row['district'], row['road'],
+                    chinese_to_int(row['section']) if row['section'] else None,
+                    int(row['number']), float(row['latitude']), float(row['longitude']),
+                )
+        gazetteer.freeze()
+        return gazetteer
+
+
+@lru_cache(maxsize=None)
+def get_gazetteer() -> Gazetteer:
+    """
+    Get the process wide gazetteer, loaded from GAZETTEER_PATH on first use.
+    A missing reference file yields an empty gazetteer.
+    """
+    path = getattr(settings, 'GAZETTEER_PATH', None)
+    try:
+        return Gazetteer.from_csv(path) if path else Gazetteer()
+    except FileNotFoundError:
+        return Gazetteer()
+
+
+def lookup_address(address: str) -> Optional[Tuple[float, float]]:
+    """
+    Geocode an address locally from the gazetteer, without any network call.
+    """
+    return get_gazetteer().lookup(address)
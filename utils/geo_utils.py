@@ -0,0 +1,457 @@
+import math
+import numpy as np
+from typing import List, NamedTuple, Optional, Mapping, Sequence
+
+# Base32 alphabet used by the geohash encoding
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+# Precision stored on TrafficViolation.geohash (~4.8m x 4.8m cells)
+GEOHASH_PRECISION = 9
+
+# Upper bound of geohash prefixes used to cover a viewport
+MAX_COVERING_CELLS = 16
+
+# A snapped viewport spans at least this many grid steps along its longest side
+SNAP_STEPS_PER_SPAN = 8
+
+# Zoom levels above this return individual markers instead of clusters
+CLUSTER_MAX_ZOOM = 15
+
+# Number of clustering grid cells along the edge of a 256px map tile
+CLUSTER_CELLS_PER_TILE = 4
+
+# Default and maximum number of heatmap cells along each side of the grid
+HEATMAP_DEFAULT_SIZE = 64
+HEATMAP_MAX_SIZE = 256
+
+# Largest Gaussian smoothing radius, in grid cells
+HEATMAP_MAX_SMOOTHING = 10.0
+
+
+class Clusters(NamedTuple):
+    """
+    Grid clusters of a set of points.
+
+    Attributes:
+        lats: The centroid latitude of each cluster.
+        lngs: The centroid longitude of each cluster.
+        counts: The number of points in each cluster.
+        members: The index of one point belonging to each cluster.
+    """
+    lats: np.ndarray
+    lngs: np.ndarray
+    counts: np.ndarray
+    members: np.ndarray
+
+
+class MarkerData(NamedTuple):
+    """
+    Columnar map markers and clusters, ready to be rendered as JSON or packed.
+
+    Attributes:
+        ids: The UUID of each individual marker.
+        license_plates: The license plate of each individual marker.
+        violations: The violation type of each individual marker.
+        lats: The latitude of each individual marker.
+        lngs: The longitude of each individual marker.
+        cluster_lats: The centroid latitude of each cluster.
+        cluster_lngs: The centroid longitude of each cluster.
+        cluster_counts: The number of violations in each cluster.
+    """
+    ids: Sequence
+    license_plates: Sequence[str]
+    violations: Sequence[str]
+    lats: np.ndarray
+    lngs: np.ndarray
+    cluster_lats: np.ndarray
+    cluster_lngs: np.ndarray
+    cluster_counts: np.ndarray
+
+    def to_dicts(self) -> List[dict]:
+        """
+        Convert the markers and clusters into JSON serialisable dictionaries.
+        """
+        markers = [
+            {
+                'traffic_violation_id': str(traffic_violation_id),  # Convert UUID to string
+                'license_plate': str(license_plate),
+                'violation': str(violation),
+                'lat': float(lat),
+                'lng': float(lng),
+            }
+            for traffic_violation_id, license_plate, violation, lat, lng
+            in zip(self.ids, self.license_plates, self.violations, self.lats, self.lngs)
+        ]
+        markers.extend(
+            {'lat': float(lat), 'lng': float(lng), 'count': int(count)}
+            for lat, lng, count in zip(self.cluster_lats, self.cluster_lngs, self.cluster_counts)
+        )
+        return markers
+
+
+class BoundingBox(NamedTuple):
+    """
+    A latitude/longitude aligned bounding box, typically the visible map area.
+    """
+    north: float
+    south: float
+    east: float
+    west: float
+
+    def contains(self, lat: float, lng: float) -> bool:
+        """
+        Check whether a coordinate lies inside the bounding box.
+        """
+        return self.south <= lat <= self.north and self.west <= lng <= self.east
+
+
+def encode_geohash(lat: Optional[float], lng: Optional[float], precision: int = GEOHASH_PRECISION) -> Optional[str]:
+    """
+    Encode a coordinate as a geohash string.
+
+    Args:
+        lat: The latitude of the point.
+        lng: The longitude of the point.
+        precision: The number of characters of the resulting geohash.
+
+    Returns:
+        The geohash of the point, or None if either coordinate is missing.
+    """
+    if lat is None or lng is None:
+        return None
+
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    geohash = []
+    bits = 0
+    bit_count = 0
+    even_bit = True
+
+    while len(geohash) < precision:
+        # Bits alternate between longitude (even) and latitude (odd)
+        value, value_range = (lng, lng_range) if even_bit else (lat, lat_range)
+        mid = (value_range[0] + value_range[1]) / 2
+        if value >= mid:
+            bits = (bits << 1) | 1
+            value_range[0] = mid
+        else:
+            bits <<= 1
+            value_range[1] = mid
+        even_bit = not even_bit
+
+        bit_count += 1
+        if bit_count == 5:
+            geohash.append(GEOHASH_ALPHABET[bits])
+            bits = 0
+            bit_count = 0
+
+    return ''.join(geohash)
+
+
+def geohash_cell_size(precision: int) -> tuple:
+    """
+    Get the size in degrees of a geohash cell at the given precision.
+
+    Returns:
+        A tuple of (cell height in latitude, cell width in longitude).
+    """
+    total_bits = precision * 5
+    lng_bits = (total_bits + 1) // 2
+    lat_bits = total_bits // 2
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lng_bits)
+
+
+def geohash_covering(bbox: BoundingBox, max_cells: int = MAX_COVERING_CELLS) -> List[str]:
+    """
+    Get the geohash prefixes covering a bounding box.
+
+    The longest prefix length whose cells cover the box with at most
+    `max_cells` cells is used, so the prefixes can be resolved with a handful
+    of index range scans on the geohash column.
+
+    Args:
+        bbox: The bounding box to cover.
+        max_cells: The maximum number of prefixes to return.
+
+    Returns:
+        A list of geohash prefixes, or an empty list if even a single
+        character prefix would need more than `max_cells` cells.
+    """
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        cell_lat, cell_lng = geohash_cell_size(precision)
+        rows = math.floor((bbox.north + 90) / cell_lat) - math.floor((bbox.south + 90) / cell_lat) + 1
+        cols = math.floor((bbox.east + 180) / cell_lng) - math.floor((bbox.west + 180) / cell_lng) + 1
+        if rows * cols > max_cells:
+            continue
+
+        first_row = math.floor((bbox.south + 90) / cell_lat)
+        first_col = math.floor((bbox.west + 180) / cell_lng)
+        prefixes = []
+        for row in range(rows):
+            # Encode the centre of each cell to get its prefix
+            lat = min((first_row + row + 0.5) * cell_lat - 90, 90.0)
+            for col in range(cols):
+                lng = min((first_col + col + 0.5) * cell_lng - 180, 180.0)
+                prefix = encode_geohash(lat, lng, precision)
+                if prefix not in prefixes:
+                    prefixes.append(prefix)
+        return prefixes
+
+    return []
+
+
+def parse_bounding_box(params: Mapping[str, str]) -> Optional[BoundingBox]:
+    """
+    Parse the `north`, `south`, `east` and `west` query parameters.
+
+    A viewport crossing the antimeridian, or wrapping around the world at
+    low zoom levels, has `west` greater than `east`. It is widened to every
+    longitude.
+
+    Args:
+        params: The query parameters of the request.
+
+    Returns:
+        The requested BoundingBox, or None if no bounds were supplied.
+
+    Raises:
+        ValueError: If the bounds are incomplete or invalid.
+    """
+    keys = ('north', 'south', 'east', 'west')
+    supplied = [params.get(key) for key in keys]
+    if not any(supplied):
+        return None
+    if not all(supplied):
+        raise ValueError('north, south, east and west must be supplied together.')
+
+    north, south, east, west = (float(value) for value in supplied)
+    if not (-90 <= south <= north <= 90):
+        raise ValueError('Latitude bounds must satisfy -90 <= south <= north <= 90.')
+    if not (-180 <= west <= 180 and -180 <= east <= 180):
+        raise ValueError('Longitude bounds must be between -180 and 180.')
+    if west > east:
+        west, east = -180.0, 180.0
+
+    return BoundingBox(north=north, south=south, east=east, west=west)
+
+
+def snap_bounding_box(bbox: BoundingBox, steps: int = SNAP_STEPS_PER_SPAN) -> BoundingBox:
+    """
+    Grow a bounding box outwards to a grid sized from its longest side, so
+    that viewports panned or resized slightly resolve to the same box.
+
+    The grid step is the largest 360 / 2^k degrees fitting `steps` times
+    into the longest side, so the box grows by at most two steps per side.
+
+    Args:
+        bbox: The bounding box to snap.
+        steps: The minimum number of grid steps along the longest side.
+
+    Returns:
+        The snapped BoundingBox, containing the original one.
+    """
+    span = max(bbox.north - bbox.south, bbox.east - bbox.west)
+    level = 0
+    while level < 32 and 360.0 / (1 << level) > span / steps:
+        level += 1
+    step = 360.0 / (1 << level)
+
+    return BoundingBox(
+        north=min(math.ceil(bbox.north / step) * step, 90.0),
+        south=max(math.floor(bbox.south / step) * step, -90.0),
+        east=min(math.ceil(bbox.east / step) * step, 180.0),
+        west=max(math.floor(bbox.west / step) * step, -180.0),
+    )
+
+
+def parse_zoom(params: Mapping[str, str]) -> Optional[int]:
+    """
+    Parse the `zoom` query parameter.
+
+    Args:
+        params: The query parameters of the request.
+
+    Returns:
+        The map zoom level, or None if it was not supplied.
+
+    Raises:
+        ValueError: If the zoom level is not an integer between 0 and 22.
+    """
+    zoom = params.get('zoom')
+    if zoom in (None, ''):
+        return None
+
+    zoom = int(zoom)
+    if not 0 <= zoom <= 22:
+        raise ValueError('zoom must be between 0 and 22.')
+    return zoom
+
+
+def cluster_points(lats: np.ndarray, lngs: np.ndarray, zoom: int,
+                   cells_per_tile: int = CLUSTER_CELLS_PER_TILE) -> Clusters:
+    """
+    Group points into square grid cells sized for the given zoom level.
+
+    A map tile spans 360 / 2^zoom degrees of longitude, so each tile is split
+    into `cells_per_tile` cells per side and the points falling into the same
+    cell are merged into a single cluster at their centroid.
+
+    Args:
+        lats: The latitudes of the points.
+        lngs: The longitudes of the points.
+        zoom: The map zoom level.
+        cells_per_tile: The number of grid cells along the edge of a tile.
+
+    Returns:
+        The clusters of the points.
+    """
+    lats = np.asarray(lats, dtype=np.float64)
+    lngs = np.asarray(lngs, dtype=np.float64)
+    if lats.size == 0:
+        empty = np.empty(0, dtype=np.float64)
+        return Clusters(empty, empty, np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64))
+
+    cell_size = 360.0 / (1 << zoom) / cells_per_tile
+    columns = int(math.ceil(360.0 / cell_size)) + 1
+    rows = np.floor((lats + 90.0) / cell_size).astype(np.int64)
+    cols = np.floor((lngs + 180.0) / cell_size).astype(np.int64)
+
+    _, inverse, counts = np.unique(rows * columns + cols, return_inverse=True, return_counts=True)
+    cluster_lats = np.bincount(inverse, weights=lats) / counts
+    cluster_lngs = np.bincount(inverse, weights=lngs) / counts
+
+    members = np.empty(counts.size, dtype=np.int64)
+    members[inverse] = np.arange(lats.size)
+
+    return Clusters(cluster_lats, cluster_lngs, counts, members)
+
+
+def tile_bounding_box(z: int, x: int, y: int) -> BoundingBox:
+    """
+    Get the bounding box of a slippy map (Web Mercator) tile.
+
+    Args:
+        z: The zoom level of the tile.
+        x: The column of the tile.
+        y: The row of the tile.
+
+    Returns:
+        The BoundingBox covered by the tile.
+
+    Raises:
+        ValueError: If the tile does not exist at the given zoom level.
+    """
+    tiles = 1 << z
+    if not (0 <= x < tiles and 0 <= y < tiles):
+        raise ValueError(f'Tile {z}/{x}/{y} does not exist.')
+
+    def tile_latitude(row: int) -> float:
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / tiles))))
+
+    return BoundingBox(
+        north=tile_latitude(y),
+        south=tile_latitude(y + 1),
+        east=x / tiles * 360.0 - 180.0 + 360.0 / tiles,
+        west=x / tiles * 360.0 - 180.0,
+    )
+
+
+def point_to_tile(lat: float, lng: float, z: int) -> tuple:
+    """
+    Get the slippy map tile containing a coordinate.
+
+    Args:
+        lat: The latitude of the point.
+        lng: The longitude of the point.
+        z: The zoom level.
+
+    Returns:
+        A tuple of (x, y) tile indexes.
+    """
+    tiles = 1 << z
+    lat = max(min(lat, 85.0511287798), -85.0511287798)
+    x = int((lng + 180.0) / 360.0 * tiles)
+    y = int((1 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2 * tiles)
+    return min(max(x, 0), tiles - 1), min(max(y, 0), tiles - 1)
+
+
+def points_to_tiles(lats: np.ndarray, lngs: np.ndarray, z: int) -> np.ndarray:
+    """
+    Get the slippy map tiles containing many coordinates, as point_to_tile.
+
+    Args:
+        lats: The latitudes of the points.
+        lngs: The longitudes of the points.
+        z: The zoom level.
+
+    Returns:
+        An (n, 2) integer array of (x, y) tile indexes.
+    """
+    tiles = 1 << z
+    lats = np.clip(np.asarray(lats, dtype=np.float64), -85.0511287798, 85.0511287798)
+    x = np.floor((np.asarray(lngs, dtype=np.float64) + 180.0) / 360.0 * tiles)
+    y = np.floor((1 - np.arcsinh(np.tan(np.radians(lats))) / np.pi) / 2 * tiles)
+    return np.clip(np.column_stack((x, y)), 0, tiles - 1).astype(np.int64)
+
+
+def parse_heatmap_options(params: Mapping[str, str]) -> tuple:
+    """
+    Parse the `size` and `smoothing` query parameters of a heatmap.
+
+    Args:
+        params: The query parameters of the request.
+
+    Returns:
+        A tuple of (cells along each side of the grid, Gaussian sigma in cells).
+
+    Raises:
+        ValueError: If either parameter is out of range.
+    """
+    size = int(params.get('size') or HEATMAP_DEFAULT_SIZE)
+    if not 1 <= size <= HEATMAP_MAX_SIZE:
+        raise ValueError(f'size must be between 1 and {HEATMAP_MAX_SIZE}.')
+
+    smoothing = float(params.get('smoothing') or 0)
+    if not 0 <= smoothing <= HEATMAP_MAX_SMOOTHING:
+        raise ValueError(f'smoothing must be between 0 and {HEATMAP_MAX_SMOOTHING:g}.')
+
+    return size, smoothing
+
+
+def gaussian_smoothing_matrix(size: int, sigma: float) -> np.ndarray:
+    """
+    Build the matrix applying a 1D Gaussian blur along an axis of `size` cells.
+
+    Weights are normalised by the full kernel, so mass blurred past the edge
+    of the grid is dropped rather than piled up on the border cells.
+    """
+    offsets = np.arange(size)
+    weights = np.exp(-((offsets[:, None] - offsets[None, :]) ** 2) / (2 * sigma ** 2))
+    norm = np.exp(-(np.arange(-size + 1, size) ** 2) / (2 * sigma ** 2)).sum()
+    return weights / norm
+
+
+def density_grid(lats: np.ndarray, lngs: np.ndarray, bbox: BoundingBox, size: int = HEATMAP_DEFAULT_SIZE,
+                 smoothing: float = 0.0) -> np.ndarray:
+    """
+    Count points per cell of a regular grid over a bounding box.
+
+    Args:
+        lats: The latitudes of the points.
+        lngs: The longitudes of the points.
+        bbox: The area covered by the grid.
+        size: The number of cells along each side of the grid.
+        smoothing: The sigma, in cells, of an optional Gaussian blur.
+
+    Returns:
+        A (size, size) array whose first row is the northernmost one.
+    """
+    grid, _, _ = np.histogram2d(
+        np.asarray(lats, dtype=np.float64), np.asarray(lngs, dtype=np.float64),
+        bins=size, range=[[bbox.south, bbox.north], [bbox.west, bbox.east]],
+    )
+    if smoothing > 0:
+        # The 2D Gaussian is separable, so blur the rows and columns in turn
+        blur = gaussian_smoothing_matrix(size, smoothing)
+        grid = blur @ grid @ blur.T
+    return grid[::-1]
@@ -0,0 +1,287 @@
+import hashlib
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from datetime import timedelta
+from functools import lru_cache
+from typing import Callable, Optional, Protocol, Tuple
+import googlemaps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError
+from django.utils import timezone
+from .models import GeocodeCacheEntry
+
+# Decimal places kept when caching reverse geocoding results (~11m)
+COORDINATE_PRECISION = 4
+
+# Minimum time between two last-used updates of a persistent cache entry
+TOUCH_INTERVAL = timedelta(hours=1)
+
+# Persistent cache writes between two eviction passes
+EVICTION_INTERVAL = 100
+
+# Cache key of the Maps API rate limit shared by every geocoding worker and command
+GEOCODE_RATE_KEY = 'geocode_rate'
+
+
+class LRUCache:
+    """
+    A thread-safe, size bounded, least recently used mapping whose entries
+    expire after a time to live.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return default
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self.entries[key]
+                return default
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value) -> None:
+        with self.lock:
+            self.entries[key] = (value, time.monotonic() + self.ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+
+
+class RateLimiter(Protocol):
+    """
+    Anything limiting the rate of Maps API calls, such as a TokenBucket or
+    a SharedRateLimiter.
+    """
+
+    def acquire(self) -> None:
+        """
+        Wait until a call is allowed, and count it.
+        """
+
+
+class TokenBucket:
+    """
+    A thread-safe token bucket limiting calls to `rate` per second, with
+    bursts of up to `capacity` calls.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity or max(rate, 1.0)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """
+        Take a token, sleeping until one is available.
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            wait = (1 - self.tokens) / self.rate if self.tokens < 1 else 0.0
+            # Reserve the token now, so waiting callers queue up behind each other
+            self.tokens -= 1
+        if wait > 0:
+            time.sleep(wait)
+
+
+class SharedRateLimiter:
+    """
+    Limits calls to `rate` per second across every process sharing the
+    Django cache, counting the calls of each second under its own key.
+
+    With a per-process cache such as LocMemCache the limit only applies
+    within each process, so the configured rate should then be divided by
+    the number of worker processes.
+    """
+
+    def __init__(self, key: str, rate: float):
+        self.key = key
+        self.rate = rate
+
+    def acquire(self) -> None:
+        """
+        Count a call, sleeping until the second it falls into has room for it.
+        """
+        while True:
+            now = time.time()
+            window = int(now)
+            key = f'{self.key}:{window}'
+            cache.add(key, 0, 2)
+            try:
+                calls = cache.incr(key)
+            except ValueError:
+                # 計數鍵已過期，重新計算
+                continue
+            if calls <= self.rate:
+                return
+            time.sleep(window + 1 - now)
+
+
+def get_cache_ttl() -> timedelta:
+    """
+    Get how long a geocoding result is trusted before asking the API again.
+    """
+    return timedelta(days=getattr(settings, 'GEOCODE_CACHE_TTL_DAYS', 30))
+
+
+memory_cache = LRUCache(
+    max_size=getattr(settings, 'GEOCODE_MEMORY_CACHE_SIZE', 4096),
+    ttl=get_cache_ttl().total_seconds(),
+)
+
+_writes_since_eviction = 0
+
+
+@lru_cache(maxsize=None)
+def get_gmaps_client() -> googlemaps.Client:
+    """
+    Get the Google Maps client shared by the whole process, so its HTTP
+    session and connection pool are reused between calls.
+    """
+    return googlemaps.Client(key=settings.GOOGLE_MAPS_API_KEY)
+
+
+def normalize_address(address: str) -> str:
+    """
+    Normalise an address into a cache key, folding full-width characters,
+    case, whitespace and the 臺/台 variants.
+    """
+    address = unicodedata.normalize('NFKC', address).lower()
+    return ''.join(address.split()).replace('臺', '台')
+
+
+def quantize_coordinates(lat: float, lng: float) -> str:
+    """
+    Round coordinates into a cache key, so nearby points share an address.
+    """
+    return f'{float(lat):.{COORDINATE_PRECISION}f},{float(lng):.{COORDINATE_PRECISION}f}'
+
+
+def evict_geocode_cache() -> int:
+    """
+    Delete the expired persistent cache entries, then the least recently
+    used ones beyond GEOCODE_CACHE_MAX_ENTRIES.
+
+    Returns:
+        The number of entries deleted.
+    """
+    deleted, _ = GeocodeCacheEntry.objects.filter(created_at__lt=timezone.now() - get_cache_ttl()).delete()
+
+    max_entries = getattr(settings, 'GEOCODE_CACHE_MAX_ENTRIES', 100000)
+    cutoff = (GeocodeCacheEntry.objects.order_by('-last_used_at')
+              .values_list('last_used_at', flat=True)[max_entries:max_entries + 1].first())
+    if cutoff is not None:
+        excess, _ = GeocodeCacheEntry.objects.filter(last_used_at__lte=cutoff).delete()
+        deleted += excess
+    return deleted
+
+
+def cached_geocode(kind: str, key: str, resolve: Callable[[], dict]) -> dict:
+    """
+    Look a geocoding result up in the in-process cache, then the persistent
+    cache, and only call the API on a miss in both.
+
+    Args:
+        kind: GeocodeCacheEntry.FORWARD or GeocodeCacheEntry.REVERSE.
+        key: The normalised address or quantised coordinates, stored hashed.
+        resolve: A callable querying the API, returning the `latitude`,
+                 `longtitude` and `address` fields to cache.
+
+    Returns:
+        A dictionary with the `latitude`, `longtitude` and `address` fields.
+    """
+    global _writes_since_eviction
+
+    result = memory_cache.get((kind, key))
+    if result is not None:
+        return result
+
+    # 以雜湊為資料庫鍵，避免截斷後前綴相同的長地址共用同一項目
+    digest = hashlib.sha256(key.encode()).hexdigest()
+    now = timezone.now()
+    entry = GeocodeCacheEntry.objects.filter(kind=kind, key=digest, created_at__gte=now - get_cache_ttl()).first()
+    if entry is not None:
+        if now - entry.last_used_at > TOUCH_INTERVAL:
+            GeocodeCacheEntry.objects.filter(pk=entry.pk).update(last_used_at=now)
+        result = {'latitude': entry.latitude, 'longtitude': entry.longtitude, 'address': entry.address}
+    else:
+        result = resolve()
+        try:
+            GeocodeCacheEntry.objects.update_or_create(
+                kind=kind, key=digest, defaults={**result, 'created_at': now, 'last_used_at': now}
+            )
+        except IntegrityError:
+            # Another worker cached the same key concurrently
+            pass
+
+        _writes_since_eviction += 1
+        if _writes_since_eviction >= EVICTION_INTERVAL:
+            _writes_since_eviction = 0
+            evict_geocode_cache()
+
+    memory_cache.set((kind, key), result)
+    return result
+
+
+def geocode_address(address: str, rate_limiter: Optional[RateLimiter] = None) -> Tuple[Optional[float], Optional[float]]:
+    """
+    Get the coordinates of an address, through the geocoding caches.
+
+    Args:
+        address: The address to geocode.
+        rate_limiter: A RateLimiter to acquire from before calling the API.
+
+    Returns:
+        The latitude and longitude of the address, or (None, None) if it could not be geocoded.
+    """
+    def resolve() -> dict:
+        if rate_limiter is not None:
+            rate_limiter.acquire()
+        geocode_result = get_gmaps_client().geocode(address)
+        if not geocode_result:
+            return {'latitude': None, 'longtitude': None, 'address': None}
+        location = geocode_result[0]['geometry']['location']
+        return {'latitude': location['lat'], 'longtitude': location['lng'], 'address': address}
+
+    result = cached_geocode(GeocodeCacheEntry.FORWARD, normalize_address(address), resolve)
+    return result['latitude'], result['longtitude']
+
+
+def reverse_geocode(lat: float, lng: float) -> Optional[str]:
+    """
+    Get the address of a coordinate, through the geocoding caches.
+
+    Args:
+        lat: The latitude to convert.
+        lng: The longitude to convert.
+
+    Returns:
+        The formatted address, or None if no address was found.
+    """
+    def resolve() -> dict:
+        reverse_result = get_gmaps_client().reverse_geocode((lat, lng))
+        return {
+            'latitude': lat,
+            'longtitude': lng,
+            'address': reverse_result[0]['formatted_address'] if reverse_result else None,
+        }
+
+    return cached_geocode(GeocodeCacheEntry.REVERSE, quantize_coordinates(lat, lng), resolve)['address']
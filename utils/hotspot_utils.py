@@ -0,0 +1,324 @@
+import math
+import numpy as np
+from collections import Counter
+from datetime import timedelta
+from typing import Callable, Iterator, List, Optional, Tuple
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from reports.models import TrafficViolation
+from traffic_data.models import HotSpot
+from .nearby_utils import EARTH_RADIUS_M
+
+# Cells searched on each side of a point by the neighbour grid, whose cells
+# are eps / √2 wide
+NEIGHBOUR_REACH = 2
+NEIGHBOUR_OFFSETS = [(dx, dy) for dx in range(-NEIGHBOUR_REACH, NEIGHBOUR_REACH + 1)
+                     for dy in range(-NEIGHBOUR_REACH, NEIGHBOUR_REACH + 1)]
+# Offsets reaching each pair of distinct cells once
+NEIGHBOUR_FORWARD_OFFSETS = [offset for offset in NEIGHBOUR_OFFSETS if offset > (0, 0)]
+
+# Candidate pairs whose distances are compared at once
+NEIGHBOUR_BATCH_SIZE = 1 << 20
+
+
+def project_to_metres(lats: np.ndarray, lngs: np.ndarray) -> np.ndarray:
+    """
+    Project coordinates onto a local equirectangular plane, in metres.
+
+    Distances are accurate enough for clustering within a city or a region
+    the size of Taiwan.
+    """
+    lats = np.asarray(lats, dtype=np.float64)
+    lngs = np.asarray(lngs, dtype=np.float64)
+    if lats.size == 0:
+        return np.empty((0, 2))
+
+    scale = math.cos(math.radians(float(lats.mean())))
+    return np.column_stack((
+        np.radians(lngs) * EARTH_RADIUS_M * scale,
+        np.radians(lats) * EARTH_RADIUS_M,
+    ))
+
+
+class NeighbourGrid:
+    """
+    Buckets planar points into square cells of side eps / √2, so that points
+    sharing a cell are within eps of each other and the neighbours of a
+    point can only lie in the 5 x 5 cells around its own.
+
+    Args:
+        points: An (n, 2) array of planar coordinates.
+        eps: The neighbourhood radius.
+    """
+
+    def __init__(self, points: np.ndarray, eps: float):
+        self.points = points
+        self.eps = eps
+        cells = np.floor(points / (eps / math.sqrt(2))).astype(np.int64)
+        cells -= cells.min(axis=0) - NEIGHBOUR_REACH
+        self.stride = int(cells[:, 1].max()) + NEIGHBOUR_REACH + 1
+        self.keys = cells[:, 0] * self.stride + cells[:, 1]
+        _, self.cells, self.cell_sizes = np.unique(self.keys, return_inverse=True, return_counts=True)
+        self.cells = self.cells.reshape(-1)
+
+    def pairs(self, queries: np.ndarray, targets: np.ndarray, offsets=NEIGHBOUR_OFFSETS,
+              skip: Optional[Callable[[np.ndarray, np.ndarray], np.ndarray]] = None,
+              batch_size: int = NEIGHBOUR_BATCH_SIZE) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Find the pairs of a query and a target point at most eps apart.
+
+        Candidates are compared a batch of about `batch_size` at a time, so
+        memory stays bounded however many points share a cell.
+
+        Args:
+            queries: The indexes of the query points.
+            targets: The indexes of the target points.
+            offsets: The (dx, dy) offsets of the cells searched around each query point.
+            skip: Called before each batch with its query points and a target
+                  point of the cell searched for each, returning which
+                  queries need not be searched.
+            batch_size: The number of candidate pairs compared at once.
+
+        Yields:
+            Two arrays holding the query and target indexes of the close pairs of a batch.
+        """
+        # 依格子排序，使每批只涉及少數格子
+        queries = queries[np.argsort(self.keys[queries], kind='stable')]
+        order = targets[np.argsort(self.keys[targets], kind='stable')]
+        sorted_keys = self.keys[order]
+        for dx, dy in offsets:
+            wanted = self.keys[queries] + dx * self.stride + dy
+            starts = np.searchsorted(sorted_keys, wanted, side='left')
+            counts = np.searchsorted(sorted_keys, wanted, side='right') - starts
+            found = counts > 0
+            if not found.any():
+                continue
+
+            batches = (np.cumsum(counts[found]) - counts[found]) // batch_size
+            for batch in np.split(np.flatnonzero(found), np.flatnonzero(np.diff(batches)) + 1):
+                if skip is not None:
+                    batch = batch[~skip(queries[batch], order[starts[batch]])]
+                    if not len(batch):
+                        continue
+
+                first = np.repeat(queries[batch], counts[batch])
+                # Position of each candidate within its neighbour cell
+                ranks = np.arange(len(first)) - np.repeat(np.cumsum(counts[batch]) - counts[batch], counts[batch])
+                second = order[np.repeat(starts[batch], counts[batch]) + ranks]
+
+                delta = self.points[first] - self.points[second]
+                close = np.einsum('ij,ij->i', delta, delta) <= self.eps * self.eps
+                yield first[close], second[close]
+
+
+def neighbour_pairs(points: np.ndarray, eps: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Find every pair of points at most `eps` apart, including each point
+    paired with itself. Holds every pair in memory, so only suits inputs
+    without dense areas; dbscan walks the pairs in batches instead.
+
+    Args:
+        points: An (n, 2) array of planar coordinates.
+        eps: The neighbourhood radius.
+
+    Returns:
+        Two arrays holding the indexes of both points of each pair. Pairs are
+        reported in both directions.
+    """
+    indexes = np.arange(len(points))
+    batches = list(NeighbourGrid(points, eps).pairs(indexes, indexes)) if len(points) else []
+    if not batches:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    return np.concatenate([first for first, _ in batches]), np.concatenate([second for _, second in batches])
+
+
+def find_roots(parent: np.ndarray) -> np.ndarray:
+    """
+    Point every node of a union-find forest straight at its root.
+    """
+    while True:
+        grandparent = parent[parent]
+        if np.array_equal(grandparent, parent):
+            return parent
+        parent[:] = grandparent
+
+
+def union(parent: np.ndarray, first: np.ndarray, second: np.ndarray) -> None:
+    """
+    Merge the trees of a union-find forest joined by pairs of nodes, always
+    hooking the larger root under the smaller one.
+    """
+    while True:
+        find_roots(parent)
+        a, b = parent[first], parent[second]
+        differ = a != b
+        if not differ.any():
+            return
+        np.minimum.at(parent, np.maximum(a, b)[differ], np.minimum(a, b)[differ])
+
+
+def dbscan(points: np.ndarray, eps: float, min_samples: int,
+           batch_size: int = NEIGHBOUR_BATCH_SIZE) -> np.ndarray:
+    """
+    Cluster points with DBSCAN.
+
+    Core points have at least `min_samples` points, themselves included,
+    within `eps`. Core points within `eps` of each other share a cluster, and
+    the remaining points join the cluster of any core point within reach.
+
+    Points are bucketed with a NeighbourGrid. Points of a cell holding at
+    least `min_samples` points are core points already connected to each
+    other, so only sparse cells need their neighbours counted, and links
+    between cells stop being searched once the cells are connected. The
+    remaining candidate pairs are compared `batch_size` at a time, keeping
+    memory bounded in dense areas.
+
+    Args:
+        points: An (n, 2) array of planar coordinates.
+        eps: The neighbourhood radius.
+        min_samples: The neighbourhood size making a point a core point.
+        batch_size: The number of candidate pairs compared at once.
+
+    Returns:
+        The cluster label of each point, numbered from 0, or -1 for noise.
+    """
+    count = len(points)
+    labels = np.full(count, -1, dtype=np.int64)
+    if not count:
+        return labels
+
+    grid = NeighbourGrid(points, eps)
+    indexes = np.arange(count)
+    core = grid.cell_sizes[grid.cells] >= min_samples
+    neighbours = np.zeros(count, dtype=np.int64)
+    for first, _ in grid.pairs(indexes[~core], indexes, batch_size=batch_size):
+        neighbours += np.bincount(first, minlength=count)
+    core |= neighbours >= min_samples
+
+    # 同一格內的核心點彼此相連，以最小的索引為根
+    core_indexes = indexes[core]
+    parent = indexes.copy()
+    roots = np.full(len(grid.cell_sizes), count)
+    np.minimum.at(roots, grid.cells[core_indexes], core_indexes)
+    parent[core_indexes] = roots[grid.cells[core_indexes]]
+
+    def connected(queries, targets):
+        find_roots(parent)
+        return parent[queries] == parent[targets]
+
+    for first, second in grid.pairs(core_indexes, core_indexes, NEIGHBOUR_FORWARD_OFFSETS, connected, batch_size):
+        union(parent, first, second)
+    find_roots(parent)
+
+    # Border points join the component of a core neighbour
+    clustered = core.copy()
+
+    def assigned(queries, targets):
+        return clustered[queries]
+
+    for first, second in grid.pairs(indexes[~core], core_indexes, skip=assigned, batch_size=batch_size):
+        parent[first] = parent[second]
+        clustered[first] = True
+
+    _, labels[clustered] = np.unique(parent[clustered], return_inverse=True)
+    return labels
+
+
+def convex_hull(points: np.ndarray) -> List[List[float]]:
+    """
+    Get the convex hull of planar points with the monotone chain algorithm.
+
+    Args:
+        points: An (n, 2) array of coordinates.
+
+    Returns:
+        The hull vertices in counter-clockwise order.
+    """
+    unique = sorted(set(map(tuple, np.asarray(points, dtype=np.float64).tolist())))
+    if len(unique) < 3:
+        return [list(point) for point in unique]
+
+    def cross(origin, a, b):
+        return (a[0] - origin[0]) * (b[1] - origin[1]) - (a[1] - origin[1]) * (b[0] - origin[0])
+
+    def half(points):
+        chain = []
+        for point in points:
+            while len(chain) >= 2 and cross(chain[-2], chain[-1], point) <= 0:
+                chain.pop()
+            chain.append(point)
+        return chain[:-1]
+
+    return [list(point) for point in half(unique) + half(reversed(unique))]
+
+
+def detect_hot_spots(lats: np.ndarray, lngs: np.ndarray, violations: List[str],
+                     eps: float, min_samples: int) -> List[dict]:
+    """
+    Find the dense areas of traffic violations.
+
+    Args:
+        lats: The latitudes of the violations.
+        lngs: The longitudes of the violations.
+        violations: The violation type of each violation.
+        eps: The neighbourhood radius, in metres.
+        min_samples: The number of violations within `eps` making a point dense.
+
+    Returns:
+        A list of hot spot dictionaries, largest first, with the centroid,
+        the convex hull `polygon` as [lat, lng] pairs, the `count`, the
+        `dominant_violation` and the `violation_counts`.
+    """
+    lats = np.asarray(lats, dtype=np.float64)
+    lngs = np.asarray(lngs, dtype=np.float64)
+    labels = dbscan(project_to_metres(lats, lngs), eps, min_samples)
+
+    hot_spots = []
+    for label in range(labels.max() + 1 if labels.size else 0):
+        members = np.flatnonzero(labels == label)
+        violation_counts = Counter(violations[index] for index in members)
+        hot_spots.append({
+            'latitude': float(lats[members].mean()),
+            'longtitude': float(lngs[members].mean()),
+            'polygon': convex_hull(np.column_stack((lats[members], lngs[members]))),
+            'count': len(members),
+            'dominant_violation': violation_counts.most_common(1)[0][0],
+            'violation_counts': dict(violation_counts),
+        })
+    hot_spots.sort(key=lambda hot_spot: hot_spot['count'], reverse=True)
+    return hot_spots
+
+
+def refresh_hot_spots() -> int:
+    """
+    Recompute the hot spots over the recent traffic violations, replacing the
+    stored ones.
+
+    The window and clustering parameters come from the HOT_SPOT_WINDOW_DAYS,
+    HOT_SPOT_RADIUS and HOT_SPOT_MIN_VIOLATIONS settings.
+
+    Returns:
+        The number of hot spots found.
+    """
+    window_days = getattr(settings, 'HOT_SPOT_WINDOW_DAYS', 90)
+    since = timezone.localdate() - timedelta(days=window_days)
+    rows = list(
+        TrafficViolation.objects.filter(date__gte=since)
+        .exclude(latitude=None).exclude(longtitude=None)
+        .values_list('latitude', 'longtitude', 'violation')
+    )
+    lats, lngs, violations = (list(column) for column in zip(*rows)) if rows else ([], [], [])
+
+    hot_spots = detect_hot_spots(
+        lats, lngs, violations,
+        eps=getattr(settings, 'HOT_SPOT_RADIUS', 200),
+        min_samples=getattr(settings, 'HOT_SPOT_MIN_VIOLATIONS', 5),
+    )
+
+    with transaction.atomic():
+        HotSpot.objects.all().delete()
+        HotSpot.objects.bulk_create(
+            HotSpot(window_start=since, **hot_spot) for hot_spot in hot_spots
+        )
+    return len(hot_spots)
@@ -0,0 +1,300 @@
+import codecs
+import csv
+import io
+import json
+import os
+from datetime import time
+from itertools import islice
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple
+import googlemaps
+from django import forms
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from reports.forms import ReportForm
+from reports.models import TrafficViolation
+from reports.signals import traffic_violations_bulk_created
+from reports.tasks import TRANSIENT_API_STATUSES, TRANSIENT_ERRORS, queue_pending_geocoding
+from .utils import process_input
+
+IMPORT_FORMATS = ('csv', 'jsonl')
+
+# Rows validated, geocoded and inserted per transaction
+IMPORT_BATCH_SIZE = 1000
+
+# ReportForm fields a row is validated against
+IMPORT_FIELDS = ('license_plate', 'date', 'hour', 'minute', 'violation', 'status', 'location', 'officer')
+
+# Marks a location the geocoder rejected, as opposed to one it could not reach
+UNRESOLVABLE = 'unresolvable'
+
+
+def detect_import_format(filename: str, import_format: Optional[str] = None) -> str:
+    """
+    Get the format of an import file from an explicit format or its extension.
+
+    Raises:
+        ValueError: If the format is not CSV or JSONL.
+    """
+    import_format = (import_format or os.path.splitext(filename)[1].lstrip('.')).lower()
+    if import_format == 'json':
+        import_format = 'jsonl'
+    if import_format not in IMPORT_FORMATS:
+        raise ValueError(f"Unsupported import format '{import_format}', expected csv or jsonl.")
+    return import_format
+
+
+def read_import_rows(file: BinaryIO, import_format: str) -> Iterator[Tuple[int, Optional[dict]]]:
+    """
+    Stream the rows of a CSV or JSONL import file.
+
+    Args:
+        file: The binary import file, UTF-8 encoded.
+        import_format: 'csv' or 'jsonl'.
+
+    Yields:
+        The line number and the row as a dictionary, or None for a JSONL
+        line that is not a JSON object.
+    """
+    text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    if import_format == 'csv':
+        reader = csv.DictReader(text)
+        for row in reader:
+            yield reader.line_num, row
+        return
+
+    for line_number, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError:
+            row = None
+        yield line_number, row if isinstance(row, dict) else None
+
+
+def check_encoding(file: BinaryIO) -> None:
+    """
+    Check that a seekable import file is UTF-8 encoded before anything is
+    imported, reading it in small buffers, and rewind it.
+
+    Raises:
+        ValueError: If the file is not valid UTF-8.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    try:
+        for data in iter(lambda: file.read(64 * 1024), b''):
+            decoder.decode(data)
+        decoder.decode(b'', final=True)
+    except UnicodeDecodeError as e:
+        raise ValueError(f'File is not UTF-8 encoded: {e.reason} at byte {e.start}.') from e
+    finally:
+        file.seek(0)
+
+
+class ReportRowValidator:
+    """
+    Validates import rows with the field rules of ReportForm.
+
+    Cleaned values and errors are memoised per distinct raw value, so the
+    few violation, status, date and time values repeated across a
+    spreadsheet are only validated once. Call reset() between batches to
+    bound the memo.
+    """
+
+    def __init__(self):
+        self.fields = {name: ReportForm.base_fields[name] for name in IMPORT_FIELDS}
+        self.memo = {}
+
+    def reset(self) -> None:
+        self.memo.clear()
+
+    def clean_value(self, name: str, value: str) -> Tuple[object, Optional[List[str]]]:
+        key = (name, value)
+        if key not in self.memo:
+            try:
+                self.memo[key] = (self.fields[name].clean(value), None)
+            except forms.ValidationError as e:
+                self.memo[key] = (None, e.messages)
+        return self.memo[key]
+
+    def clean(self, row: Optional[dict]) -> Tuple[dict, Dict[str, List[str]]]:
+        """
+        Validate an import row.
+
+        The time may be given as `hour` and `minute` columns, like the form,
+        or as a single HH:MM `time` column. Unlike the form, the date is
+        required, as reports cannot be saved without one.
+
+        Returns:
+            The cleaned values, including a `time`, and the error messages by field.
+        """
+        if row is None:
+            return {}, {'__all__': ['Row is not a JSON object.']}
+
+        values = {name: '' if row.get(name) is None else str(row[name]).strip() for name in IMPORT_FIELDS}
+        if not values['hour'] and not values['minute'] and row.get('time'):
+            values['hour'], _, values['minute'] = str(row['time']).strip().partition(':')
+        for name in ('hour', 'minute'):
+            # 表單選項值不含前導零
+            if values[name].isdigit():
+                values[name] = str(int(values[name]))
+
+        cleaned, errors = {}, {}
+        for name, value in values.items():
+            cleaned[name], field_errors = self.clean_value(name, value)
+            if field_errors:
+                errors[name] = field_errors
+        if not errors.get('date') and cleaned['date'] is None:
+            errors['date'] = [str(forms.Field.default_error_messages['required'])]
+        if not errors.get('hour') and not errors.get('minute'):
+            cleaned['time'] = time(int(cleaned['hour']), int(cleaned['minute']))
+        return cleaned, errors
+
+
+def resolve_location(location: str):
+    """
+    Geocode the location of an imported report.
+
+    Returns:
+        The (address, latitude, longitude, input type) of the location,
+        UNRESOLVABLE if the geocoder rejected it, or None if the geocoder
+        could not be reached and the report should be geocoded later.
+    """
+    try:
+        return process_input(location) or UNRESOLVABLE
+    except googlemaps.exceptions.ApiError as e:
+        return None if e.status in TRANSIENT_API_STATUSES else UNRESOLVABLE
+    except TRANSIENT_ERRORS:
+        return None
+    except (TypeError, ValueError):
+        # 既非地址也非座標
+        return UNRESOLVABLE
+
+
+class ReportImporter:
+    """
+    Imports traffic violation reports from CSV or JSONL files.
+
+    Rows are validated against the ReportForm rules and inserted with
+    bulk_create, one transaction per batch. Each distinct location is
+    geocoded once for the whole import. Rows that fail are skipped and
+    reported with their line number.
+
+    Args:
+        username: The user the reports are filed under.
+        batch_size: The number of rows per transaction.
+        defer_geocoding: Save the raw locations for the background geocoding
+                         task instead of geocoding them during the import.
+                         Defaults to the GEOCODE_DEFERRED setting.
+    """
+
+    def __init__(self, username: str, batch_size: int = IMPORT_BATCH_SIZE,
+                 defer_geocoding: Optional[bool] = None):
+        self.username = username
+        self.batch_size = batch_size
+        self.defer_geocoding = getattr(settings, 'GEOCODE_DEFERRED', False) if defer_geocoding is None else defer_geocoding
+        self.validator = ReportRowValidator()
+        self.locations = {}
+        self.created = 0
+        self.errors = []
+
+    def import_file(self, file: BinaryIO, import_format: str) -> dict:
+        """
+        Import every row of a file.
+
+        Returns:
+            A dictionary with the number of `created` and `failed` rows and
+            the `errors` of each failed row.
+
+        Raises:
+            ValueError: If the file is not UTF-8 encoded. Seekable files are
+                        checked before any row is imported.
+        """
+        if file.seekable():
+            check_encoding(file)
+        rows = read_import_rows(file, import_format)
+        while True:
+            batch = list(islice(rows, self.batch_size))
+            if not batch:
+                break
+            self.import_batch(batch)
+        return self.result()
+
+    def result(self) -> dict:
+        return {'created': self.created, 'failed': len(self.errors), 'errors': self.errors}
+
+    def add_error(self, row_number: int, errors: Dict[str, List[str]]) -> None:
+        self.errors.append({'row': row_number, 'errors': errors})
+
+    def import_batch(self, batch: List[Tuple[int, Optional[dict]]]) -> None:
+        """
+        Validate, geocode and insert a batch of rows in one transaction.
+        """
+        valid = []
+        for row_number, row in batch:
+            cleaned, errors = self.validator.clean(row)
+            if errors:
+                self.add_error(row_number, errors)
+            else:
+                valid.append((row_number, cleaned))
+        self.validator.reset()
+
+        self.resolve_locations(cleaned['location'] for _, cleaned in valid)
+
+        rows, violations = [], []
+        for row_number, cleaned in valid:
+            violation = self.build_violation(cleaned)
+            if violation is None:
+                self.add_error(row_number, {'location': ['Location could not be geocoded.']})
+                continue
+            rows.append(row_number)
+            violations.append(violation)
+        if not violations:
+            return
+
+        try:
+            with transaction.atomic():
+                TrafficViolation.objects.bulk_create(violations)
+                # bulk_create 不會觸發 post_save，改送批次 signal
+                traffic_violations_bulk_created.send(sender=TrafficViolation, instances=violations)
+        except DatabaseError as e:
+            for row_number in rows:
+                self.add_error(row_number, {'__all__': [str(e)]})
+            return
+
+        self.created += len(violations)
+        if any(violation.geocode_status == TrafficViolation.GEOCODE_PENDING for violation in violations):
+            transaction.on_commit(queue_pending_geocoding)
+
+    def resolve_locations(self, locations: Iterable[str]) -> None:
+        """
+        Geocode the locations not seen yet in this import, unless geocoding is deferred.
+        """
+        if not self.defer_geocoding:
+            for location in set(locations) - self.locations.keys():
+                self.locations[location] = resolve_location(location)
+
+    def build_violation(self, cleaned: dict) -> Optional[TrafficViolation]:
+        """
+        Build the report of a valid row, or None if its location was rejected.
+        """
+        violation = TrafficViolation(
+            license_plate=cleaned['license_plate'],
+            date=cleaned['date'],
+            time=cleaned['time'],
+            violation=cleaned['violation'],
+            status=cleaned['status'],
+            officer=cleaned['officer'],
+            username=self.username,
+        )
+        location = None if self.defer_geocoding else self.locations[cleaned['location']]
+        if location == UNRESOLVABLE:
+            return None
+        if location is None:
+            # 保存原始地點，由背景任務進行地理編碼
+            violation.address = cleaned['location']
+            violation.geocode_status = TrafficViolation.GEOCODE_PENDING
+        else:
+            violation.address, violation.latitude, violation.longtitude, violation.user_input_type = location
+        violation.assign_geohash()
+        return violation
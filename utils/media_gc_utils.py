@@ -0,0 +1,259 @@
+import logging
+import os
+import time
+import uuid
+from datetime import timedelta
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional, Set, Tuple
+from django.conf import settings
+from django.utils import timezone
+from reports.models import MediaBlob, MediaFile, MediaUpload
+from .rendition_utils import IMAGE_EXTENSIONS, RENDITION_SUFFIXES, THUMBNAIL, VIDEO_EXTENSIONS
+from .storage_utils import BLOB_PREFIX, BLOB_TEMP_DIR
+from .upload_utils import UPLOAD_DIR
+
+logger = logging.getLogger(__name__)
+
+# Directory, under MEDIA_ROOT, of the media stored before content addressing
+LEGACY_MEDIA_DIR = 'reports/media'
+
+# Directories, under MEDIA_ROOT, swept for orphaned files
+SWEPT_DIRS = (LEGACY_MEDIA_DIR, BLOB_PREFIX, UPLOAD_DIR)
+
+# Directory, under MEDIA_ROOT, orphaned files are moved to when quarantined
+QUARANTINE_DIR = 'quarantine'
+
+# Files checked against the database per query
+MEDIA_GC_CHUNK_SIZE = 1000
+
+# Files modified more recently than this many seconds are never collected
+MEDIA_GC_GRACE_PERIOD = 24 * 60 * 60
+
+# Uploads without a chunk for this many seconds are abandoned
+MEDIA_UPLOAD_EXPIRY = 7 * 24 * 60 * 60
+
+# Quarantined files are deleted after this many seconds
+MEDIA_GC_QUARANTINE_RETENTION = 7 * 24 * 60 * 60
+
+
+def scan_files(root: str, directory: str) -> Iterator[Tuple[str, os.stat_result]]:
+    """
+    Stream the files under a directory of the media root with os.scandir,
+    without listing whole directories into memory.
+
+    Args:
+        root: The media root.
+        directory: The directory to scan, relative to the root.
+
+    Yields:
+        The storage name of each file, relative to the root, and its stat result.
+    """
+    pending = [directory]
+    while pending:
+        current = pending.pop()
+        try:
+            with os.scandir(os.path.join(root, current)) as entries:
+                for entry in entries:
+                    name = f'{current}/{entry.name}'
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append(name)
+                    elif entry.is_file(follow_symlinks=False):
+                        yield name, entry.stat(follow_symlinks=False)
+        except FileNotFoundError:
+            continue
+
+
+def rendition_sources(name: str) -> Optional[List[str]]:
+    """
+    Get the storage names the original of a rendition may have, or None if
+    the name is not a rendition. Renditions drop the extension of their
+    original, so every media extension is a candidate.
+    """
+    for kind, suffix in RENDITION_SUFFIXES.items():
+        if name.endswith(suffix):
+            stem = name[:-len(suffix)]
+            extensions = IMAGE_EXTENSIONS if kind == THUMBNAIL else VIDEO_EXTENSIONS
+            return sorted({stem + variant for extension in extensions
+                           for variant in (extension, extension.upper(), extension.title())})
+    return None
+
+
+def upload_part_id(name: str) -> Optional[uuid.UUID]:
+    """
+    Get the ID of the upload a partial file belongs to, or None if the name
+    is not one of an upload.
+    """
+    basename = os.path.basename(name)
+    if not basename.endswith('.part'):
+        return None
+    try:
+        return uuid.UUID(basename[:-len('.part')])
+    except ValueError:
+        return None
+
+
+class MediaSweeper:
+    """
+    Deletes, or moves to quarantine, the media files no row refers to:
+    media and blobs whose rows were deleted, their renditions, partial
+    files of abandoned or finished uploads, and leftover temporary files.
+
+    The media directories are streamed with os.scandir and checked against
+    the database a chunk at a time, so memory stays flat however many files
+    there are. Files modified within the grace period are never collected,
+    which covers media being stored as well as content-addressed files
+    stored again after their blob was released.
+
+    Args:
+        grace_period: The age, in seconds, below which files are kept.
+                      Defaults to the MEDIA_GC_GRACE_PERIOD setting.
+        chunk_size: The number of files checked per query.
+        quarantine: Move orphaned files under QUARANTINE_DIR, deleted after
+                    MEDIA_GC_QUARANTINE_RETENTION, instead of deleting them.
+                    Defaults to the MEDIA_GC_QUARANTINE setting.
+        dry_run: Only count the files that would be collected.
+    """
+
+    def __init__(self, grace_period: Optional[float] = None, chunk_size: int = MEDIA_GC_CHUNK_SIZE,
+                 quarantine: Optional[bool] = None, dry_run: bool = False):
+        self.root = str(settings.MEDIA_ROOT)
+        self.grace_period = (getattr(settings, 'MEDIA_GC_GRACE_PERIOD', MEDIA_GC_GRACE_PERIOD)
+                             if grace_period is None else grace_period)
+        self.chunk_size = chunk_size
+        self.quarantine = getattr(settings, 'MEDIA_GC_QUARANTINE', False) if quarantine is None else quarantine
+        self.dry_run = dry_run
+        self.expired_ids = set()
+        self.totals = {'scanned': 0, 'collected': 0, 'freed_bytes': 0, 'failed': 0,
+                       'expired_uploads': 0, 'purged': 0}
+
+    def sweep(self) -> dict:
+        """
+        Collect every orphaned media file.
+
+        Returns:
+            The number of files `scanned`, `collected` and `failed`, the
+            `freed_bytes`, the number of `expired_uploads` and of quarantined
+            files `purged`.
+        """
+        self.cutoff = time.time() - self.grace_period
+        self.expire_uploads()
+        for directory in SWEPT_DIRS:
+            files = self.old_files(directory)
+            while True:
+                chunk = list(islice(files, self.chunk_size))
+                if not chunk:
+                    break
+                self.collect(chunk)
+        if self.quarantine:
+            self.purge_quarantine()
+        return self.totals
+
+    def old_files(self, directory: str) -> Iterator[Tuple[str, os.stat_result]]:
+        for name, stat in scan_files(self.root, directory):
+            self.totals['scanned'] += 1
+            if stat.st_mtime < self.cutoff:
+                yield name, stat
+
+    def expire_uploads(self) -> None:
+        """
+        Delete the uploads abandoned for MEDIA_UPLOAD_EXPIRY, leaving their
+        partial files to the sweep.
+        """
+        expiry = getattr(settings, 'MEDIA_UPLOAD_EXPIRY', MEDIA_UPLOAD_EXPIRY)
+        expired = MediaUpload.objects.filter(
+            status=MediaUpload.UPLOADING, updated_at__lt=timezone.now() - timedelta(seconds=expiry),
+        )
+        if self.dry_run:
+            # 試跑不刪除，改在比對時視為已過期
+            self.expired_ids = set(expired.values_list('upload_id', flat=True))
+            self.totals['expired_uploads'] = len(self.expired_ids)
+        else:
+            self.totals['expired_uploads'] = expired.delete()[1].get(MediaUpload._meta.label, 0)
+
+    def collect(self, chunk: List[Tuple[str, os.stat_result]]) -> None:
+        """
+        Collect the files of a chunk no row refers to.
+        """
+        referenced = self.referenced({name for name, _ in chunk})
+        for name, stat in chunk:
+            if name not in referenced:
+                self.remove(name, stat)
+
+    def referenced(self, names: Iterable[str]) -> Set[str]:
+        """
+        Get the names of a chunk that a media file, blob or upload in
+        progress refers to.
+        """
+        uploads, renditions, originals = {}, {}, []
+        for name in names:
+            if name.startswith(f'{UPLOAD_DIR}/'):
+                upload_id = upload_part_id(name)
+                if upload_id is not None:
+                    uploads[name] = upload_id
+            elif name.startswith(f'{BLOB_PREFIX}/{BLOB_TEMP_DIR}/'):
+                # 儲存中的暫存檔，超過寬限期即為殘留
+                continue
+            else:
+                sources = rendition_sources(name)
+                if sources is None:
+                    originals.append(name)
+                else:
+                    # 只比對磁碟上存在的原始檔
+                    renditions[name] = [source for source in sources
+                                        if os.path.exists(os.path.join(self.root, source))]
+
+        candidates = originals + [source for sources in renditions.values() for source in sources]
+        stored = set(MediaFile.objects.filter(file__in=candidates).values_list('file', flat=True))
+        stored |= set(MediaBlob.objects.filter(file__in=candidates).values_list('file', flat=True))
+        active = set(MediaUpload.objects.filter(
+            upload_id__in=uploads.values(), status=MediaUpload.UPLOADING,
+        ).values_list('upload_id', flat=True)) - self.expired_ids if uploads else set()
+
+        referenced = {name for name in originals if name in stored}
+        referenced |= {name for name, sources in renditions.items() if any(source in stored for source in sources)}
+        referenced |= {name for name, upload_id in uploads.items() if upload_id in active}
+        return referenced
+
+    def remove(self, name: str, stat: os.stat_result) -> None:
+        """
+        Delete or quarantine an orphaned file.
+        """
+        path = os.path.join(self.root, name)
+        try:
+            # 掃描後才被重新儲存的檔案保留
+            if os.stat(path).st_mtime >= self.cutoff:
+                return
+            if not self.dry_run:
+                if self.quarantine:
+                    target = os.path.join(self.root, QUARANTINE_DIR, name)
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    os.replace(path, target)
+                    # 保留期限自隔離時起算
+                    os.utime(target)
+                else:
+                    os.remove(path)
+        except FileNotFoundError:
+            return
+        except OSError as e:
+            logger.warning('Could not collect %s: %s', name, e)
+            self.totals['failed'] += 1
+            return
+        self.totals['collected'] += 1
+        self.totals['freed_bytes'] += stat.st_size
+
+    def purge_quarantine(self) -> None:
+        """
+        Delete the quarantined files kept for MEDIA_GC_QUARANTINE_RETENTION.
+        """
+        retention = getattr(settings, 'MEDIA_GC_QUARANTINE_RETENTION', MEDIA_GC_QUARANTINE_RETENTION)
+        cutoff = time.time() - retention
+        for name, stat in scan_files(self.root, QUARANTINE_DIR):
+            if stat.st_mtime >= cutoff:
+                continue
+            if not self.dry_run:
+                try:
+                    os.remove(os.path.join(self.root, name))
+                except OSError as e:
+                    logger.warning('Could not purge %s: %s', name, e)
+                    continue
+            self.totals['purged'] += 1
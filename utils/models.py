@@ -1,3 +1,34 @@
 from django.db import models
+from django.utils import timezone
 
-# Create your models here.
+
+class GeocodeCacheEntry(models.Model):
+    """
+    A cached Google Maps geocoding result, either a normalised address
+    resolved to coordinates or quantised coordinates resolved to an address.
+
+    Misses are cached as well, with empty results, so unresolvable input
+    does not reach the API again until the entry expires.
+    """
+    FORWARD = 'forward'
+    REVERSE = 'reverse'
+    KINDS = [
+        (FORWARD, 'Address to coordinates'),
+        (REVERSE, 'Coordinates to address'),
+    ]
+
+    kind = models.CharField(max_length=10, choices=KINDS)
+    key = models.CharField(max_length=255)  # 正規化輸入的 SHA-256
+    latitude = models.FloatField(null=True, blank=True)
+    longtitude = models.FloatField(null=True, blank=True)
+    address = models.TextField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'key'], name='utils_geocode_kind_key_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.key}"
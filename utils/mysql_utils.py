@@ -1,22 +1,100 @@
-from typing import List, Dict, Optional
+import base64
+import hashlib
+import json
+import uuid
+from collections import Counter
+from typing import List, Dict, Iterable, Iterator, Optional, Tuple, Union
+import numpy as np
 from django.http import JsonResponse, HttpRequest
-from reports.models import TrafficViolation, MediaFile
-from django.db.models import QuerySet, Q
+from reports.models import TrafficViolation, MediaBlob, MediaFile
+from traffic_data.models import TrafficViolationSearchToken, ViolationDailyStat
+from django.db.models import Count, F, Prefetch, QuerySet, Q, Sum, Value
+from django.db.models.functions import Coalesce, Substr
 from django.core.exceptions import ObjectDoesNotExist
 from django.db import transaction
-from datetime import datetime, timedelta
+from datetime import date, datetime, time, timedelta
+from functools import reduce
+from operator import or_
+from .geo_utils import (
+    BoundingBox,
+    CLUSTER_MAX_ZOOM,
+    MarkerData,
+    cluster_points,
+    density_grid,
+    encode_geohash,
+    geohash_covering,
+    parse_bounding_box,
+    parse_heatmap_options,
+    parse_zoom,
+    snap_bounding_box,
+    tile_bounding_box,
+)
+from .cache_utils import (
+    MAX_TILE_ZOOM,
+    bump_marker_version,
+    get_cached_heatmap,
+    get_cached_tile,
+    invalidate_traffic_violation_tiles,
+)
+from .nearby_utils import log_location_changes
+from .packed_utils import pack_markers
+from .search_utils import query_tokens, tokenize_fields
+
+# Rows fetched per round trip when streaming large result sets
+STREAM_CHUNK_SIZE = 2000
+
+# Fields covered by the keyword search index
+SEARCH_FIELDS = ('license_plate', 'violation', 'address', 'officer')
+
+# Geohash prefix length of the grid cells in the daily statistics (~4.9km)
+STATS_GRID_PRECISION = 5
+
+# Columns the daily statistics can be grouped by
+STATS_GROUP_FIELDS = ('date', 'violation', 'status', 'grid_cell')
+
+# Largest number of traffic violations a batch details request may ask for
+MAX_DETAILS_BATCH = 100
+
+# Default and maximum page sizes of cursor paginated searches
+DEFAULT_PAGE_LIMIT = 100
+MAX_PAGE_LIMIT = 1000
+
+# Columns and page size of the per-user record lists
+USER_RECORD_FIELDS = ('traffic_violation_id', 'license_plate', 'date', 'time', 'violation', 'status')
+USER_RECORDS_PAGE_SIZE = 50
+
+def get_user_records(username: str) -> List[Dict]:
+    """
+    Retrieve the record list of a specific user from the MySQL database.
+
+    Args:
+        username: The username whose records are to be retrieved.
+
+    Returns:
+        A list of dictionaries with the USER_RECORD_FIELDS of the user's records, newest first.
+    """
+    return list(TrafficViolation.objects.filter(username=username)
+                .order_by('-date', '-time', '-traffic_violation_id').values(*USER_RECORD_FIELDS))
 
-def get_user_records(id: int) -> List[Dict]:
+def get_user_records_page(username: str, cursor: Optional[str] = None,
+                          limit: int = USER_RECORDS_PAGE_SIZE) -> Tuple[List[Dict], Optional[str]]:
     """
-    Retrieve records for a specific user from the MySQL database.
+    Retrieve one page of the record list of a specific user, newest first,
+    through the (username, date, time, traffic_violation_id) index.
 
     Args:
-        id: The id of user for which records are to be retrieved.
+        username: The username whose records are to be retrieved.
+        cursor: The cursor returned with the previous page, or None for the first page.
+        limit: The maximum number of records on the page.
 
     Returns:
-        A list of dictionaries representing the user's records.
+        A tuple of the page's records, with their USER_RECORD_FIELDS, and
+        the cursor of the next page, or None on the last page.
+
+    Raises:
+        ValueError: If the cursor is malformed.
     """
-    return list(TrafficViolation.objects.filter(id=id).values())
+    return seek_page(TrafficViolation.objects.filter(username=username), cursor, limit, USER_RECORD_FIELDS)
 
 def get_media_records(record_id: str) -> List[Dict]:
     """
@@ -38,6 +116,10 @@ def update_traffic_violation(data: Dict, selected_record_id: str):
         data: The updated data for the traffic violation record.
         selected_record_id: The ID of the selected traffic violation record.
     """
+    if 'latitude' in data and 'longtitude' in data:
+        # Keep the spatial index column in sync since update() bypasses save()
+        data = {**data, 'geohash': encode_geohash(data['latitude'], data['longtitude'])}
+
     updated_rows = TrafficViolation.objects.filter(
         traffic_violation_id=selected_record_id
     ).update(**data)
@@ -46,52 +128,238 @@ def update_traffic_violation(data: Dict, selected_record_id: str):
         raise ObjectDoesNotExist(f"Record with ID {selected_record_id} does not exist.")
 
 @transaction.atomic
-def update_media_files(selected_record_id: str, new_media_files: List[str], removed_media: List[str]):
+def update_media_files(selected_record_id: str, new_media_blobs: List[MediaBlob], removed_media: List[str]):
     """
     Updates media files associated with a specific traffic violation record in the MySQL database.
 
     Args:
         selected_record_id: The ID of the selected traffic violation record.
-        new_media_files: The new media files to be added.
-        removed_media: The media files to be removed.
+        new_media_blobs: The stored blobs of the new media files, each with a reference taken.
+        removed_media: The media files to be removed. Their blobs are released by signal.
     """
     MediaFile.objects.filter(
         file__in=removed_media, traffic_violation_id=selected_record_id
     ).delete()
 
-    MediaFile.objects.bulk_create([
-        MediaFile(traffic_violation_id=selected_record_id, file=file_name)
-        for file_name in new_media_files
-    ])
+    # 逐筆建立以觸發產生預覽的 post_save signal
+    for blob in new_media_blobs:
+        MediaFile.objects.create(traffic_violation_id=selected_record_id, blob=blob, file=blob.file.name)
 
-def search_traffic_violations(keyword: str = '', time_range: str = 'all', 
-                             from_date: Optional[datetime] = None, 
-                             to_date: Optional[datetime] = None) -> JsonResponse:
+@transaction.atomic
+def update_search_tokens(violations: Iterable[TrafficViolation]) -> None:
     """
-    Searches for traffic violations based on various filters such as keywords and time range.
+    Rebuild the keyword search tokens of traffic violations.
+
+    Args:
+        violations: The traffic violations whose searchable fields changed.
+    """
+    violations = list(violations)
+    TrafficViolationSearchToken.objects.filter(
+        traffic_violation_id__in=[violation.pk for violation in violations]
+    ).delete()
+
+    TrafficViolationSearchToken.objects.bulk_create([
+        TrafficViolationSearchToken(traffic_violation_id=violation.pk, token=token)
+        for violation in violations
+        for token in tokenize_fields(getattr(violation, field) for field in SEARCH_FIELDS)
+    ], batch_size=5000)
+
+
+def daily_stat_key(violation_date: date, violation: str, status: str, geohash: Optional[str]) -> tuple:
+    """
+    Get the daily statistics bucket a report falls into.
+    """
+    return violation_date, violation, status, (geohash or '')[:STATS_GRID_PRECISION]
+
+
+@transaction.atomic
+def adjust_daily_stats(deltas: Dict[tuple, int]) -> None:
+    """
+    Apply count changes to the daily statistics buckets.
+
+    Args:
+        deltas: A mapping of daily_stat_key tuples to the change of their count.
+    """
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    # 先一次建立缺少的 bucket，再逐一累加
+    ViolationDailyStat.objects.bulk_create([
+        ViolationDailyStat(date=stat_date, violation=violation, status=status, grid_cell=grid_cell)
+        for stat_date, violation, status, grid_cell in deltas
+    ], ignore_conflicts=True)
+    for (stat_date, violation, status, grid_cell), delta in deltas.items():
+        ViolationDailyStat.objects.filter(
+            date=stat_date, violation=violation, status=status, grid_cell=grid_cell
+        ).update(count=F('count') + delta)
+
+
+def count_daily_stats(violations: Iterable[TrafficViolation]) -> Counter:
+    """
+    Count traffic violations per daily statistics bucket.
+    """
+    return Counter(
+        daily_stat_key(violation.date, violation.violation, violation.status, violation.geohash)
+        for violation in violations
+    )
+
+
+@transaction.atomic
+def rebuild_daily_stats() -> int:
+    """
+    Recompute every daily statistics bucket from the traffic violations.
+
+    Returns:
+        The number of buckets written.
+    """
+    buckets = (
+        TrafficViolation.objects
+        .annotate(grid_cell=Substr(Coalesce('geohash', Value('')), 1, STATS_GRID_PRECISION))
+        .values('date', 'violation', 'status', 'grid_cell')
+        .annotate(count=Count('traffic_violation_id'))
+        .order_by()
+    )
+
+    ViolationDailyStat.objects.all().delete()
+    stats = ViolationDailyStat.objects.bulk_create(
+        (ViolationDailyStat(**bucket) for bucket in buckets.iterator()), batch_size=5000
+    )
+    return len(stats)
+
+
+@transaction.atomic
+def bulk_update_locations(violations: List[TrafficViolation],
+                          previous_locations: Dict[uuid.UUID, Tuple[Optional[float], Optional[float]]],
+                          fields: Iterable[str] = ()) -> None:
+    """
+    Write new coordinates of many traffic violations in batched UPDATEs.
+
+    bulk_update bypasses save() and the model signals, so the geohash, the
+    daily statistics buckets, the location change log, the cached tiles and
+    the marker version are refreshed here instead.
+
+    Args:
+        violations: The traffic violations with their new coordinates.
+        previous_locations: The (latitude, longitude) of each violation before the change, by ID.
+        fields: Additional fields to write along with the coordinates.
+    """
+    for violation in violations:
+        violation.assign_geohash()
+    TrafficViolation.objects.bulk_update(
+        violations, ['latitude', 'longtitude', 'geohash', *fields], batch_size=STREAM_CHUNK_SIZE
+    )
+
+    deltas = count_daily_stats(violations)
+    deltas.subtract(Counter(
+        daily_stat_key(violation.date, violation.violation, violation.status,
+                       encode_geohash(*previous_locations.get(violation.pk, (None, None))))
+        for violation in violations
+    ))
+    adjust_daily_stats(deltas)
+    log_location_changes((violation.pk, violation.latitude, violation.longtitude) for violation in violations)
+
+    def refresh_caches():
+        bump_marker_version()
+        for violation in violations:
+            invalidate_traffic_violation_tiles(*previous_locations.get(violation.pk, (None, None)))
+            invalidate_traffic_violation_tiles(violation.latitude, violation.longtitude)
+
+    transaction.on_commit(refresh_caches)
+
+
+def get_violation_statistics(from_date: Optional[date] = None, to_date: Optional[date] = None,
+                             group_by: Iterable[str] = ('date',), violation: str = '',
+                             status: str = '') -> List[dict]:
+    """
+    Answers time range statistics from the daily statistics buckets.
+
+    Args:
+        from_date: The first day to count. Defaults to None, for no lower bound.
+        to_date: The last day to count. Defaults to None, for no upper bound.
+        group_by: The columns to group the counts by, out of STATS_GROUP_FIELDS.
+        violation: Only count this violation type. Defaults to every type.
+        status: Only count this status. Defaults to every status.
+
+    Returns:
+        A list of dictionaries holding the group columns and their `count`.
+
+    Raises:
+        ValueError: If a group column is not in STATS_GROUP_FIELDS.
+    """
+    group_by = [field for field in group_by if field]
+    invalid = set(group_by) - set(STATS_GROUP_FIELDS)
+    if invalid:
+        raise ValueError(f"Cannot group by {', '.join(sorted(invalid))}.")
+
+    stats = ViolationDailyStat.objects.filter(count__gt=0)
+    if from_date:
+        stats = stats.filter(date__gte=from_date)
+    if to_date:
+        stats = stats.filter(date__lte=to_date)
+    if violation:
+        stats = stats.filter(violation=violation)
+    if status:
+        stats = stats.filter(status=status)
+
+    if not group_by:
+        return [{'count': stats.aggregate(count=Sum('count'))['count'] or 0}]
+    return list(stats.values(*group_by).annotate(count=Sum('count')).order_by(*group_by))
+
+
+def filter_by_keyword(violations: QuerySet, keyword: str) -> QuerySet:
+    """
+    Restrict traffic violations to those whose license plate, violation,
+    address or officer contains a keyword.
+
+    The keyword is split into n-grams and resolved against the search token
+    index, keeping the violations that hold every n-gram. Holding every
+    n-gram does not mean holding them in order or within one field, so the
+    candidates are then checked for the keyword itself. Keywords too short
+    to form a token only scan the columns.
+
+    Args:
+        violations: The queryset of traffic violations to filter.
+        keyword: The search keyword.
+
+    Returns:
+        The filtered queryset.
+    """
+    contains_keyword = reduce(or_, (Q(**{f'{field}__icontains': keyword}) for field in SEARCH_FIELDS))
+    tokens = query_tokens(keyword)
+    if not tokens:
+        return violations.filter(contains_keyword)
+
+    matches = (
+        TrafficViolationSearchToken.objects
+        .filter(token__in=tokens)
+        .values('traffic_violation')
+        .annotate(matched=Count('token'))
+        .filter(matched=len(tokens))
+        .values('traffic_violation')
+    )
+    return violations.filter(traffic_violation_id__in=matches).filter(contains_keyword)
+
+
+def filter_traffic_violations(keyword: str = '', time_range: str = 'all',
+                              from_date: Optional[datetime] = None,
+                              to_date: Optional[datetime] = None) -> QuerySet:
+    """
+    Filters traffic violations by keyword and time range.
 
     Args:
         keyword: A string for filtering the violations. Defaults to an empty string.
         time_range: A string indicating the time range for the filter. Can be '1day', '1week', 
-                    '1month', '6months', '1year', or 'all'. Defaults to 'all'.
+                    '1month', '6months', '1year', 'custom' or 'all'. Defaults to 'all'.
         from_date: The starting date for custom time range filter. Defaults to None.
         to_date: The ending date for custom time range filter. Defaults to None.
 
     Returns:
-        JsonResponse: A JSON response containing the list of traffic violations that match the filters.
-
+        QuerySet: The traffic violations that match the filters.
     """
-
-    violations: QuerySet = TrafficViolation.objects.all()
+    # 尚未完成地理編碼的報告沒有座標，不顯示於地圖
+    violations: QuerySet = TrafficViolation.objects.all().exclude(latitude=None)
 
     # Keyword search
     if keyword:
-        violations = violations.filter(
-            Q(license_plate__icontains=keyword) | 
-            Q(violation__icontains=keyword) |
-            Q(location__icontains=keyword) |
-            Q(officer__icontains=keyword)
-        )
+        violations = filter_by_keyword(violations, keyword)
 
     # Time range search
     if time_range == 'custom' and from_date and to_date:
@@ -111,43 +379,448 @@ def search_traffic_violations(keyword: str = '', time_range: str = 'all',
         if start_date:
             violations = violations.filter(date__range=[start_date, end_date])
 
+    return violations
+
+
+def search_traffic_violations(keyword: str = '', time_range: str = 'all', 
+                             from_date: Optional[datetime] = None, 
+                             to_date: Optional[datetime] = None,
+                             zoom: Optional[int] = None,
+                             packed: bool = False) -> JsonResponse:
+    """
+    Searches for traffic violations based on various filters such as keywords and time range.
+
+    Args:
+        keyword: A string for filtering the violations. Defaults to an empty string.
+        time_range: A string indicating the time range for the filter. Can be '1day', '1week', 
+                    '1month', '6months', '1year', or 'all'. Defaults to 'all'.
+        from_date: The starting date for custom time range filter. Defaults to None.
+        to_date: The ending date for custom time range filter. Defaults to None.
+        zoom: The map zoom level; when given, low zoom levels return clusters. Defaults to None.
+        packed: Whether to return the compact binary payload. Defaults to False.
+
+    Returns:
+        JsonResponse: A JSON response containing the list of traffic violations that match the filters.
+
+    """
+    violations = filter_traffic_violations(keyword, time_range, from_date, to_date)
+
     # Transform data into the required format
-    markers: List[dict] = [
+    return build_markers(violations, zoom, packed)
+
+
+def encode_cursor(violation_date: date, violation_time: time, traffic_violation_id: uuid.UUID) -> str:
+    """
+    Encode the sort key of the last row of a page as an opaque cursor token.
+    """
+    key = [violation_date.isoformat(), violation_time.isoformat(), str(traffic_violation_id)]
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[date, time, uuid.UUID]:
+    """
+    Decode a cursor token produced by encode_cursor.
+
+    Raises:
+        ValueError: If the token is malformed.
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        violation_date, violation_time, traffic_violation_id = json.loads(base64.urlsafe_b64decode(padded))
+        return (date.fromisoformat(violation_date), time.fromisoformat(violation_time),
+                uuid.UUID(traffic_violation_id))
+    except (TypeError, ValueError) as e:
+        raise ValueError('Invalid cursor.') from e
+
+
+def parse_page_limit(params, default: int = DEFAULT_PAGE_LIMIT) -> int:
+    """
+    Parse the `limit` query parameter of a paginated search, `default` if absent.
+
+    Raises:
+        ValueError: If the limit is not an integer between 1 and MAX_PAGE_LIMIT.
+    """
+    limit = int(params.get('limit') or default)
+    if not 1 <= limit <= MAX_PAGE_LIMIT:
+        raise ValueError(f'limit must be between 1 and {MAX_PAGE_LIMIT}.')
+    return limit
+
+
+def seek_page(violations: QuerySet, cursor: Optional[str], limit: int,
+              fields: Iterable[str]) -> Tuple[List[dict], Optional[str]]:
+    """
+    Read one page of traffic violations, newest first, using keyset
+    pagination on (date, time, traffic_violation_id).
+
+    Each page seeks past the previous page's last row through a composite
+    index ending in those columns instead of skipping rows with OFFSET, so
+    deep pages cost the same as the first one.
+
+    Args:
+        violations: The queryset of traffic violations to paginate.
+        cursor: The cursor returned with the previous page, or None for the first page.
+        limit: The maximum number of rows on the page.
+        fields: The columns to read, besides the sort key.
+
+    Returns:
+        A tuple of the page's rows as dictionaries and the cursor of the
+        next page, or None on the last page.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    if cursor:
+        last_date, last_time, last_id = decode_cursor(cursor)
+        # 先以 date <= 游標日期限定索引範圍，MySQL 無法以單純的 OR 條件掃描索引區間
+        violations = violations.filter(date__lte=last_date).filter(
+            Q(date__lt=last_date) |
+            Q(date=last_date, time__lt=last_time) |
+            Q(date=last_date, time=last_time, traffic_violation_id__lt=last_id)
+        )
+
+    columns = dict.fromkeys([*fields, 'date', 'time', 'traffic_violation_id'])
+    rows = list(violations.order_by('-date', '-time', '-traffic_violation_id').values(*columns)[:limit + 1])
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        next_cursor = encode_cursor(last['date'], last['time'], last['traffic_violation_id'])
+    return rows[:limit], next_cursor
+
+
+def paginate_traffic_violations(violations: QuerySet, cursor: Optional[str] = None,
+                                limit: int = DEFAULT_PAGE_LIMIT) -> Tuple[List[dict], Optional[str]]:
+    """
+    Read one page of traffic violation markers, newest first.
+
+    Args:
+        violations: The queryset of traffic violations to paginate.
+        cursor: The cursor returned with the previous page, or None for the first page.
+        limit: The maximum number of markers on the page.
+
+    Returns:
+        A tuple of the page's markers and the cursor of the next page, or None on the last page.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    rows, next_cursor = seek_page(violations, cursor, limit,
+                                  ('traffic_violation_id', 'license_plate', 'violation', 'latitude', 'longtitude'))
+    markers = [
         {
-            'traffic_violation_id': str(violation.traffic_violation_id),  # Convert UUID to string
-            'lat': violation.latitude,  # Extract and convert latitude to float
-            'lng': violation.longtitude,  # Extract and convert longitude to float
+            'traffic_violation_id': str(row['traffic_violation_id']),
+            'license_plate': row['license_plate'],
+            'violation': row['violation'],
+            'lat': row['latitude'],
+            'lng': row['longtitude'],
         }
-        for violation in violations
+        for row in rows
     ]
+    return markers, next_cursor
+
+
+def wants_streaming(request: HttpRequest, zoom: Optional[int] = None) -> bool:
+    """
+    Check whether a search should be streamed as a JSON array.
+
+    Streaming is requested with `?stream=1` and only applies to individual
+    markers, since clustering needs every row before it can emit anything.
+
+    Args:
+        request: The HttpRequest containing the request parameters.
+        zoom: The requested map zoom level, if any.
+
+    Returns:
+        True if the response should be streamed.
+    """
+    return (request.GET.get('stream', '').lower() in ('1', 'true')
+            and (zoom is None or zoom > CLUSTER_MAX_ZOOM))
+
+
+def stream_traffic_violation_markers(violations: QuerySet, chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[str]:
+    """
+    Encodes traffic violations as a JSON array of markers, chunk by chunk.
+
+    Rows are read in primary key order, one keyset batch per query, because
+    the MySQL driver buffers a whole result set even behind iterator(). Memory
+    therefore stays flat however many violations match.
+
+    Args:
+        violations: The queryset of traffic violations to encode.
+        chunk_size: The number of rows fetched from the database and encoded at a time.
+
+    Yields:
+        Consecutive pieces of the JSON array.
+    """
+    rows = violations.order_by('traffic_violation_id').values_list(
+        'traffic_violation_id', 'license_plate', 'violation', 'latitude', 'longtitude'
+    )
+
+    yield '['
+    separator = ''
+    last_id = None
+    while True:
+        batch = rows if last_id is None else rows.filter(traffic_violation_id__gt=last_id)
+        batch = list(batch[:chunk_size])
+        if not batch:
+            break
+
+        yield separator + ','.join(
+            json.dumps({
+                'traffic_violation_id': str(traffic_violation_id),
+                'license_plate': license_plate,
+                'violation': violation,
+                'lat': latitude,
+                'lng': longtitude,
+            })
+            for traffic_violation_id, license_plate, violation, latitude, longtitude in batch
+        )
+        separator = ','
+        last_id = batch[-1][0]
+
+    yield ']'
+
+
+def filter_by_bounding_box(violations: QuerySet, bbox: BoundingBox) -> QuerySet:
+    """
+    Restrict traffic violations to those inside a bounding box.
+
+    The geohash prefixes covering the box narrow the rows down through the
+    geohash index, and the exact coordinate ranges trim the cell overhang.
+
+    Args:
+        violations: The queryset of traffic violations to filter.
+        bbox: The bounding box, usually the visible map area.
+
+    Returns:
+        The filtered queryset.
+    """
+    prefixes = geohash_covering(bbox)
+    if prefixes:
+        violations = violations.filter(
+            reduce(or_, (Q(geohash__startswith=prefix) for prefix in prefixes))
+        )
+
+    return violations.filter(
+        latitude__range=(bbox.south, bbox.north),
+        longtitude__range=(bbox.west, bbox.east),
+    )
+
+
+def collect_markers(violations: QuerySet, zoom: Optional[int] = None) -> MarkerData:
+    """
+    Read traffic violations as columnar map markers.
+
+    Below CLUSTER_MAX_ZOOM the markers are merged into grid clusters, each
+    reported as its centroid with a count. Clusters holding a single
+    violation are reported as that violation's marker.
 
-    return markers
+    Args:
+        violations: The queryset of traffic violations to read.
+        zoom: The map zoom level, or None to always return individual markers.
 
+    Returns:
+        The MarkerData of the violations.
+    """
+    rows = list(violations.values_list('traffic_violation_id', 'license_plate', 'violation', 'latitude', 'longtitude'))
+    ids, license_plates, violation_types, lats, lngs = (list(column) for column in zip(*rows)) if rows else ([], [], [], [], [])
+    lats = np.asarray(lats, dtype=np.float64)
+    lngs = np.asarray(lngs, dtype=np.float64)
+
+    if zoom is None or zoom > CLUSTER_MAX_ZOOM:
+        empty = np.empty(0, dtype=np.float64)
+        return MarkerData(ids, license_plates, violation_types, lats, lngs, empty, empty, np.empty(0, dtype=np.int64))
+
+    clusters = cluster_points(lats, lngs, zoom)
+    singles = clusters.members[clusters.counts == 1]
+    grouped = clusters.counts > 1
+    return MarkerData(
+        ids=[ids[index] for index in singles],
+        license_plates=[license_plates[index] for index in singles],
+        violations=[violation_types[index] for index in singles],
+        lats=lats[singles],
+        lngs=lngs[singles],
+        cluster_lats=clusters.lats[grouped],
+        cluster_lngs=clusters.lngs[grouped],
+        cluster_counts=clusters.counts[grouped],
+    )
+
+
+def build_markers(violations: QuerySet, zoom: Optional[int] = None, packed: bool = False) -> Union[List[dict], bytes]:
+    """
+    Transform traffic violations into map markers.
+
+    Args:
+        violations: The queryset of traffic violations to transform.
+        zoom: The map zoom level, or None to always return individual markers.
+        packed: Whether to return the compact binary payload instead of dictionaries.
+
+    Returns:
+        A list of marker and cluster dictionaries, or the packed payload.
+    """
+    markers = collect_markers(violations, zoom)
+    return pack_markers(markers) if packed else markers.to_dicts()
+
+
+def parse_marker_params(params) -> Tuple[Optional[BoundingBox], Optional[int]]:
+    """
+    Parse the viewport and zoom level a marker response depends on.
+
+    The viewport is snapped outwards to a grid, so that nearby viewports
+    share one response and one cached snapshot.
+
+    Args:
+        params: The query parameters of the request.
+
+    Returns:
+        A tuple of the snapped BoundingBox, or None, and the zoom level, or None.
 
-def get_traffic_violation_markers(request: HttpRequest) -> JsonResponse:
+    Raises:
+        ValueError: If the viewport or zoom parameters are invalid.
+    """
+    bbox = parse_bounding_box(params)
+    return (bbox and snap_bounding_box(bbox)), parse_zoom(params)
+
+
+def get_traffic_violation_markers(request: HttpRequest, packed: bool = False) -> JsonResponse:
     """
     Retrieves markers for traffic violations to be displayed on a map.
 
+    When the request carries `north`, `south`, `east` and `west` parameters
+    only the violations inside that viewport, snapped outwards to a grid,
+    are read, and a `zoom` parameter clusters the markers at low zoom levels.
+
     Args:
         request: The HttpRequest containing the request parameters.
+        packed: Whether to return the compact binary payload.
 
     Returns:
         A JsonResponse containing the markers for traffic violations.
+
+    Raises:
+        ValueError: If the viewport or zoom parameters are invalid.
     """
-    violations = TrafficViolation.objects.values('traffic_violation_id', 'latitude', 'longtitude', 'license_plate', 'violation')
-    print(violations)
-    markers = [
-        {
-            'traffic_violation_id': str(v['traffic_violation_id']),
-            'license_plate': str(v['license_plate']),
-            'violation': str(v['violation']),
-            'lat': float(v['latitude']),
-            'lng': float(v['longtitude']),
+    violations = TrafficViolation.objects.all().exclude(latitude=None)
+
+    bbox, zoom = parse_marker_params(request.GET)
+    if bbox:
+        violations = filter_by_bounding_box(violations, bbox)
+
+    return build_markers(violations, zoom, packed)
+
+
+def get_traffic_violation_tile(z: int, x: int, y: int, packed: bool = False) -> Union[List[dict], bytes]:
+    """
+    Retrieves the pre-aggregated markers of a slippy map tile.
+
+    Tiles are generated with the clustering of their own zoom level and kept
+    in the cache until a report inside them is created, edited or deleted.
+
+    Args:
+        z: The zoom level of the tile.
+        x: The column of the tile.
+        y: The row of the tile.
+        packed: Whether to return the compact binary payload.
+
+    Returns:
+        A list of marker and cluster dictionaries inside the tile, or the packed payload.
+
+    Raises:
+        ValueError: If the tile does not exist or is beyond MAX_TILE_ZOOM.
+    """
+    if z > MAX_TILE_ZOOM:
+        raise ValueError(f'Tiles are only served up to zoom level {MAX_TILE_ZOOM}.')
+    bbox = tile_bounding_box(z, x, y)
+
+    markers = get_cached_tile(
+        z, x, y,
+        lambda: collect_markers(filter_by_bounding_box(TrafficViolation.objects.all(), bbox), z),
+    )
+    return pack_markers(markers) if packed else markers.to_dicts()
+
+
+def get_traffic_violation_heatmap(params) -> dict:
+    """
+    Computes the density of traffic violations over a bounding box.
+
+    The coordinates matching the filters are read in a single query and
+    binned with numpy, and the result is cached per parameter set until the
+    dataset changes.
+
+    Args:
+        params: The query parameters: `north`, `south`, `east` and `west`,
+                optionally `size`, `smoothing`, `violation`, `timeRange`,
+                `fromDate` and `toDate`.
+
+    Returns:
+        A dictionary with the bounds, the grid `size`, the total `count`, the
+        largest cell value as `max` and the `grid` rows from north to south.
+
+    Raises:
+        ValueError: If the bounds are missing or a parameter is invalid.
+    """
+    bbox = parse_bounding_box(params)
+    if bbox is None:
+        raise ValueError('north, south, east and west are required.')
+    size, smoothing = parse_heatmap_options(params)
+    violation = params.get('violation', '')
+    time_range = params.get('timeRange', 'all')
+    # 日期格式錯誤時 fromisoformat 拋出 ValueError，由 API 回應 400
+    from_date = params.get('fromDate')
+    from_date = date.fromisoformat(from_date) if from_date else None
+    to_date = params.get('toDate')
+    to_date = date.fromisoformat(to_date) if to_date else None
+
+    def build() -> dict:
+        violations = filter_by_bounding_box(
+            filter_traffic_violations('', time_range, from_date, to_date), bbox
+        )
+        if violation:
+            violations = violations.filter(violation=violation)
+
+        coordinates = np.array(list(violations.values_list('latitude', 'longtitude')), dtype=np.float64).reshape(-1, 2)
+        grid = density_grid(coordinates[:, 0], coordinates[:, 1], bbox, size, smoothing)
+        grid = np.round(grid, 3) if smoothing else grid.astype(np.int64)
+        return {
+            **bbox._asdict(),
+            'size': size,
+            'count': len(coordinates),
+            'max': grid.max().item(),
+            'grid': grid.tolist(),
         }
-        for v in violations
-    ]
 
-    return markers
+    request_key = hashlib.sha1(
+        repr((tuple(bbox), size, smoothing, violation, time_range, from_date, to_date)).encode()
+    ).hexdigest()
+    return get_cached_heatmap(request_key, build)
+
+
+def serialize_traffic_violation_details(violation: TrafficViolation, media_files: List[str]) -> Dict:
+    """
+    Build the details payload shown when a traffic violation marker is opened.
+
+    Args:
+        violation: The traffic violation.
+        media_files: The file names of the media attached to the violation.
+
+    Returns:
+        A dictionary of the violation details.
+    """
+    location = (violation.address if violation.user_input_type == "address" or violation.latitude is None
+        else f"{violation.latitude}, {violation.longtitude}")
+
+    return {
+        'lat': violation.latitude,
+        'lng': violation.longtitude,
+        'title': f'{violation.license_plate} - {violation.violation}',
+        'media': media_files,
+        'license_plate': violation.license_plate,
+        'date': violation.date,
+        'time': violation.time.strftime('%H:%M'),
+        'violation': violation.violation,
+        'location': location,
+        'status': violation.status,
+        'officer': violation.officer or 'None'
+    }
 
 
 def get_traffic_violation_details(request: HttpRequest, traffic_violation_id: str) -> JsonResponse:
@@ -165,29 +838,57 @@ def get_traffic_violation_details(request: HttpRequest, traffic_violation_id: st
         violation = TrafficViolation.objects.get(traffic_violation_id=traffic_violation_id)
         media_files = list(MediaFile.objects.filter(traffic_violation=violation).values_list('file', flat=True))
 
-        location = (violation.address if violation.user_input_type == "address"
-            else f"{violation.latitude}, {violation.longtitude}")
-
-        lat, lng = violation.latitude, violation.longtitude
-        data = {
-            'lat': lat,
-            'lng': lng,
-            'title': f'{violation.license_plate} - {violation.violation}',
-            'media': media_files,
-            'license_plate': violation.license_plate,
-            'date': violation.date,
-            'time': violation.time.strftime('%H:%M'),
-            'violation': violation.violation,
-            'location': location,
-            'status': violation.status,
-            'officer': violation.officer.username if violation.officer else 'None'
-        }
-
-        return data
+        return serialize_traffic_violation_details(violation, media_files)
 
     except TrafficViolation.DoesNotExist:
         return JsonResponse({'error': 'Traffic violation not found'}, status=404)
 
+
+def parse_traffic_violation_ids(params) -> List[uuid.UUID]:
+    """
+    Parse the `ids` query parameter, given as repeated or comma separated values.
+
+    Args:
+        params: The query parameters of the request.
+
+    Returns:
+        The distinct traffic violation IDs, in request order.
+
+    Raises:
+        ValueError: If an ID is not a UUID, or more than MAX_DETAILS_BATCH IDs are given.
+    """
+    values = [value for param in params.getlist('ids') for value in param.split(',') if value.strip()]
+    ids = list(dict.fromkeys(uuid.UUID(value.strip()) for value in values))
+    if len(ids) > MAX_DETAILS_BATCH:
+        raise ValueError(f'At most {MAX_DETAILS_BATCH} ids can be requested at once.')
+    return ids
+
+
+def get_traffic_violation_details_batch(traffic_violation_ids: Iterable[uuid.UUID]) -> Dict[str, Dict]:
+    """
+    Provides the details of many traffic violations in two queries, one for
+    the violations and one for all of their media files.
+
+    Args:
+        traffic_violation_ids: The IDs of the traffic violations.
+
+    Returns:
+        A dictionary mapping each found ID to the same payload as
+        get_traffic_violation_details. Unknown IDs are left out.
+    """
+    violations = TrafficViolation.objects.filter(
+        traffic_violation_id__in=list(traffic_violation_ids)
+    ).prefetch_related(
+        Prefetch('mediafile_set', queryset=MediaFile.objects.only('traffic_violation', 'file'))
+    )
+
+    return {
+        str(violation.traffic_violation_id): serialize_traffic_violation_details(
+            violation, [media.file.name for media in violation.mediafile_set.all()]
+        )
+        for violation in violations
+    }
+
 @transaction.atomic
 def save_to_mysql(traffic_violation: TrafficViolation, media_files: List[str]) -> None:
     """
@@ -0,0 +1,348 @@
+import heapq
+import math
+import threading
+import time
+import numpy as np
+from datetime import timedelta
+from typing import Iterable, List, Mapping, Optional, Tuple
+from django.db.models import Max
+from django.utils import timezone
+from reports.models import TrafficViolation
+from traffic_data.models import TrafficViolationLocationChange
+
+# Mean radius of the earth in metres
+EARTH_RADIUS_M = 6371008.8
+
+# Points held by each leaf of the k-d tree
+KD_LEAF_SIZE = 16
+
+# Default and maximum number of neighbours returned by a nearby query
+DEFAULT_NEARBY_COUNT = 10
+MAX_NEARBY_COUNT = 100
+
+# Reports added since the last build that trigger a full rebuild
+MIN_REBUILD_BUFFER = 1000
+
+# Rebuild the in-process index from scratch at least this often, picking up
+# changes whose log rows committed out of ID order
+NEARBY_INDEX_MAX_AGE = 60 * 60
+
+# Location changes older than this are pruned from the log, which every
+# index has been rebuilt past by then
+NEARBY_CHANGE_RETENTION = timedelta(days=1)
+
+
+def to_unit_vectors(lats, lngs) -> np.ndarray:
+    """
+    Convert coordinates into 3D unit vectors, so that euclidean (chord)
+    distances between them are monotonic in great-circle distance.
+    """
+    lats = np.radians(np.asarray(lats, dtype=np.float64))
+    lngs = np.radians(np.asarray(lngs, dtype=np.float64))
+    cos_lats = np.cos(lats)
+    return np.column_stack((cos_lats * np.cos(lngs), cos_lats * np.sin(lngs), np.sin(lats)))
+
+
+def metres_to_chord(metres: float) -> float:
+    """
+    Convert a great-circle distance into the chord length on the unit sphere.
+    """
+    return 2 * math.sin(min(metres / EARTH_RADIUS_M, math.pi) / 2)
+
+
+def chord_to_metres(chord: float) -> float:
+    """
+    Convert a chord length on the unit sphere into a great-circle distance.
+    """
+    return 2 * EARTH_RADIUS_M * math.asin(min(chord / 2, 1.0))
+
+
+class KDTree:
+    """
+    A static k-d tree over points stored in a numpy array.
+
+    Nodes split the point with the median coordinate along their widest
+    axis, and leaves are scanned with vectorised distance computations.
+    """
+
+    def __init__(self, points: np.ndarray, leaf_size: int = KD_LEAF_SIZE):
+        self.points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+        self.order = np.arange(len(self.points))
+        self.leaf_size = leaf_size
+        # (start, end, split axis or -1 for leaves, split value, left, right)
+        self.nodes = []
+        if len(self.points):
+            self._build(0, len(self.points))
+
+    def __len__(self) -> int:
+        return len(self.points)
+
+    def _build(self, start: int, end: int) -> int:
+        node = len(self.nodes)
+        self.nodes.append(None)
+        if end - start <= self.leaf_size:
+            self.nodes[node] = (start, end, -1, 0.0, -1, -1)
+            return node
+
+        indexes = self.order[start:end]
+        points = self.points[indexes]
+        axis = int(np.argmax(points.max(axis=0) - points.min(axis=0)))
+        middle = (end - start) // 2
+        self.order[start:end] = indexes[np.argpartition(points[:, axis], middle)]
+        split = float(self.points[self.order[start + middle], axis])
+
+        left = self._build(start, start + middle)
+        right = self._build(start + middle, end)
+        self.nodes[node] = (start, end, axis, split, left, right)
+        return node
+
+    def query(self, point: np.ndarray, k: int, max_distance: float = math.inf) -> List[Tuple[float, int]]:
+        """
+        Find the k points closest to a point.
+
+        Args:
+            point: The query point.
+            k: The maximum number of neighbours to return.
+            max_distance: Ignore points further away than this.
+
+        Returns:
+            A list of (distance, point index) tuples, closest first.
+        """
+        if not self.nodes or k <= 0:
+            return []
+
+        point = np.asarray(point, dtype=np.float64)
+        # Max-heap of the best candidates, stored as (-distance, index)
+        best = []
+
+        def bound() -> float:
+            return -best[0][0] if len(best) == k else max_distance
+
+        def visit(node: int) -> None:
+            start, end, axis, split, left, right = self.nodes[node]
+            if axis < 0:
+                indexes = self.order[start:end]
+                distances = np.linalg.norm(self.points[indexes] - point, axis=1)
+                candidates = distances <= bound()
+                for distance, index in zip(distances[candidates], indexes[candidates]):
+                    if len(best) < k:
+                        heapq.heappush(best, (-distance, int(index)))
+                    elif distance < -best[0][0]:
+                        heapq.heapreplace(best, (-distance, int(index)))
+                return
+
+            offset = point[axis] - split
+            near, far = (left, right) if offset < 0 else (right, left)
+            visit(near)
+            if abs(offset) <= bound():
+                visit(far)
+
+        visit(0)
+        return sorted((-distance, index) for distance, index in best)
+
+
+def log_location_changes(changes: Iterable[Tuple[object, Optional[float], Optional[float]]]) -> None:
+    """
+    Log created, moved or deleted reports for the nearest neighbour index
+    of every process to catch up with.
+
+    Args:
+        changes: The (traffic violation ID, latitude, longitude) of each
+                 changed report, with no coordinates for deleted ones.
+    """
+    TrafficViolationLocationChange.objects.bulk_create([
+        TrafficViolationLocationChange(traffic_violation_id=traffic_violation_id, latitude=lat, longtitude=lng)
+        for traffic_violation_id, lat, lng in changes
+    ])
+
+
+class NearbyIndex:
+    """
+    An in-process nearest neighbour index over the traffic violation
+    coordinates.
+
+    Changes made by any process are read back in order from the location
+    change log. Reports added since the tree was built are kept in a small
+    buffer that is scanned by brute force, and moved or deleted reports are
+    masked out of the tree, until the buffer grows large enough to warrant
+    a rebuild.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.last_change_id = 0
+        self.built_at = None
+        self.tree = KDTree(np.empty((0, 3)))
+        self.tree_ids = np.empty(0, dtype=object)
+        self.tree_positions = {}
+        self.removed = np.zeros(0, dtype=bool)
+        self.buffer = {}
+
+    def rebuild(self) -> None:
+        """
+        Rebuild the tree from every traffic violation with coordinates.
+        """
+        with self.lock:
+            TrafficViolationLocationChange.objects.filter(
+                created_at__lt=timezone.now() - NEARBY_CHANGE_RETENTION
+            ).delete()
+            # 先記下日誌位置，建樹期間的變更稍後再套用
+            last_change_id = TrafficViolationLocationChange.objects.aggregate(last=Max('pk'))['last'] or 0
+            rows = list(TrafficViolation.objects.exclude(latitude=None).exclude(longtitude=None)
+                        .values_list('traffic_violation_id', 'latitude', 'longtitude'))
+            ids = np.empty(len(rows), dtype=object)
+            ids[:] = [row[0] for row in rows]
+            coordinates = np.array([row[1:] for row in rows], dtype=np.float64).reshape(-1, 2)
+
+            self.tree = KDTree(to_unit_vectors(coordinates[:, 0], coordinates[:, 1]))
+            self.tree_ids = ids
+            self.tree_positions = {traffic_violation_id: position for position, traffic_violation_id in enumerate(ids)}
+            self.removed = np.zeros(len(ids), dtype=bool)
+            self.buffer = {}
+            self.last_change_id = last_change_id
+            self.built_at = time.monotonic()
+
+    def catch_up(self) -> None:
+        """
+        Apply the location changes logged since the last build or catch up.
+        """
+        with self.lock:
+            changes = TrafficViolationLocationChange.objects.filter(pk__gt=self.last_change_id).order_by('pk')
+            for pk, traffic_violation_id, lat, lng in changes.values_list(
+                    'pk', 'traffic_violation_id', 'latitude', 'longtitude').iterator():
+                self.upsert(traffic_violation_id, lat, lng)
+                self.last_change_id = pk
+
+    def needs_rebuild(self) -> bool:
+        """
+        Check whether the index was never built, is too old or has
+        accumulated too many incremental updates.
+        """
+        return (self.built_at is None
+                or time.monotonic() - self.built_at > NEARBY_INDEX_MAX_AGE
+                or len(self.buffer) > max(MIN_REBUILD_BUFFER, len(self.tree) // 20)
+                or self.removed.sum() > max(MIN_REBUILD_BUFFER, len(self.tree) // 10))
+
+    def upsert(self, traffic_violation_id, lat: Optional[float], lng: Optional[float]) -> None:
+        """
+        Add, move or, without coordinates, remove a report without
+        rebuilding the tree.
+        """
+        with self.lock:
+            position = self.tree_positions.get(traffic_violation_id)
+            if position is not None:
+                self.removed[position] = True
+            self.buffer.pop(traffic_violation_id, None)
+            if lat is not None and lng is not None:
+                self.buffer[traffic_violation_id] = to_unit_vectors([lat], [lng])[0]
+
+    def query(self, lat: float, lng: float, k: int, radius: Optional[float] = None) -> List[Tuple[object, float]]:
+        """
+        Find the reports closest to a coordinate.
+
+        Args:
+            lat: The latitude of the query point.
+            lng: The longitude of the query point.
+            k: The maximum number of reports to return.
+            radius: Ignore reports further away than this many metres.
+
+        Returns:
+            A list of (traffic violation ID, distance in metres) tuples, closest first.
+        """
+        with self.lock:
+            if self.needs_rebuild():
+                self.rebuild()
+            self.catch_up()
+
+            point = to_unit_vectors([lat], [lng])[0]
+            max_distance = metres_to_chord(radius) if radius is not None else math.inf
+
+            # Ask the tree for extra neighbours to make up for masked out reports
+            removed = int(self.removed.sum())
+            found = [
+                (distance, self.tree_ids[index])
+                for distance, index in self.tree.query(point, k + removed, max_distance)
+                if not self.removed[index]
+            ]
+
+            if self.buffer:
+                buffer_ids = list(self.buffer)
+                distances = np.linalg.norm(np.array(list(self.buffer.values())) - point, axis=1)
+                found.extend(
+                    (distance, traffic_violation_id)
+                    for distance, traffic_violation_id in zip(distances, buffer_ids)
+                    if distance <= max_distance
+                )
+
+        found.sort(key=lambda item: item[0])
+        return [(traffic_violation_id, chord_to_metres(distance)) for distance, traffic_violation_id in found[:k]]
+
+
+nearby_index = NearbyIndex()
+
+
+def parse_nearby_params(params: Mapping[str, str]) -> tuple:
+    """
+    Parse the `lat`, `lng`, `k` and `radius` query parameters.
+
+    Args:
+        params: The query parameters of the request.
+
+    Returns:
+        A tuple of (latitude, longitude, neighbour count, radius in metres or None).
+
+    Raises:
+        ValueError: If a parameter is missing or out of range.
+    """
+    if not params.get('lat') or not params.get('lng'):
+        raise ValueError('lat and lng are required.')
+
+    lat, lng = float(params['lat']), float(params['lng'])
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        raise ValueError('lat must be between -90 and 90 and lng between -180 and 180.')
+
+    k = int(params.get('k') or DEFAULT_NEARBY_COUNT)
+    if not 1 <= k <= MAX_NEARBY_COUNT:
+        raise ValueError(f'k must be between 1 and {MAX_NEARBY_COUNT}.')
+
+    radius = params.get('radius')
+    radius = float(radius) if radius else None
+    if radius is not None and not radius > 0:
+        raise ValueError('radius must be a positive number of metres.')
+
+    return lat, lng, k, radius
+
+
+def get_nearby_traffic_violations(lat: float, lng: float, k: int = DEFAULT_NEARBY_COUNT,
+                                  radius: Optional[float] = None) -> List[dict]:
+    """
+    Retrieves the reports closest to a coordinate as map markers.
+
+    Args:
+        lat: The latitude of the query point.
+        lng: The longitude of the query point.
+        k: The maximum number of reports to return.
+        radius: Ignore reports further away than this many metres.
+
+    Returns:
+        A list of marker dictionaries with their `distance` in metres, closest first.
+    """
+    neighbours = nearby_index.query(lat, lng, k, radius)
+    rows = TrafficViolation.objects.filter(
+        traffic_violation_id__in=[traffic_violation_id for traffic_violation_id, _ in neighbours]
+    ).values_list('traffic_violation_id', 'license_plate', 'violation', 'latitude', 'longtitude')
+    rows = {row[0]: row for row in rows}
+
+    return [
+        {
+            'traffic_violation_id': str(traffic_violation_id),
+            'license_plate': rows[traffic_violation_id][1],
+            'violation': rows[traffic_violation_id][2],
+            'lat': rows[traffic_violation_id][3],
+            'lng': rows[traffic_violation_id][4],
+            'distance': round(distance, 1),
+        }
+        for traffic_violation_id, distance in neighbours
+        if traffic_violation_id in rows
+    ]
+
@@ -0,0 +1,114 @@
+import uuid
+import numpy as np
+from typing import Mapping
+from django.http import HttpRequest
+from reports.models import TrafficViolation
+from .geo_utils import MarkerData
+
+# Content type of the compact marker payload
+PACKED_CONTENT_TYPE = 'application/octet-stream'
+
+# Leading bytes identifying version 1 of the compact marker payload
+PACKED_MAGIC = b'TVM1'
+
+# Violation code for violation types missing from TrafficViolation.VIOLATIONS
+UNKNOWN_VIOLATION_CODE = 255
+
+VIOLATION_CODES = {value: code for code, (value, _) in enumerate(TrafficViolation.VIOLATIONS)}
+
+
+def wants_packed(request: HttpRequest) -> bool:
+    """
+    Check whether a request opted in to the compact marker payload, either
+    with `?format=packed` or an `Accept: application/octet-stream` header.
+    """
+    return (request.GET.get('format') == 'packed'
+            or PACKED_CONTENT_TYPE in request.META.get('HTTP_ACCEPT', ''))
+
+
+def pack_markers(markers: MarkerData) -> bytes:
+    """
+    Pack map markers into the compact little-endian binary payload.
+
+    Layout:
+        magic           4 bytes    b'TVM1'
+        marker count    uint32     n
+        cluster count   uint32     m
+        latitudes       float32[n]
+        longitudes      float32[n]
+        ids             16 bytes x n, raw UUIDs
+        violation codes uint8[n], indexes into TrafficViolation.VIOLATIONS
+        padding         zero bytes up to a multiple of 4
+        cluster lats    float32[m]
+        cluster lngs    float32[m]
+        cluster counts  uint32[m]
+
+    Args:
+        markers: The markers and clusters to pack.
+
+    Returns:
+        The packed payload.
+    """
+    marker_count = len(markers.ids)
+    codes = np.fromiter(
+        (VIOLATION_CODES.get(violation, UNKNOWN_VIOLATION_CODE) for violation in markers.violations),
+        dtype=np.uint8, count=marker_count,
+    )
+    ids = b''.join(
+        (value if isinstance(value, uuid.UUID) else uuid.UUID(str(value))).bytes
+        for value in markers.ids
+    )
+
+    parts = [
+        PACKED_MAGIC,
+        np.array([marker_count, len(markers.cluster_counts)], dtype='<u4').tobytes(),
+        np.asarray(markers.lats, dtype='<f4').tobytes(),
+        np.asarray(markers.lngs, dtype='<f4').tobytes(),
+        ids,
+        codes.tobytes(),
+        b'\0' * (-marker_count % 4),
+        np.asarray(markers.cluster_lats, dtype='<f4').tobytes(),
+        np.asarray(markers.cluster_lngs, dtype='<f4').tobytes(),
+        np.asarray(markers.cluster_counts, dtype='<u4').tobytes(),
+    ]
+    return b''.join(parts)
+
+
+def unpack_markers(payload: bytes) -> Mapping[str, np.ndarray]:
+    """
+    Decode a payload produced by pack_markers.
+
+    Args:
+        payload: The packed payload.
+
+    Returns:
+        A dictionary of the decoded columns.
+
+    Raises:
+        ValueError: If the payload is not a version 1 marker payload.
+    """
+    if payload[:4] != PACKED_MAGIC:
+        raise ValueError('Not a packed marker payload.')
+
+    marker_count, cluster_count = np.frombuffer(payload, dtype='<u4', count=2, offset=4)
+    offset = 12
+
+    def read(dtype, count):
+        nonlocal offset
+        column = np.frombuffer(payload, dtype=dtype, count=count, offset=offset)
+        offset += column.nbytes
+        return column
+
+    columns = {
+        'lats': read('<f4', marker_count),
+        'lngs': read('<f4', marker_count),
+        'ids': read(np.uint8, 16 * marker_count).reshape(-1, 16),
+        'violation_codes': read(np.uint8, marker_count),
+    }
+    offset += -int(marker_count) % 4
+    columns.update({
+        'cluster_lats': read('<f4', cluster_count),
+        'cluster_lngs': read('<f4', cluster_count),
+        'cluster_counts': read('<u4', cluster_count),
+    })
+    return columns
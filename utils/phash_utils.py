@@ -0,0 +1,279 @@
+import logging
+import threading
+import time
+from functools import lru_cache
+from itertools import combinations
+from typing import Dict, Iterable, List, Tuple
+import cv2
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+from reports.models import MediaBlob, MediaHash
+from .cache_utils import bump_media_hash_version, get_media_hash_version
+from .rendition_utils import media_kind
+
+logger = logging.getLogger(__name__)
+
+# dHash compares each pixel of a (HASH_SIZE + 1) x HASH_SIZE grayscale
+# thumbnail with its right neighbour, giving HASH_SIZE ** 2 = 64 bits
+HASH_SIZE = 8
+HASH_BITS = HASH_SIZE * HASH_SIZE
+
+# Substrings each hash is split into by the multi-index hash
+HASH_CHUNKS = 4
+
+# Frames hashed per video, evenly spaced over its length
+VIDEO_HASH_FRAMES = 4
+
+# Thumbnails flatter than this standard deviation, such as black frames,
+# hash to near-zero values matching each other and are skipped
+MIN_HASH_CONTRAST = 4.0
+
+# Rebuild the in-process index from scratch at least this often, to drop
+# the hashes of deleted blobs
+HASH_INDEX_MAX_AGE = 60 * 60
+
+
+def dhash(gray: np.ndarray) -> Tuple[int, float]:
+    """
+    Compute the 64-bit difference hash of a grayscale image.
+
+    Returns:
+        The hash and the contrast of the thumbnail it was computed from.
+    """
+    small = cv2.resize(gray, (HASH_SIZE + 1, HASH_SIZE), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big'), float(small.std())
+
+
+def image_hashes(path: str) -> List[int]:
+    """
+    Compute the perceptual hash of an image file.
+
+    The image is decoded at a quarter of its size, which JPEG decodes
+    without ever building the full resolution image.
+
+    Raises:
+        ValueError: If the image cannot be decoded.
+    """
+    gray = cv2.imdecode(np.fromfile(path, dtype=np.uint8), cv2.IMREAD_REDUCED_GRAYSCALE_4)
+    if gray is None:
+        raise ValueError(f'Could not decode image {path}.')
+    value, contrast = dhash(gray)
+    return [value] if contrast >= MIN_HASH_CONTRAST else []
+
+
+def video_hashes(path: str) -> List[int]:
+    """
+    Compute the distinct perceptual hashes of VIDEO_HASH_FRAMES frames
+    sampled over the length of a video.
+
+    Raises:
+        ValueError: If no frame can be decoded.
+    """
+    capture = cv2.VideoCapture(path)
+    try:
+        frame_count = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+        positions = [int(frame_count * (i + 0.5) / VIDEO_HASH_FRAMES) for i in range(VIDEO_HASH_FRAMES)]
+        hashes, decoded = [], False
+        for position in positions if frame_count > 0 else [None]:
+            if position is not None:
+                capture.set(cv2.CAP_PROP_POS_FRAMES, position)
+            ok, frame = capture.read()
+            if not ok:
+                continue
+            decoded = True
+            value, contrast = dhash(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY))
+            if contrast >= MIN_HASH_CONTRAST and value not in hashes:
+                hashes.append(value)
+    finally:
+        capture.release()
+
+    if not decoded:
+        raise ValueError(f'Could not decode video {path}.')
+    return hashes
+
+
+def media_hashes(path: str) -> List[int]:
+    """
+    Compute the perceptual hashes of an image or video file, or none for
+    other files.
+
+    Raises:
+        ValueError: If the media cannot be decoded.
+    """
+    kind = media_kind(path)
+    if kind == 'image':
+        return image_hashes(path)
+    if kind == 'video':
+        return video_hashes(path)
+    return []
+
+
+def to_signed(value: int) -> int:
+    """
+    Convert an unsigned 64-bit hash into the signed integer stored in the database.
+    """
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def to_unsigned(value: int) -> int:
+    return value & ((1 << 64) - 1)
+
+
+@lru_cache(maxsize=None)
+def flip_masks(bits: int, radius: int) -> Tuple[int, ...]:
+    """
+    Get every mask of `bits` bits with at most `radius` bits set.
+    """
+    return tuple(
+        sum(1 << bit for bit in flipped)
+        for count in range(radius + 1)
+        for flipped in combinations(range(bits), count)
+    )
+
+
+class MultiIndexHash:
+    """
+    Finds the 64-bit hashes within a Hamming distance of a query hash by
+    multi-index hashing.
+
+    Each hash is split into HASH_CHUNKS substrings, each indexed by value in
+    its own table. Two hashes within distance r differ by at most
+    r // HASH_CHUNKS bits in one of their substrings, so looking up every
+    substring within that radius in each table finds all the candidates,
+    which are then checked against the full hash.
+    """
+
+    def __init__(self, chunks: int = HASH_CHUNKS):
+        self.chunk_bits = HASH_BITS // chunks
+        self.tables = [{} for _ in range(chunks)]
+        self.values = []
+        self.keys = []
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def split(self, value: int) -> List[int]:
+        mask = (1 << self.chunk_bits) - 1
+        return [(value >> (index * self.chunk_bits)) & mask for index in range(len(self.tables))]
+
+    def add(self, value: int, key) -> None:
+        position = len(self.values)
+        self.values.append(value)
+        self.keys.append(key)
+        for table, chunk in zip(self.tables, self.split(value)):
+            table.setdefault(chunk, []).append(position)
+
+    def query(self, value: int, max_distance: int) -> Dict[object, int]:
+        """
+        Find the keys of the hashes within `max_distance` bits of a hash.
+
+        Returns:
+            The smallest distance of each key found.
+        """
+        masks = flip_masks(self.chunk_bits, max_distance // len(self.tables))
+        found, seen = {}, set()
+        for table, chunk in zip(self.tables, self.split(value)):
+            for mask in masks:
+                for position in table.get(chunk ^ mask, ()):
+                    if position in seen:
+                        continue
+                    seen.add(position)
+                    distance = (self.values[position] ^ value).bit_count()
+                    if distance <= max_distance:
+                        key = self.keys[position]
+                        found[key] = min(distance, found.get(key, distance))
+        return found
+
+
+class MediaHashIndex:
+    """
+    An in-process multi-index hash over the perceptual hashes of every
+    stored blob.
+
+    Hashes are appended in ID order as other processes store them, and the
+    index is rebuilt every HASH_INDEX_MAX_AGE seconds to drop deleted blobs.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.index = MultiIndexHash()
+        self.last_id = 0
+        self.version = None
+        self.built_at = None
+
+    def refresh(self) -> None:
+        """
+        Add the hashes stored since the last refresh, if any.
+        """
+        with self.lock:
+            if self.built_at is None or time.monotonic() - self.built_at > HASH_INDEX_MAX_AGE:
+                self.index, self.last_id, self.version = MultiIndexHash(), 0, None
+                self.built_at = time.monotonic()
+
+            version = get_media_hash_version()
+            if version == self.version:
+                return
+            rows = MediaHash.objects.filter(pk__gt=self.last_id).order_by('pk').values_list('pk', 'blob_id', 'value')
+            for pk, blob_id, value in rows.iterator():
+                self.index.add(to_unsigned(value), blob_id)
+                self.last_id = pk
+            self.version = version
+
+    def query(self, hashes: Iterable[int], max_distance: int) -> Dict[int, int]:
+        """
+        Find the blobs with a hash within `max_distance` bits of any of `hashes`.
+
+        Returns:
+            The smallest distance of each blob ID found.
+        """
+        self.refresh()
+        found = {}
+        with self.lock:
+            for value in hashes:
+                for blob_id, distance in self.index.query(value, max_distance).items():
+                    found[blob_id] = min(distance, found.get(blob_id, distance))
+        return found
+
+
+media_hash_index = MediaHashIndex()
+
+
+def stored_media_hashes(blob: MediaBlob) -> List[int]:
+    """
+    Get the perceptual hashes already stored for a blob, without computing
+    missing ones, so a request never waits for media to be decoded.
+
+    Returns:
+        The unsigned 64-bit hashes, none if the blob has not been hashed yet.
+    """
+    return [to_unsigned(value) for value in MediaHash.objects.filter(blob_id=blob.pk).values_list('value', flat=True)]
+
+
+def hash_media_blob(blob: MediaBlob) -> List[int]:
+    """
+    Get the perceptual hashes of a blob, computing and storing them on
+    first use.
+
+    Returns:
+        The unsigned 64-bit hashes, none for files that are not media or
+        cannot be decoded.
+    """
+    with transaction.atomic():
+        # 鎖定 blob 列，避免背景任務與請求重複計算
+        blob = MediaBlob.objects.select_for_update().get(pk=blob.pk)
+        if blob.hashed_at is not None:
+            return stored_media_hashes(blob)
+
+        try:
+            hashes = media_hashes(blob.file.path)
+        except (OSError, ValueError) as e:
+            logger.warning('Could not hash %s: %s', blob.file.name, e)
+            hashes = []
+        MediaHash.objects.bulk_create([MediaHash(blob=blob, value=to_signed(value)) for value in hashes])
+        blob.hashed_at = timezone.now()
+        blob.save(update_fields=['hashed_at'])
+        if hashes:
+            transaction.on_commit(bump_media_hash_version)
+    return hashes
@@ -0,0 +1,197 @@
+import os
+import tempfile
+from typing import Dict, Optional
+import cv2
+import numpy as np
+from django.conf import settings
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp'}
+VIDEO_EXTENSIONS = {'.mp4', '.mov', '.wmv', '.avi', '.mkv', '.webm', '.3gp'}
+
+# Rendition kinds and the suffix of their file, next to the original
+THUMBNAIL, POSTER, PREVIEW = 'thumbnail', 'poster', 'preview'
+RENDITION_SUFFIXES = {
+    THUMBNAIL: '.thumb.webp',
+    POSTER: '.poster.webp',
+    PREVIEW: '.preview.webm',
+}
+
+# Longest edge of the thumbnails, posters and preview frames, in pixels
+RENDITION_MAX_EDGE = 320
+WEBP_QUALITY = 70
+
+# The preview keeps the first seconds of a video at a reduced frame rate
+PREVIEW_SECONDS = 5
+PREVIEW_FPS = 8
+
+
+def media_kind(name: str) -> Optional[str]:
+    """
+    Get whether a media file is an 'image' or a 'video' from its extension.
+    """
+    extension = os.path.splitext(name)[1].lower()
+    if extension in IMAGE_EXTENSIONS:
+        return 'image'
+    if extension in VIDEO_EXTENSIONS:
+        return 'video'
+    return None
+
+
+def rendition_name(name: str, kind: str) -> str:
+    """
+    Get the storage name of a rendition of a media file.
+    """
+    return os.path.splitext(name)[0] + RENDITION_SUFFIXES[kind]
+
+
+def downscale(frame: np.ndarray, max_edge: int = RENDITION_MAX_EDGE) -> np.ndarray:
+    """
+    Shrink an image so its longest edge is at most `max_edge`, keeping the
+    aspect ratio and even dimensions for the video encoder.
+    """
+    height, width = frame.shape[:2]
+    scale = min(1.0, max_edge / max(height, width))
+    size = (max(2, int(width * scale) // 2 * 2), max(2, int(height * scale) // 2 * 2))
+    if size == (width, height):
+        return frame
+    return cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+
+
+def write_atomically(path: str, write) -> None:
+    """
+    Write a file through a temporary file renamed into place, so readers
+    never see a partial rendition.
+    """
+    directory, extension = os.path.dirname(path), os.path.splitext(path)[1]
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix=extension)
+    os.close(fd)
+    try:
+        write(temp_path)
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def write_webp(path: str, image: np.ndarray) -> None:
+    ok, data = cv2.imencode('.webp', downscale(image), [cv2.IMWRITE_WEBP_QUALITY, WEBP_QUALITY])
+    if not ok:
+        raise ValueError('Could not encode the WebP rendition.')
+
+    def write(temp_path):
+        with open(temp_path, 'wb') as file:
+            file.write(data.tobytes())
+    write_atomically(path, write)
+
+
+def render_image(source: str, thumbnail: str) -> None:
+    """
+    Render the WebP thumbnail of an image.
+
+    Raises:
+        ValueError: If the image cannot be decoded.
+    """
+    # 以原始位元組解碼，路徑含非 ASCII 字元時 imread 會失敗
+    image = cv2.imdecode(np.fromfile(source, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError(f'Could not decode image {source}.')
+    write_webp(thumbnail, image)
+
+
+def render_video(source: str, poster: str, preview: str) -> None:
+    """
+    Render the WebP poster frame and the short, small WebM preview of a video.
+
+    The preview keeps PREVIEW_SECONDS of the video at PREVIEW_FPS, so only
+    those frames are ever decoded.
+
+    Raises:
+        ValueError: If no frame can be decoded.
+    """
+    capture = cv2.VideoCapture(source)
+    try:
+        fps = capture.get(cv2.CAP_PROP_FPS)
+        fps = fps if fps and fps > 0 else 30.0
+        step = max(1.0, fps / PREVIEW_FPS)
+        last_frame = int(fps * PREVIEW_SECONDS)
+
+        frames = []
+        index, next_kept = 0, 0.0
+        while index < last_frame:
+            if index < next_kept:
+                # 跳過的影格只解多工不解碼
+                if not capture.grab():
+                    break
+            else:
+                ok, frame = capture.read()
+                if not ok:
+                    break
+                frames.append(downscale(frame))
+                next_kept += step
+            index += 1
+    finally:
+        capture.release()
+
+    if not frames:
+        raise ValueError(f'Could not decode video {source}.')
+
+    # 以約一秒處的影格作為封面，避開片頭的黑畫面
+    write_webp(poster, frames[min(len(frames) - 1, PREVIEW_FPS)])
+
+    def write(temp_path):
+        height, width = frames[0].shape[:2]
+        writer = cv2.VideoWriter(temp_path, cv2.VideoWriter_fourcc(*'VP80'), PREVIEW_FPS, (width, height))
+        if not writer.isOpened():
+            raise ValueError('Could not open the WebM preview encoder.')
+        try:
+            for frame in frames:
+                writer.write(frame)
+        finally:
+            writer.release()
+    write_atomically(preview, write)
+
+
+def render_media(name: str) -> Dict[str, str]:
+    """
+    Render the previews of a stored media file, next to the original.
+
+    Renditions already on disk, such as those of a shared content-addressed
+    file, are reused.
+
+    Args:
+        name: The storage name of the media file, relative to MEDIA_ROOT.
+
+    Returns:
+        The storage names of the renditions by kind: a thumbnail for images,
+        a poster and a preview for videos, and none for other files.
+
+    Raises:
+        ValueError: If the media cannot be decoded.
+    """
+    kind = media_kind(name)
+    if kind is None:
+        return {}
+
+    kinds = (THUMBNAIL,) if kind == 'image' else (POSTER, PREVIEW)
+    renditions = {rendition: rendition_name(name, rendition) for rendition in kinds}
+    paths = {rendition: os.path.join(settings.MEDIA_ROOT, value) for rendition, value in renditions.items()}
+    if all(os.path.exists(path) for path in paths.values()):
+        return renditions
+
+    source = os.path.join(settings.MEDIA_ROOT, name)
+    if kind == 'image':
+        render_image(source, paths[THUMBNAIL])
+    else:
+        render_video(source, paths[POSTER], paths[PREVIEW])
+    return renditions
+
+
+def delete_renditions(name: str) -> None:
+    """
+    Delete the renditions of a media file that has been removed.
+    """
+    for kind in RENDITION_SUFFIXES:
+        path = os.path.join(settings.MEDIA_ROOT, rendition_name(name, kind))
+        if os.path.exists(path):
+            os.remove(path)
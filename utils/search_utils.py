@@ -0,0 +1,86 @@
+import unicodedata
+from typing import Iterable, Set
+
+# Length of the n-grams stored in the search index
+NGRAM_SIZE = 2
+
+# Longest token stored in the search index
+MAX_TOKEN_LENGTH = 8
+
+
+def is_cjk(char: str) -> bool:
+    """
+    Check whether a character is a CJK ideograph, e.g. 路, 巷 or 弄.
+    """
+    code = ord(char)
+    return (0x4E00 <= code <= 0x9FFF      # CJK Unified Ideographs
+            or 0x3400 <= code <= 0x4DBF   # Extension A
+            or 0xF900 <= code <= 0xFAFF   # Compatibility Ideographs
+            or 0x20000 <= code <= 0x2FA1F)  # Supplementary ideographic planes
+
+
+def normalize_search_text(text: str) -> str:
+    """
+    Normalise text for the search index.
+
+    Full-width characters are folded to their ASCII forms, letters are
+    lowercased and everything but letters, digits and ideographs is dropped,
+    so 'ＡＢＣ-1234' and 'abc1234' index the same way.
+
+    Args:
+        text: The text to normalise.
+
+    Returns:
+        The normalised text.
+    """
+    text = unicodedata.normalize('NFKC', text or '').lower()
+    return ''.join(char for char in text if char.isalnum())
+
+
+def tokenize(text: str) -> Set[str]:
+    """
+    Split text into the tokens stored in the search index.
+
+    Every overlapping bigram of the normalised text is a token. Ideographs are
+    also indexed on their own, because single characters such as 路, 巷 or 弄
+    are meaningful search terms in Taiwanese addresses.
+
+    Args:
+        text: The text to tokenize.
+
+    Returns:
+        The set of tokens.
+    """
+    text = normalize_search_text(text)
+    tokens = {text[i:i + NGRAM_SIZE] for i in range(len(text) - NGRAM_SIZE + 1)}
+    tokens.update(char for char in text if is_cjk(char))
+    return tokens
+
+
+def tokenize_fields(values: Iterable[str]) -> Set[str]:
+    """
+    Tokenize several fields separately, so no n-gram spans two fields.
+    """
+    tokens = set()
+    for value in values:
+        tokens |= tokenize(value)
+    return tokens
+
+
+def query_tokens(keyword: str) -> Set[str]:
+    """
+    Get the tokens a record must contain to match a keyword.
+
+    Args:
+        keyword: The search keyword.
+
+    Returns:
+        The set of tokens, or an empty set if the keyword is too short to be
+        resolved through the index (a single non-ideograph character).
+    """
+    text = normalize_search_text(keyword)
+    if len(text) >= NGRAM_SIZE:
+        return {text[i:i + NGRAM_SIZE] for i in range(len(text) - NGRAM_SIZE + 1)}
+    if text and is_cjk(text):
+        return {text}
+    return set()
@@ -0,0 +1,88 @@
+import hashlib
+import os
+import re
+import tempfile
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+# Directory, under the storage location, holding the content-addressed files
+BLOB_PREFIX = 'blobs'
+
+# Directory, under BLOB_PREFIX, holding the files being hashed
+BLOB_TEMP_DIR = 'tmp'
+
+EXTENSION_PATTERN = re.compile(r'^\.[a-z0-9]{1,10}$')
+
+
+def blob_name(digest: str, extension: str = '') -> str:
+    """
+    Get the storage name of a content-addressed file, fanned out into
+    directories by the first two hex digits of its digest.
+    """
+    return f'{BLOB_PREFIX}/{digest[:2]}/{digest}{extension}'
+
+
+def blob_digest(name: str) -> str:
+    """
+    Get the SHA-256 hex digest a content-addressed file is named after.
+    """
+    return os.path.splitext(os.path.basename(name))[0]
+
+
+def is_blob_name(name: str) -> bool:
+    """
+    Check whether a storage name belongs to a content-addressed file.
+    """
+    return name.startswith(f'{BLOB_PREFIX}/')
+
+
+def clean_extension(filename: str) -> str:
+    """
+    Get the lowercase extension of a file name, or '' if it is not a plain
+    alphanumeric extension. The templates pick the media player from it.
+    """
+    extension = os.path.splitext(filename)[1].lower()
+    return extension if EXTENSION_PATTERN.match(extension) else ''
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    A file system storage naming files after the SHA-256 of their content,
+    so identical files are only stored once.
+
+    Files are hashed while they are streamed to a temporary file, which is
+    then moved into place, or dropped if the same content is already stored.
+    The uploaded name only contributes its extension. Saving content that is
+    already stored refreshes the file's modification time, which keeps it
+    from the orphaned media sweep.
+    """
+
+    def _save(self, name, content):
+        temp_dir = os.path.join(self.location, BLOB_PREFIX, BLOB_TEMP_DIR)
+        os.makedirs(temp_dir, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=temp_dir, suffix='.part')
+        try:
+            digest = hashlib.sha256()
+            with os.fdopen(fd, 'wb') as temp:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    temp.write(chunk)
+
+            name = blob_name(digest.hexdigest(), clean_extension(name))
+            path = self.path(name)
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                if self.file_permissions_mode is not None:
+                    os.chmod(temp_path, self.file_permissions_mode)
+                os.replace(temp_path, path)
+            else:
+                # 更新修改時間，避免孤兒檔案清理刪除剛被重新引用的檔案
+                os.utime(path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        return name
+
+
+media_blob_storage = ContentAddressedStorage()
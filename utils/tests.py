@@ -1,8 +1,39 @@
+import datetime
+import hashlib
+import io
+import os
+import tempfile
+import time
 import unittest
+import uuid
+import numpy as np
 from unittest.mock import MagicMock, patch
 
+from django.core.files.base import ContentFile
 from django.db.models import QuerySet
-from utils.mysql_utils import search_traffic_violations
+from django.http import QueryDict
+from utils.mysql_utils import (count_daily_stats, daily_stat_key, decode_cursor, encode_cursor,
+                               get_traffic_violation_heatmap, get_violation_statistics, parse_page_limit,
+                               parse_traffic_violation_ids, search_traffic_violations, seek_page)
+from utils.gazetteer_utils import Gazetteer, parse_address
+from utils.geocode_utils import (LRUCache, SharedRateLimiter, TokenBucket, cached_geocode, normalize_address,
+                                 quantize_coordinates)
+from utils.hotspot_utils import convex_hull, dbscan, neighbour_pairs
+from utils.nearby_utils import (KDTree, NearbyIndex, chord_to_metres, metres_to_chord, parse_nearby_params,
+                                to_unit_vectors)
+from utils.phash_utils import MultiIndexHash, dhash, flip_masks, to_signed, to_unsigned
+from utils.media_gc_utils import rendition_sources, scan_files, upload_part_id
+from utils.packed_utils import pack_markers, unpack_markers
+from utils.rendition_utils import downscale, media_kind, rendition_name
+from utils.storage_utils import ContentAddressedStorage, blob_digest, clean_extension
+from utils.batch_utils import clean_idempotency_key, clean_media, parse_report_batch
+from utils.import_utils import ReportRowValidator, check_encoding, detect_import_format, read_import_rows
+from utils.upload_utils import file_sha256, validate_upload
+from utils.search_utils import normalize_search_text, query_tokens, tokenize
+from utils.geo_utils import (BoundingBox, MarkerData, cluster_points, density_grid,
+                             encode_geohash, geohash_covering, parse_bounding_box,
+                             parse_heatmap_options, parse_zoom, point_to_tile, points_to_tiles,
+                             snap_bounding_box, tile_bounding_box)
 from .utils import process_input
 
 
@@ -27,6 +58,67 @@ class MySqlUtilsTest(unittest.TestCase):
         result = search_traffic_violations('keyword', '1day', '2021-01-01', '2021-12-31')
         self.assertEqual(result, self.mock_traffic_violations)
 
+    def test_cursor_round_trip(self):
+        key = (datetime.date(2024, 1, 31), datetime.time(13, 45), uuid.uuid4())
+        self.assertEqual(decode_cursor(encode_cursor(*key)), key)
+        with self.assertRaises(ValueError):
+            decode_cursor('not-a-cursor')
+
+    def test_seek_page(self):
+        rows = [{'license_plate': f'P{day}', 'date': datetime.date(2024, 1, day), 'time': datetime.time(9),
+                 'traffic_violation_id': uuid.uuid4()} for day in (3, 2, 1)]
+        query_set = MagicMock(spec=QuerySet)
+        query_set.order_by.return_value.values.return_value = rows
+
+        page, cursor = seek_page(query_set, None, 2, ('license_plate', 'date'))
+        self.assertEqual(page, rows[:2])
+        self.assertEqual(decode_cursor(cursor), (rows[1]['date'], rows[1]['time'], rows[1]['traffic_violation_id']))
+        query_set.order_by.return_value.values.assert_called_once_with(
+            'license_plate', 'date', 'time', 'traffic_violation_id')
+        self.assertEqual(seek_page(query_set, None, 3, ()), (rows, None))
+
+        # 游標條件以日期上限開頭，讓索引可做區間掃描
+        seek_page(query_set, cursor, 2, ())
+        query_set.filter.assert_called_once_with(date__lte=rows[1]['date'])
+
+    def test_parse_page_limit(self):
+        self.assertEqual(parse_page_limit({}), 100)
+        self.assertEqual(parse_page_limit({}, 50), 50)
+        self.assertEqual(parse_page_limit({'limit': '20'}), 20)
+        with self.assertRaises(ValueError):
+            parse_page_limit({'limit': '5000'})
+
+    def test_parse_traffic_violation_ids(self):
+        first, second = uuid.uuid4(), uuid.uuid4()
+        params = QueryDict(f'ids={first},{second}&ids={first}')
+        self.assertEqual(parse_traffic_violation_ids(params), [first, second])
+        with self.assertRaises(ValueError):
+            parse_traffic_violation_ids(QueryDict('ids=not-a-uuid'))
+
+    def test_daily_stat_key_uses_grid_cell_prefix(self):
+        self.assertEqual(daily_stat_key('2024-01-01', '闖紅燈', '通過', 'wsqqq1234'),
+                         ('2024-01-01', '闖紅燈', '通過', 'wsqqq'))
+        self.assertEqual(daily_stat_key('2024-01-01', '闖紅燈', '通過', None)[3], '')
+
+    def test_count_daily_stats(self):
+        violations = [MagicMock(date='2024-01-01', violation='闖紅燈', status='通過', geohash=geohash)
+                      for geohash in ('wsqqq1234', 'wsqqq9876', 'wsqqr0000')]
+        counts = count_daily_stats(violations)
+        self.assertEqual(counts[('2024-01-01', '闖紅燈', '通過', 'wsqqq')], 2)
+        self.assertEqual(counts[('2024-01-01', '闖紅燈', '通過', 'wsqqr')], 1)
+
+    def test_get_violation_statistics_rejects_unknown_group(self):
+        with self.assertRaises(ValueError):
+            get_violation_statistics(group_by=['officer'])
+
+    @patch('utils.mysql_utils.get_cached_heatmap')
+    def test_get_traffic_violation_heatmap_rejects_bad_date(self, mock_get_cached_heatmap):
+        params = {'north': '25.1', 'south': '25.0', 'east': '121.6', 'west': '121.5',
+                  'timeRange': 'custom', 'fromDate': '2024-02-30', 'toDate': '2024-03-01'}
+        with self.assertRaises(ValueError):
+            get_traffic_violation_heatmap(params)
+        mock_get_cached_heatmap.assert_not_called()
+
 
 class TestProcessInput(unittest.TestCase):
 
@@ -59,3 +151,444 @@ class TestProcessInput(unittest.TestCase):
         expected_output = 'not a valid input'
         output = process_input(invalid_input)
         self.assertEqual(output, expected_output)
+
+
+class GeocodeUtilsTest(unittest.TestCase):
+    def test_normalize_address(self):
+        self.assertEqual(normalize_address('臺北市 中正區　忠孝西路１段'), normalize_address('台北市中正區忠孝西路1段'))
+
+    def test_quantize_coordinates(self):
+        self.assertEqual(quantize_coordinates(25.04771, 121.51712), quantize_coordinates(25.04769, 121.51708))
+        self.assertEqual(quantize_coordinates(25.0, 121.5), '25.0000,121.5000')
+
+    def test_lru_cache_evicts_least_recently_used(self):
+        cache = LRUCache(max_size=2, ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+
+    @patch('utils.geocode_utils.time.sleep')
+    def test_token_bucket_waits_once_burst_is_spent(self, mock_sleep):
+        bucket = TokenBucket(rate=2, capacity=2)
+        bucket.acquire()
+        bucket.acquire()
+        mock_sleep.assert_not_called()
+        bucket.acquire()
+        self.assertAlmostEqual(mock_sleep.call_args.args[0], 0.5, places=2)
+
+    @patch('utils.geocode_utils.time.sleep')
+    @patch('utils.geocode_utils.time.time', return_value=1000.25)
+    def test_shared_rate_limiter_waits_for_next_second(self, mock_time, mock_sleep):
+        mock_sleep.side_effect = lambda seconds: setattr(mock_time, 'return_value', mock_time.return_value + seconds)
+        limiter = SharedRateLimiter(f'test_rate:{uuid.uuid4()}', rate=2)
+        limiter.acquire()
+        limiter.acquire()
+        mock_sleep.assert_not_called()
+        limiter.acquire()
+        self.assertAlmostEqual(mock_sleep.call_args.args[0], 0.75)
+
+    @patch('utils.geocode_utils.memory_cache', LRUCache(max_size=8, ttl=60))
+    @patch('utils.geocode_utils.GeocodeCacheEntry.objects')
+    def test_cached_geocode_keeps_long_addresses_apart(self, mock_objects):
+        mock_objects.filter.return_value.first.return_value = None
+        prefix = '台北市中正區忠孝西路一段' * 30
+        first = cached_geocode('forward', prefix + '1號', lambda: {'latitude': 1.0, 'longtitude': 1.0, 'address': 'a'})
+        second = cached_geocode('forward', prefix + '2號', lambda: {'latitude': 2.0, 'longtitude': 2.0, 'address': 'b'})
+        self.assertNotEqual(first, second)
+        keys = [call.kwargs['key'] for call in mock_objects.update_or_create.call_args_list]
+        self.assertEqual(len(set(keys)), 2)
+        self.assertTrue(all(len(key) == 64 for key in keys))
+
+    def test_lru_cache_expires_entries(self):
+        cache = LRUCache(max_size=2, ttl=-1)
+        cache.set('a', 1)
+        self.assertIsNone(cache.get('a'))
+
+
+class GazetteerUtilsTest(unittest.TestCase):
+    def setUp(self):
+        self.gazetteer = Gazetteer()
+        self.gazetteer.add('臺北市', '中正區', '忠孝西路', 1, 1, 25.046, 121.517)
+        self.gazetteer.add('臺北市', '中正區', '忠孝西路', 1, 101, 25.047, 121.512)
+        self.gazetteer.add('新北市', '板橋區', '中山路', 1, 1, 25.010, 121.460)
+        self.gazetteer.add('臺中市', '西區', '中山路', 1, 1, 24.140, 120.680)
+        self.gazetteer.freeze()
+
+    def test_parse_address(self):
+        self.assertEqual(
+            parse_address('100臺北市中正區忠孝西路一段50巷3弄2號'),
+            {'city': '台北市', 'district': '中正區', 'road': '忠孝西路', 'section': 1, 'lane': 50, 'alley': 3, 'number': 2},
+        )
+        self.assertIsNone(parse_address('not an address'))
+
+    def test_lookup_interpolates_house_numbers(self):
+        lat, lng = self.gazetteer.lookup('台北市中正區忠孝西路一段51號')
+        self.assertAlmostEqual(lat, 25.0465)
+        self.assertAlmostEqual(lng, 121.5145)
+
+    def test_lookup_skips_missing_levels_unless_ambiguous(self):
+        self.assertIsNotNone(self.gazetteer.lookup('忠孝西路一段101號'))
+        self.assertIsNone(self.gazetteer.lookup('中山路一段1號'))
+        self.assertIsNotNone(self.gazetteer.lookup('板橋區中山路一段1號'))
+        self.assertIsNone(self.gazetteer.lookup('台北市信義區松仁路1號'))
+
+
+class GeoUtilsTest(unittest.TestCase):
+    def test_encode_geohash(self):
+        self.assertEqual(encode_geohash(57.64911, 10.40744, 11), 'u4pruydqqvj')
+        self.assertEqual(encode_geohash(25.0330, 121.5654, 5), 'wsqqq')
+        self.assertIsNone(encode_geohash(None, 121.5654))
+
+    def test_geohash_covering_contains_points_in_box(self):
+        bbox = BoundingBox(north=25.08, south=25.00, east=121.60, west=121.50)
+        prefixes = geohash_covering(bbox)
+        self.assertTrue(0 < len(prefixes) <= 16)
+        for lat, lng in [(25.00, 121.50), (25.08, 121.60), (25.04, 121.55)]:
+            geohash = encode_geohash(lat, lng)
+            self.assertTrue(any(geohash.startswith(prefix) for prefix in prefixes))
+
+    def test_parse_bounding_box(self):
+        self.assertIsNone(parse_bounding_box({}))
+        bbox = parse_bounding_box({'north': '25.1', 'south': '25.0', 'east': '121.6', 'west': '121.5'})
+        self.assertEqual(bbox, BoundingBox(25.1, 25.0, 121.6, 121.5))
+        with self.assertRaises(ValueError):
+            parse_bounding_box({'north': '25.1', 'south': '25.0'})
+        with self.assertRaises(ValueError):
+            parse_bounding_box({'north': '25.0', 'south': '25.1', 'east': '121.6', 'west': '121.5'})
+        wrapped = parse_bounding_box({'north': '60', 'south': '-60', 'east': '-170', 'west': '170'})
+        self.assertEqual(wrapped, BoundingBox(60.0, -60.0, 180.0, -180.0))
+        with self.assertRaises(ValueError):
+            parse_bounding_box({'north': '25.1', 'south': '25.0', 'east': '200', 'west': '121.5'})
+
+    def test_snap_bounding_box(self):
+        bbox = BoundingBox(north=25.0812, south=25.0017, east=121.6034, west=121.5021)
+        snapped = snap_bounding_box(bbox)
+        self.assertTrue(snapped.north >= bbox.north and snapped.south <= bbox.south)
+        self.assertTrue(snapped.east >= bbox.east and snapped.west <= bbox.west)
+        self.assertLess(snapped.east - snapped.west, 2 * (bbox.east - bbox.west))
+        panned = BoundingBox(north=25.0815, south=25.0020, east=121.6036, west=121.5023)
+        self.assertEqual(snap_bounding_box(panned), snapped)
+        self.assertEqual(snap_bounding_box(BoundingBox(90.0, -90.0, 180.0, -180.0)),
+                         BoundingBox(90.0, -90.0, 180.0, -180.0))
+
+    def test_parse_zoom(self):
+        self.assertIsNone(parse_zoom({}))
+        self.assertEqual(parse_zoom({'zoom': '12'}), 12)
+        with self.assertRaises(ValueError):
+            parse_zoom({'zoom': '30'})
+
+    def test_cluster_points(self):
+        lats = [25.0001, 25.0002, 25.0003, 23.0]
+        lngs = [121.5001, 121.5002, 121.5003, 120.0]
+        clusters = cluster_points(lats, lngs, zoom=8)
+        self.assertEqual(sorted(clusters.counts.tolist()), [1, 3])
+        grouped = clusters.counts == 3
+        self.assertAlmostEqual(float(clusters.lats[grouped][0]), 25.0002)
+        self.assertAlmostEqual(float(clusters.lngs[grouped][0]), 121.5002)
+        self.assertEqual(int(clusters.members[clusters.counts == 1][0]), 3)
+
+    def test_density_grid(self):
+        bbox = BoundingBox(north=2.0, south=0.0, east=2.0, west=0.0)
+        grid = density_grid([1.75, 1.75, 0.25], [0.25, 0.25, 1.75], bbox, size=4)
+        self.assertEqual(grid.shape, (4, 4))
+        self.assertEqual(grid[0, 0], 2)  # 第一列為最北側
+        self.assertEqual(grid[3, 3], 1)
+        self.assertEqual(grid.sum(), 3)
+
+        smoothed = density_grid([1.0], [1.0], BoundingBox(north=4.0, south=-2.0, east=4.0, west=-2.0), size=24, smoothing=1.5)
+        self.assertAlmostEqual(smoothed.sum(), 1.0, places=3)
+        self.assertEqual(smoothed[11, 12], smoothed.max())
+
+    def test_parse_heatmap_options(self):
+        self.assertEqual(parse_heatmap_options({}), (64, 0.0))
+        self.assertEqual(parse_heatmap_options({'size': '32', 'smoothing': '2'}), (32, 2.0))
+        with self.assertRaises(ValueError):
+            parse_heatmap_options({'size': '1000'})
+
+    def test_tile_bounding_box_contains_point(self):
+        x, y = point_to_tile(25.0330, 121.5654, 12)
+        self.assertEqual((x, y), (3431, 1753))
+        self.assertTrue(tile_bounding_box(12, x, y).contains(25.0330, 121.5654))
+        with self.assertRaises(ValueError):
+            tile_bounding_box(2, 4, 0)
+
+    def test_points_to_tiles_matches_point_to_tile(self):
+        rng = np.random.default_rng(7)
+        lats, lngs = rng.uniform(-89, 89, 200), rng.uniform(-180, 180, 200)
+        for z in (0, 7, 20):
+            expected = [point_to_tile(lat, lng, z) for lat, lng in zip(lats, lngs)]
+            self.assertEqual([tuple(tile) for tile in points_to_tiles(lats, lngs, z).tolist()], expected)
+
+
+class NearbyUtilsTest(unittest.TestCase):
+    def test_kd_tree_matches_brute_force(self):
+        rng = np.random.default_rng(0)
+        points = to_unit_vectors(rng.uniform(21, 26, 2000), rng.uniform(119, 123, 2000))
+        tree = KDTree(points)
+        for lat, lng in [(25.03, 121.56), (22.62, 120.30), (24.15, 120.67)]:
+            point = to_unit_vectors([lat], [lng])[0]
+            expected = np.argsort(np.linalg.norm(points - point, axis=1))[:5].tolist()
+            self.assertEqual([index for _, index in tree.query(point, 5)], expected)
+
+    def test_query_radius(self):
+        tree = KDTree(to_unit_vectors([25.0, 25.001, 25.1], [121.5, 121.5, 121.5]))
+        point = to_unit_vectors([25.0], [121.5])[0]
+        found = tree.query(point, 10, metres_to_chord(500))
+        self.assertEqual([index for _, index in found], [0, 1])
+        self.assertAlmostEqual(chord_to_metres(found[1][0]), 111.2, places=0)
+
+    def test_nearby_index_upsert_masks_moved_reports(self):
+        index = NearbyIndex()
+        index.tree = KDTree(to_unit_vectors([25.0, 25.01], [121.5, 121.5]))
+        index.tree_ids = np.array(['a', 'b'], dtype=object)
+        index.tree_positions = {'a': 0, 'b': 1}
+        index.removed = np.zeros(2, dtype=bool)
+        index.built_at = time.monotonic()
+        index.upsert('a', 26.0, 121.5)
+        index.upsert('b', None, None)
+        with patch.object(index, 'catch_up'):
+            found = index.query(25.0, 121.5, 5)
+        self.assertEqual([traffic_violation_id for traffic_violation_id, _ in found], ['a'])
+        self.assertAlmostEqual(found[0][1], 111195, delta=100)
+
+    def test_parse_nearby_params(self):
+        self.assertEqual(parse_nearby_params({'lat': '25', 'lng': '121.5'}), (25.0, 121.5, 10, None))
+        self.assertEqual(parse_nearby_params({'lat': '25', 'lng': '121.5', 'k': '3', 'radius': '500'}),
+                         (25.0, 121.5, 3, 500.0))
+        with self.assertRaises(ValueError):
+            parse_nearby_params({'lat': '25'})
+
+
+class HotSpotUtilsTest(unittest.TestCase):
+    def test_neighbour_pairs_matches_brute_force(self):
+        points = np.random.default_rng(0).uniform(0, 1000, (300, 2))
+        first, second = neighbour_pairs(points, 80)
+        expected = np.linalg.norm(points[:, None] - points[None], axis=2) <= 80
+        self.assertEqual(set(zip(first.tolist(), second.tolist())),
+                         set(zip(*(index.tolist() for index in np.nonzero(expected)))))
+
+    def test_dbscan(self):
+        rng = np.random.default_rng(1)
+        points = np.vstack([rng.normal(0, 30, (50, 2)), rng.normal(2000, 30, (30, 2)), [[5000, 5000]]])
+        labels = dbscan(points, eps=100, min_samples=5)
+        self.assertEqual(sorted(np.bincount(labels[labels >= 0]).tolist()), [30, 50])
+        self.assertEqual(labels[-1], -1)
+        self.assertEqual(len(set(labels[:50])), 1)
+
+    def test_dbscan_batches_dense_cells(self):
+        rng = np.random.default_rng(2)
+        points = np.vstack([rng.normal(0, 20, (400, 2)), rng.uniform(-1000, 1000, (200, 2))])
+        labels = dbscan(points, eps=100, min_samples=5)
+        np.testing.assert_array_equal(dbscan(points, eps=100, min_samples=5, batch_size=16) >= 0, labels >= 0)
+        self.assertTrue((labels[:400] == labels[0]).all())
+
+    def test_convex_hull(self):
+        hull = convex_hull(np.array([[0, 0], [1, 0], [1, 1], [0, 1], [0.5, 0.5]]))
+        self.assertEqual(hull, [[0.0, 0.0], [1.0, 0.0], [1.0, 1.0], [0.0, 1.0]])
+
+
+class PackedUtilsTest(unittest.TestCase):
+    def test_pack_markers_round_trip(self):
+        import uuid
+        import numpy as np
+        ids = [uuid.uuid4(), uuid.uuid4(), uuid.uuid4()]
+        markers = MarkerData(
+            ids=ids,
+            license_plates=['ABC-1234', 'XYZ-5678', 'QQQ-0000'],
+            violations=['紅線停車', '闖紅燈', '不存在的項目'],
+            lats=np.array([25.03, 25.04, 25.05]),
+            lngs=np.array([121.56, 121.57, 121.58]),
+            cluster_lats=np.array([24.1]),
+            cluster_lngs=np.array([120.6]),
+            cluster_counts=np.array([42]),
+        )
+        payload = pack_markers(markers)
+        self.assertEqual(len(payload), 12 + 3 * 25 + 1 + 12)
+
+        columns = unpack_markers(payload)
+        self.assertEqual([bytes(row) for row in columns['ids']], [value.bytes for value in ids])
+        self.assertEqual(columns['violation_codes'].tolist(), [0, 7, 255])
+        np.testing.assert_allclose(columns['lats'], markers.lats, atol=1e-5)
+        self.assertEqual(columns['cluster_counts'].tolist(), [42])
+
+
+class SearchUtilsTest(unittest.TestCase):
+    def test_normalize_search_text(self):
+        self.assertEqual(normalize_search_text('ＡＢＣ-1234'), 'abc1234')
+        self.assertEqual(normalize_search_text(' 忠孝西路 一段 '), '忠孝西路一段')
+
+    def test_tokenize_indexes_bigrams_and_ideographs(self):
+        tokens = tokenize('中正路50巷')
+        self.assertTrue({'中正', '正路', '路5', '50', '0巷', '路', '巷'} <= tokens)
+        self.assertNotIn('5', tokens)
+
+    def test_query_tokens(self):
+        self.assertEqual(query_tokens('ABC-12'), {'ab', 'bc', 'c1', '12'})
+        self.assertEqual(query_tokens('弄'), {'弄'})
+        self.assertEqual(query_tokens('A'), set())
+
+
+class UploadUtilsTest(unittest.TestCase):
+    @patch('utils.upload_utils.settings')
+    def test_validate_upload(self, mock_settings):
+        mock_settings.MEDIA_MAX_FILE_SIZE = 100
+        validate_upload('clip.mp4', 100, 'a' * 64)
+        for filename, size, sha256 in (('', 10, 'a' * 64), ('clip.mp4', 0, 'a' * 64),
+                                       ('clip.mp4', 101, 'a' * 64), ('clip.mp4', 10, 'g' * 64)):
+            with self.assertRaises(ValueError):
+                validate_upload(filename, size, sha256)
+
+    def test_file_sha256(self):
+        data = bytes(range(256)) * 1000
+        with tempfile.NamedTemporaryFile() as file:
+            file.write(data)
+            file.flush()
+            self.assertEqual(file_sha256(file.name), hashlib.sha256(data).hexdigest())
+
+
+class StorageUtilsTest(unittest.TestCase):
+    def test_identical_content_is_stored_once(self):
+        with tempfile.TemporaryDirectory() as location:
+            storage = ContentAddressedStorage(location=location)
+            first = storage.save('clip.MP4', ContentFile(b'dashcam', name='clip.MP4'))
+            second = storage.save('again.mp4', ContentFile(b'dashcam', name='again.mp4'))
+            other = storage.save('clip.mp4', ContentFile(b'other', name='clip.mp4'))
+
+            digest = hashlib.sha256(b'dashcam').hexdigest()
+            self.assertEqual(first, f'blobs/{digest[:2]}/{digest}.mp4')
+            self.assertEqual(second, first)
+            self.assertNotEqual(other, first)
+            self.assertEqual(blob_digest(first), digest)
+            with storage.open(first) as file:
+                self.assertEqual(file.read(), b'dashcam')
+            self.assertEqual(os.listdir(os.path.join(location, 'blobs', 'tmp')), [])
+
+    def test_clean_extension(self):
+        self.assertEqual(clean_extension('a.JPG'), '.jpg')
+        self.assertEqual(clean_extension('a.m p4'), '')
+        self.assertEqual(clean_extension('noext'), '')
+
+
+class RenditionUtilsTest(unittest.TestCase):
+    def test_media_kind(self):
+        self.assertEqual(media_kind('blobs/ab/abc.JPG'), 'image')
+        self.assertEqual(media_kind('clip.mov'), 'video')
+        self.assertIsNone(media_kind('notes.txt'))
+
+    def test_rendition_name(self):
+        self.assertEqual(rendition_name('blobs/ab/abc.mp4', 'poster'), 'blobs/ab/abc.poster.webp')
+        self.assertEqual(rendition_name('blobs/ab/abc.jpg', 'thumbnail'), 'blobs/ab/abc.thumb.webp')
+
+    def test_downscale_keeps_aspect_ratio(self):
+        self.assertEqual(downscale(np.zeros((1080, 1920, 3), dtype=np.uint8)).shape, (180, 320, 3))
+        small = np.zeros((100, 50, 3), dtype=np.uint8)
+        self.assertIs(downscale(small), small)
+
+
+class ImportUtilsTest(unittest.TestCase):
+    def test_detect_import_format(self):
+        self.assertEqual(detect_import_format('reports.CSV'), 'csv')
+        self.assertEqual(detect_import_format('reports.txt', 'jsonl'), 'jsonl')
+        with self.assertRaises(ValueError):
+            detect_import_format('reports.xlsx')
+
+    def test_read_import_rows(self):
+        rows = list(read_import_rows(io.BytesIO('\ufefflicense_plate,date\nABC-123,2024-03-01\n'.encode()), 'csv'))
+        self.assertEqual(rows, [(2, {'license_plate': 'ABC-123', 'date': '2024-03-01'})])
+        rows = list(read_import_rows(io.BytesIO(b'{"license_plate": "A"}\n\nnot json\n'), 'jsonl'))
+        self.assertEqual(rows, [(1, {'license_plate': 'A'}), (3, None)])
+
+    def test_check_encoding(self):
+        file = io.BytesIO('license_plate\n台北\n'.encode())
+        check_encoding(file)
+        self.assertEqual(file.tell(), 0)
+        with self.assertRaises(ValueError):
+            check_encoding(io.BytesIO('license_plate\n台北\n'.encode('big5')))
+
+    def test_report_row_validator(self):
+        validator = ReportRowValidator()
+        row = {'license_plate': 'ABC-123', 'date': '2024-03-01', 'time': '09:05',
+               'violation': '闖紅燈', 'status': '通過', 'location': '25.03, 121.56'}
+        cleaned, errors = validator.clean(row)
+        self.assertEqual(errors, {})
+        self.assertEqual((cleaned['date'].isoformat(), cleaned['time'].isoformat()), ('2024-03-01', '09:05:00'))
+
+        _, errors = validator.clean({**row, 'date': '', 'violation': '飆車', 'license_plate': 'X' * 11})
+        self.assertEqual(set(errors), {'date', 'violation', 'license_plate'})
+        self.assertEqual(validator.clean(None)[1], {'__all__': ['Row is not a JSON object.']})
+
+class BatchUtilsTest(unittest.TestCase):
+    def test_parse_report_batch(self):
+        self.assertEqual(parse_report_batch(QueryDict('reports=[{"idempotency_key": "a"}]')), [{'idempotency_key': 'a'}])
+        self.assertEqual(parse_report_batch({'reports': [{}]}), [{}])
+        for data in ({}, {'reports': '[]'}, {'reports': 'nope'}, {'reports': [1]}, {'reports': [{}] * 51}):
+            with self.assertRaises(ValueError):
+                parse_report_batch(data)
+
+    def test_clean_idempotency_key(self):
+        seen = set()
+        self.assertEqual(clean_idempotency_key({'idempotency_key': 'a'}, seen), [])
+        self.assertEqual(len(clean_idempotency_key({'idempotency_key': 'a'}, seen)), 1)
+        self.assertEqual(len(clean_idempotency_key({'idempotency_key': 'x' * 65}, seen)), 1)
+        self.assertEqual(len(clean_idempotency_key({}, seen)), 1)
+
+    def test_clean_media(self):
+        files = {'a': ContentFile(b'x', name='a.jpg')}
+        self.assertEqual(clean_media({'media': ['a']}, files), ([files['a']], []))
+        self.assertEqual(clean_media({}, files), ([], []))
+        self.assertEqual(len(clean_media({'media': ['b']}, files)[1]), 1)
+        self.assertEqual(len(clean_media({'media': ['a'] * 6}, files)[1]), 1)
+
+class PhashUtilsTest(unittest.TestCase):
+    def test_dhash(self):
+        gray = np.tile(np.arange(0, 256, 16, dtype=np.uint8), (16, 1))
+        self.assertEqual(dhash(gray)[0], (1 << 64) - 1)
+        self.assertEqual(dhash(gray[:, ::-1])[0], 0)
+        self.assertEqual(dhash(np.zeros((16, 16), dtype=np.uint8))[1], 0)
+
+    def test_signed_round_trip(self):
+        for value in (0, 1, (1 << 63) - 1, 1 << 63, (1 << 64) - 1):
+            self.assertEqual(to_unsigned(to_signed(value)), value)
+            self.assertTrue(-(1 << 63) <= to_signed(value) < 1 << 63)
+
+    def test_multi_index_hash(self):
+        self.assertEqual(len(flip_masks(16, 2)), 1 + 16 + 120)
+        index = MultiIndexHash()
+        rng = np.random.default_rng(0)
+        values = [int(value) for value in rng.integers(0, 1 << 63, 2000, dtype=np.int64)]
+        for key, value in enumerate(values):
+            index.add(value, key)
+        # 將差異分散於各區段，仍須找出
+        query = values[7] ^ sum(1 << bit for bit in (1, 2, 17, 18, 33, 34, 49, 50, 51))
+        expected = {key: (value ^ query).bit_count() for key, value in enumerate(values)
+                    if (value ^ query).bit_count() <= 10}
+        self.assertEqual(index.query(query, 10), expected)
+        self.assertEqual(index.query(query, 10)[7], 9)
+
+class MediaGcUtilsTest(unittest.TestCase):
+    def test_scan_files(self):
+        with tempfile.TemporaryDirectory() as root:
+            os.makedirs(os.path.join(root, 'blobs', 'ab'))
+            for name in ('blobs/ab/abc.jpg', 'blobs/top.png'):
+                with open(os.path.join(root, name), 'wb') as file:
+                    file.write(b'xy')
+            files = {name: stat.st_size for name, stat in scan_files(root, 'blobs')}
+            self.assertEqual(files, {'blobs/ab/abc.jpg': 2, 'blobs/top.png': 2})
+            self.assertEqual(list(scan_files(root, 'missing')), [])
+
+    def test_rendition_sources(self):
+        self.assertIsNone(rendition_sources('blobs/ab/abc.jpg'))
+        sources = rendition_sources('reports/media/abc.thumb.webp')
+        self.assertIn('reports/media/abc.jpg', sources)
+        self.assertIn('reports/media/abc.JPG', sources)
+        self.assertNotIn('reports/media/abc.mp4', sources)
+        self.assertIn('reports/media/abc.mp4', rendition_sources('reports/media/abc.preview.webm'))
+
+    def test_upload_part_id(self):
+        upload_id = uuid.uuid4()
+        self.assertEqual(upload_part_id(f'uploads/{upload_id}.part'), upload_id)
+        self.assertIsNone(upload_part_id('uploads/junk.part'))
+        self.assertIsNone(upload_part_id(f'uploads/{upload_id}'))
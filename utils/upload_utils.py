@@ -0,0 +1,254 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from typing import BinaryIO
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+from reports.models import MediaFile, MediaUpload, TrafficViolation
+from .blob_utils import create_media_file, reference_media_blob, release_media_blob, store_media_blob
+
+# Bytes copied per read while streaming a chunk to disk
+COPY_BUFFER_SIZE = 64 * 1024
+
+# Directory, under MEDIA_ROOT, holding the partial files of uploads in progress
+UPLOAD_DIR = 'uploads'
+
+
+class UploadOffsetMismatch(ValueError):
+    """
+    Raised when a chunk does not start where the upload left off.
+    """
+
+    def __init__(self, offset: int):
+        super().__init__(f'Upload is at offset {offset}.')
+        self.offset = offset
+
+
+def get_upload_chunk_size() -> int:
+    """
+    Get the largest chunk, in bytes, accepted by a single request.
+    """
+    return getattr(settings, 'MEDIA_UPLOAD_CHUNK_SIZE', 8 * 1024 * 1024)
+
+
+def get_part_path(upload: MediaUpload) -> str:
+    """
+    Get the path of the partial file an upload is appended to.
+    """
+    return os.path.join(settings.MEDIA_ROOT, UPLOAD_DIR, f'{upload.upload_id}.part')
+
+
+def validate_upload(filename: str, size: int, sha256: str) -> None:
+    """
+    Check the description of a new upload.
+
+    Raises:
+        ValueError: If the name is empty, the size is out of bounds or the
+                    checksum is not a SHA-256 hex digest.
+    """
+    if not filename:
+        raise ValueError('filename is required.')
+    if not 0 < size <= settings.MEDIA_MAX_FILE_SIZE:
+        raise ValueError(f'size must be between 1 and {settings.MEDIA_MAX_FILE_SIZE} bytes.')
+    if len(sha256) != 64 or any(char not in '0123456789abcdef' for char in sha256):
+        raise ValueError('sha256 must be a hexadecimal SHA-256 digest.')
+
+
+def create_upload(traffic_violation: TrafficViolation, username: str, filename: str,
+                  size: int, sha256: str) -> MediaUpload:
+    """
+    Start an upload. Content the server already stores is attached straight
+    away, completing the upload without sending any chunk.
+
+    Args:
+        traffic_violation: The report the media belongs to.
+        username: The uploading user.
+        filename: The name of the file.
+        size: The size of the file, in bytes.
+        sha256: The hex digest of the file.
+
+    Returns:
+        The new upload, already complete if the content was known.
+    """
+    validate_upload(filename, size, sha256)
+    upload = MediaUpload(
+        traffic_violation=traffic_violation,
+        username=username,
+        filename=filename,
+        size=size,
+        sha256=sha256,
+    )
+    with transaction.atomic():
+        blob = reference_media_blob(sha256, size)
+        if blob is not None:
+            upload.media_file = create_media_file(traffic_violation, blob)
+            upload.received = size
+            upload.status = MediaUpload.COMPLETE
+        upload.save()
+    return upload
+
+
+def check_chunk(upload: MediaUpload, offset: int, length: int) -> None:
+    """
+    Check that a chunk continues an upload in progress.
+
+    Raises:
+        UploadOffsetMismatch: If the chunk does not start at the received offset.
+        ValueError: If the upload is complete or the chunk overruns the file size.
+    """
+    if upload.status != MediaUpload.UPLOADING:
+        raise ValueError('Upload is already complete.')
+    if offset != upload.received:
+        raise UploadOffsetMismatch(upload.received)
+    if offset + length > upload.size:
+        raise ValueError('Chunk overruns the declared file size.')
+
+
+def append_chunk(upload_id, offset: int, stream: BinaryIO, length: int) -> MediaUpload:
+    """
+    Append a chunk to an upload, copying it from the request stream in small
+    buffers so at most one chunk is ever held by the worker.
+
+    The chunk is received into a temporary file first, and the upload is
+    only locked to append it, so a slow client never holds the row lock or
+    a transaction open while its body arrives.
+
+    Args:
+        upload_id: The ID of the upload.
+        offset: The position in the file the chunk starts at.
+        stream: The request body.
+        length: The length of the chunk, from the Content-Length header.
+
+    Returns:
+        The updated upload.
+
+    Raises:
+        UploadOffsetMismatch: If the chunk does not start at the received offset.
+        ValueError: If the chunk is empty, too large or overruns the file size,
+                    or the body ends early.
+    """
+    if not 0 < length <= get_upload_chunk_size():
+        raise ValueError(f'Chunks must be between 1 and {get_upload_chunk_size()} bytes.')
+
+    # 先檢查一次，避免接收注定被拒絕的區塊
+    upload = MediaUpload.objects.get(upload_id=upload_id)
+    check_chunk(upload, offset, length)
+
+    path = get_part_path(upload)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # 未完成的暫存區塊不以 .part 結尾，由孤立媒體清理回收
+    with tempfile.NamedTemporaryFile(dir=os.path.dirname(path), prefix=f'{upload_id}.', suffix='.chunk') as chunk:
+        remaining = length
+        while remaining:
+            data = stream.read(min(COPY_BUFFER_SIZE, remaining))
+            if not data:
+                break
+            chunk.write(data)
+            remaining -= len(data)
+        if remaining:
+            raise ValueError('Request body ended before the announced chunk length.')
+        chunk.flush()
+        chunk.seek(0)
+
+        with transaction.atomic():
+            # 鎖定上傳紀錄，避免同一位移的區塊同時寫入
+            upload = MediaUpload.objects.select_for_update().get(upload_id=upload_id)
+            check_chunk(upload, offset, length)
+            with open(path, 'ab') as part:
+                # Drop any tail left by an interrupted chunk
+                part.truncate(offset)
+                shutil.copyfileobj(chunk, part, COPY_BUFFER_SIZE)
+            upload.received = offset + length
+            upload.save(update_fields=['received', 'updated_at'])
+    return upload
+
+
+def file_sha256(path: str) -> str:
+    """
+    Get the SHA-256 hex digest of a file, read in small buffers.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for data in iter(lambda: file.read(COPY_BUFFER_SIZE), b''):
+            digest.update(data)
+    return digest.hexdigest()
+
+
+def complete_upload(upload_id) -> MediaFile:
+    """
+    Verify an upload and attach the assembled file to its report.
+
+    The file is hashed and stored as a blob without holding any lock. The
+    upload is then locked only to check that no concurrent request has
+    completed it meanwhile and to attach the blob, so completing an upload
+    twice returns the same MediaFile.
+
+    Args:
+        upload_id: The ID of the upload.
+
+    Returns:
+        The MediaFile created for the upload.
+
+    Raises:
+        ValueError: If bytes are missing or the checksum does not match. A
+                    mismatching upload is reset so it can be sent again.
+    """
+    upload = MediaUpload.objects.get(upload_id=upload_id)
+    if upload.status == MediaUpload.COMPLETE:
+        return upload.media_file
+    if upload.received != upload.size:
+        raise ValueError(f'Upload is incomplete: {upload.received} of {upload.size} bytes received.')
+
+    path = get_part_path(upload)
+    try:
+        matches = file_sha256(path) == upload.sha256
+    except FileNotFoundError:
+        # 並行的請求已完成或重設此上傳並移除了暫存檔
+        upload.refresh_from_db()
+        if upload.status == MediaUpload.COMPLETE:
+            return upload.media_file
+        raise ValueError('Upload is incomplete, the partial file is missing.')
+
+    if not matches:
+        reset_upload(upload_id)
+        raise ValueError('Checksum mismatch, the upload has been reset.')
+
+    blob = reference_media_blob(upload.sha256, upload.size)
+    if blob is None:
+        with open(path, 'rb') as part:
+            blob = store_media_blob(File(part, name=upload.filename))
+
+    try:
+        with transaction.atomic():
+            upload = MediaUpload.objects.select_for_update().get(upload_id=upload_id)
+            if upload.status == MediaUpload.UPLOADING:
+                media_file = create_media_file(upload.traffic_violation, blob)
+                MediaUpload.objects.filter(pk=upload.pk, status=MediaUpload.UPLOADING).update(
+                    status=MediaUpload.COMPLETE, media_file=media_file, updated_at=timezone.now()
+                )
+                transaction.on_commit(lambda: os.remove(path))
+                return media_file
+    except Exception:
+        release_media_blob(blob.pk)
+        raise
+
+    # 並行的請求已先完成此上傳，歸還多取的引用
+    release_media_blob(blob.pk)
+    return upload.media_file
+
+
+def reset_upload(upload_id) -> None:
+    """
+    Drop the received bytes of a fully received upload whose checksum does
+    not match, so it can be sent again.
+    """
+    with transaction.atomic():
+        upload = MediaUpload.objects.select_for_update().get(upload_id=upload_id)
+        if upload.status != MediaUpload.UPLOADING or upload.received != upload.size:
+            return
+        os.remove(get_part_path(upload))
+        upload.received = 0
+        upload.save(update_fields=['received', 'updated_at'])
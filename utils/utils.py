@@ -1,11 +1,6 @@
 import re
 import random
-import os
-import uuid
-import googlemaps
-from django.conf import settings
 from django.http import HttpRequest
-from django.core.files.storage import FileSystemStorage
 from django.shortcuts import get_object_or_404, redirect
 from django.contrib import messages
 from typing import Tuple, Optional, List
@@ -14,6 +9,10 @@ from reports.models import TrafficViolation, MediaFile
 from .mysql_utils import (
     update_media_files,
 )
+from .geocode_utils import geocode_address, reverse_geocode
+from .gazetteer_utils import lookup_address
+from .blob_utils import store_media_blob
+from .rendition_utils import POSTER, PREVIEW, THUMBNAIL, media_kind
 
 
 def generate_random_code() -> str:
@@ -45,29 +44,22 @@ def get_latitude_and_longitude(address: str) -> Tuple[Optional[float], Optional[
     """
     Get the latitude and longitude of an address using the Google Maps API.
 
+    Repeated addresses are answered from the geocoding caches.
+
     Args:
         address (str): The address to geocode.
 
     Returns:
         tuple: The longitude and latitude of the address, or (None, None) if the address could not be geocoded.
     """
-    # Create a client for the Google Maps API.
-    gmaps = googlemaps.Client(key=settings.GOOGLE_MAPS_API_KEY)
-    # Get the geocoding result for the address.
-    geocode_result = gmaps.geocode(address)
-
-    # If no result was found, return None for both longitude and latitude.
-    if not geocode_result:
-        return None, None
-
-    # Extract the location from the geocoding result.
-    location = geocode_result[0]['geometry']['location']
-    return location['lat'], location['lng']
+    return geocode_address(address)
 
 def coordinates_to_address(lat, lng):
     """
     Convert latitude and longitude to an address using the Google Maps API.
 
+    Nearby coordinates are answered from the geocoding caches.
+
     Args:
         lat (float): The latitude to convert.
         lng (float): The longitude to convert.
@@ -75,15 +67,7 @@ def coordinates_to_address(lat, lng):
     Returns:
         str: The address corresponding to the latitude and longitude, or None if no address was found.
     """
-    # 初始化 Google Maps 客户端
-    gmaps = googlemaps.Client(key=settings.GOOGLE_MAPS_API_KEY)
-
-    # 进行反向地理编码查询
-    result = gmaps.reverse_geocode((lat, lng))
-
-    if result:
-        # 返回第一个结果的格式化地址
-        return result[0]['formatted_address']
+    return reverse_geocode(lat, lng)
 
 def extract_lat_long(s):
     """
@@ -117,8 +101,8 @@ def process_input(input_string: str) -> str:
     """
     # Check if the input is an address.
     if is_address(input_string):
-        # Try to get the longitude and latitude of the input string.
-        lat, lng = get_latitude_and_longitude(input_string)
+        # Try the local gazetteer first, then the longitude and latitude from the API.
+        lat, lng = lookup_address(input_string) or get_latitude_and_longitude(input_string)
         # If both longitude and latitude were found, return them as a string.
         if lat is not None and lng is not None:
             return input_string, lat, lng, "address" #user_input is address
@@ -159,7 +143,7 @@ class ReportManager:
             return get_object_or_404(TrafficViolation, traffic_violation_id=selected_record_id, username=self.username)
         return None
 
-    def get_media_urls(self, selected_record: TrafficViolation) -> List[str]:
+    def get_media_urls(self, selected_record: TrafficViolation) -> List[dict]:
         """
         Get the media URLs associated with the selected record.
 
@@ -167,10 +151,23 @@ class ReportManager:
             selected_record: The TrafficViolation instance.
 
         Returns:
-            A list of media file URLs.
+            A list of dictionaries with the storage `name`, the `url` and
+            `kind` of each media file, and the URLs of its `thumbnail`,
+            `poster` and `preview` renditions, None until they are rendered.
         """
         selected_record_media = MediaFile.objects.filter(traffic_violation=selected_record)
-        return [media.file.url for media in selected_record_media]
+        media_urls = []
+        for media in selected_record_media:
+            renditions = {kind: media.file.storage.url(name) for kind, name in media.renditions.items()}
+            media_urls.append({
+                'name': media.file.name,
+                'url': media.file.url,
+                'kind': media_kind(media.file.name),
+                'thumbnail': renditions.get(THUMBNAIL),
+                'poster': renditions.get(POSTER),
+                'preview': renditions.get(PREVIEW),
+            })
+        return media_urls
 
     def get_initial_form_data(self, selected_record: TrafficViolation) -> dict:
         """
@@ -182,7 +179,7 @@ class ReportManager:
         Returns:
             A dictionary with initial data for the form.
         """
-        location = (selected_record.address if selected_record.user_input_type == "address"
+        location = (selected_record.address if selected_record.user_input_type == "address" or selected_record.latitude is None
                     else f"{selected_record.latitude}, {selected_record.longtitude}")
 
         return {
@@ -235,36 +232,12 @@ class ReportManager:
         Args:
             selected_record: The TrafficViolation instance whose media files are being managed.
         """
-        fs = FileSystemStorage(location=settings.MEDIA_ROOT)
-        saved_files = []
-
-        for media_file in self.request.FILES.getlist('media'):
-            _, file_extension = os.path.splitext(media_file.name)
-            unique_filename = str(uuid.uuid4()) + file_extension
-            fs.save(unique_filename, media_file)
-            saved_files.append(unique_filename)
+        # 以內容雜湊儲存，重複的檔案共用同一份
+        saved_blobs = [store_media_blob(media_file) for media_file in self.request.FILES.getlist('media')]
 
+        # 僅刪除資料列，檔案由孤兒媒體清理任務於背景回收
         removed_media = self.request.POST.get('removed_media', '').split(';')
-        self.remove_media_files(removed_media)
-        update_media_files(selected_record.traffic_violation_id, saved_files, removed_media)
-
-    def remove_media_files(self, removed_media: List[str]) -> None:
-        """
-        Remove media files that are no longer needed.
-
-        Args:
-            removed_media: A list of filenames to be removed.
-        """
-        for file_name in removed_media:
-            if file_name:
-                file_path = os.path.join(settings.MEDIA_ROOT, file_name)
-                if os.path.exists(file_path) and os.path.isfile(file_path):
-                    try:
-                        os.remove(file_path)
-                    except PermissionError as e:
-                        print(f"Error removing file {file_path}: {e}")
-                else:
-                    print(f"File not found or is a directory: {file_path}")
+        update_media_files(selected_record.traffic_violation_id, saved_blobs, removed_media)
 
     @classmethod
     def get_record_form_and_media(cls, request: HttpRequest, username: str) -> Tuple[Optional[TrafficViolation], Optional[ReportForm], List[str]]: